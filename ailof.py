@@ -1,7 +1,5 @@
 # Copyright (c) 2024 texer.ai. All rights reserved.
 import argparse
-import json
-import os
 
 # Ailof code.
 import source.vcd_parser as VcdParser
@@ -10,6 +8,11 @@ import source.rtl_patcher as RtlPatcher
 import source.llm_communicator as LLMCommunicator
 import source.signal_explorer as SignalExplorer
 import source.flist_formatter as FlistFormatter
+import source.parse_cache as ParseCache
+import source.source_index as SourceIndex
+import source.backup_store as BackupStore
+import source.llm_cache as LLMCache
+import source.llm_backends as LLMBackends
 
 from source.enums import ReturnCode
 
@@ -40,52 +43,152 @@ def parse_arguments():
         "--undo",
         required=False,
         action="store_true",
-        help="undo the patching, restore backed up files.",
+        help="undo the last patching, restore backed up files.",
+    )
+
+    parser.add_argument(
+        "--undo-file",
+        required=False,
+        action="append",
+        help="undo the last patching of this file only, can be given more than once.",
+    )
+
+    parser.add_argument(
+        "--undo-module",
+        required=False,
+        action="append",
+        help="undo the last patching of the file declaring this module only, can be given more than once.",
+    )
+
+    parser.add_argument(
+        "--no-parse-cache",
+        required=False,
+        action="store_true",
+        help="ignore the cached design hierarchy and parse the VCD and Flist files again.",
+    )
+
+    parser.add_argument(
+        "--no-incdir-walk",
+        required=False,
+        action="store_true",
+        help="do not search the +incdir+ directories for modules the Flist files do not declare.",
+    )
+
+    parser.add_argument(
+        "--no-llm-cache",
+        required=False,
+        action="store_true",
+        help="ignore the cached LLM analyses and send every module to the LLM again.",
+    )
+
+    parser.add_argument(
+        "--llm-backend",
+        required=False,
+        choices=sorted(LLMBackends.LLM_BACKENDS),
+        default="openai",
+        help="LLM backend that analyses the modules, 'mock' answers locally without network access.",
+    )
+
+    parser.add_argument(
+        "--llm-pack-tokens",
+        required=False,
+        type=int,
+        default=LLMCommunicator.PACK_TOKEN_LIMIT,
+        help="pack small modules into LLM requests of up to this many tokens, 0 sends every module on its own.",
+    )
+
+    parser.add_argument(
+        "--llm-top-signals",
+        required=False,
+        type=int,
+        default=LLMCommunicator.TOP_SIGNALS,
+        help="send only this many of the best ranked signals of every module to the LLM, 0 sends all of them.",
+    )
+
+    parser.add_argument(
+        "--toggle-activity",
+        required=False,
+        action="store_true",
+        help="rank the signals by how often they toggle in the VCD file as well, this reads the whole VCD file.",
+    )
+
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        required=False,
+        type=int,
+        default=1,
+        help="number of worker processes used to scan and patch the design files.",
     )
 
     args = parser.parse_args()
+    args.undo = args.undo or bool(args.undo_file) or bool(args.undo_module)
+    args.llm_pack_tokens = max(0, args.llm_pack_tokens)
+    args.llm_top_signals = max(0, args.llm_top_signals)
+    args.jobs = max(1, args.jobs)
 
     if not args.undo:
         if not args.flist or not args.vcd:
             parser.print_help()
-            return False, "", "", ""
+            return False, args
 
-    return True, args.vcd, args.flist, args.undo
+    return True, args
 
 
 def main():
     # Get arguments.
-    is_parsed, vcd_file_path, flist_file_path, should_undo = parse_arguments()
-
-    if should_undo:
-        if os.path.exists(RtlPatcher.BACKUP_FILE):
-            with open(RtlPatcher.BACKUP_FILE, "r") as infile:
-                backed_up_data = json.load(infile)
-                for file, code in backed_up_data.items():
-                    with open(file, "w") as outfile:
-                        outfile.write(code)
-            os.remove(RtlPatcher.BACKUP_FILE)
+    is_parsed, args = parse_arguments()
+
+    if args.undo:
+        backup_store = BackupStore.BackupStore()
+        if backup_store.import_legacy_backup() is not None:
+            print(f"Moved the backup in {BackupStore.LEGACY_BACKUP_FILE} into {backup_store.backup_dir}.")
+        restored_files, unchanged_files = backup_store.restore(args.undo_file, args.undo_module)
+        for file in restored_files:
+            print(f"Restored {file}")
+        if unchanged_files:
+            print(f"{len(unchanged_files)} file(s) already matched the backup.")
+        if not restored_files and not unchanged_files:
+            print("Nothing to undo.")
 
     # Parse VCD.
     elif is_parsed:
-        formatter = FlistFormatter.FlistFormatter()
-        flist = formatter.format_cva6(flist_file_path)
+        # The flist is expanded while the sources it names are scanned, includes of unchanged files come from the index.
+        source_index = SourceIndex.SourceIndex()
+        formatter = FlistFormatter.FlistFormatter(source_index)
+        flist = formatter.iter_files(args.flist)
+        library_files = formatter.iter_library_files(not args.no_incdir_walk)
 
         vcd_parser = VcdParser.VcdParser()
-        json_design_hierarchy = vcd_parser.parse(vcd_file_path, flist)
+        parse_cache = ParseCache.ParseCache() if not args.no_parse_cache else None
+        json_design_hierarchy = vcd_parser.parse(args.vcd, flist, parse_cache, source_index, args.jobs, library_files)
 
-        explorer = DesignExplorer.DesignExplorer(json_design_hierarchy)
+        explorer = DesignExplorer.DesignExplorer(json_design_hierarchy, source_index)
         selected_modules, return_code = explorer.run()
 
         if return_code == ReturnCode.SUCCESS:
-            llm_communicator = LLMCommunicator.LLMCommunicator(selected_modules)
-            modules_with_signals = llm_communicator.run()
-
-            signal_explorer = SignalExplorer.SignalExplorer(modules_with_signals)
+            llm_cache = LLMCache.LLMCache() if not args.no_llm_cache else None
+            toggle_activity = None
+            if args.toggle_activity:
+                print("Counting the signal toggles in the VCD file...")
+                toggle_activity = VcdParser.read_vcd_toggle_activity(args.vcd, selected_modules)
+
+            llm_communicator = LLMCommunicator.LLMCommunicator(
+                selected_modules,
+                args.llm_backend,
+                llm_cache=llm_cache,
+                pack_tokens=args.llm_pack_tokens,
+                top_signals=args.llm_top_signals,
+                toggle_activity=toggle_activity,
+            )
+            llm_communicator.start()
+
+            # The signals of every module can be selected as soon as its analysis arrives.
+            signal_explorer = SignalExplorer.SignalExplorer(analysis=llm_communicator)
             selected_signals, return_code = signal_explorer.run()
 
             if return_code == ReturnCode.SUCCESS:
-                rtl_patcher = RtlPatcher.RtlPatcher(json_design_hierarchy, selected_modules, selected_signals)
+                rtl_patcher = RtlPatcher.RtlPatcher(json_design_hierarchy, selected_modules, selected_signals, source_index, args.jobs)
                 return_code = rtl_patcher.patch()
 
                 if return_code == ReturnCode.SUCCESS:
@@ -0,0 +1,157 @@
+# Copyright (c) 2024 texer.ai. All rights reserved.
+import glob
+import gzip
+import hashlib
+import json
+import os
+import time
+
+from source.parse_cache import write_json_atomic, write_text_atomic
+
+# Default location of the backups of patched files, relative to the working directory.
+BACKUP_DIR = "./.ailof_backup"
+BACKUP_OBJECTS_DIR = "objects"
+BACKUP_GENERATION_FILE_PREFIX = "generation_"
+BACKUP_STORE_VERSION = 1
+
+# Single backup file of earlier versions, a {path: content} dict overwritten by every patch run.
+LEGACY_BACKUP_FILE = "./backup.json"
+
+# JSON object names.
+JSON_OBJ_NAME_SHA256 = "sha256"
+JSON_OBJ_NAME_MODULES = "modules"
+JSON_OBJ_NAME_FILES = "files"
+JSON_OBJ_NAME_CREATED = "created"
+
+
+def content_digest(content):
+    """Returns the SHA-256 of the text 'content'."""
+    return hashlib.sha256(content.encode()).hexdigest()
+
+
+class BackupStore:
+    # Backups of patched files. Every file content is stored once, compressed and named by its hash, and every patch
+    # run records a generation that maps the patched files to the content they had before. Undo restores the newest
+    # generation first, either completely or for some files or modules only.
+    def __init__(self, backup_dir=BACKUP_DIR):
+        self.backup_dir = backup_dir
+
+    def __object_path(self, digest):
+        return os.path.join(self.backup_dir, BACKUP_OBJECTS_DIR, f"{digest}.gz")
+
+    def __generation_path(self, generation):
+        return os.path.join(self.backup_dir, f"{BACKUP_GENERATION_FILE_PREFIX}{generation}.json")
+
+    def __load_generation(self, generation):
+        with open(self.__generation_path(generation), "r") as infile:
+            data = json.load(infile)
+        if data.get("version") != BACKUP_STORE_VERSION:
+            raise ValueError(f"Backup generation {generation} has an unsupported format.")
+        return data
+
+    def generations(self):
+        """Returns the numbers of the stored generations, oldest first. Imported legacy backups may have numbers below 1."""
+        generations = []
+        for path in glob.glob(os.path.join(self.backup_dir, f"{BACKUP_GENERATION_FILE_PREFIX}*.json")):
+            number = os.path.basename(path)[len(BACKUP_GENERATION_FILE_PREFIX) : -len(".json")]
+            if number.removeprefix("-").isdigit():
+                generations.append(int(number))
+        return sorted(generations)
+
+    def create_generation(self, files, generation=None):
+        """Backs up 'files', a {path: (content, module names)} dict, as a new generation and returns its number.
+        The generation is numbered after the newest one unless 'generation' is given. Contents that are already stored
+        are not written again."""
+        entries = {}
+        for filepath, (content, modules) in files.items():
+            digest = content_digest(content)
+            object_path = self.__object_path(digest)
+            if not os.path.isfile(object_path):
+                os.makedirs(os.path.dirname(object_path), exist_ok=True)
+                tmp_path = f"{object_path}.tmp"
+                with open(tmp_path, "wb") as outfile:
+                    outfile.write(gzip.compress(content.encode()))
+                os.replace(tmp_path, object_path)
+            entries[os.path.abspath(filepath)] = {JSON_OBJ_NAME_SHA256: digest, JSON_OBJ_NAME_MODULES: list(modules)}
+
+        if generation is None:
+            generations = self.generations()
+            generation = generations[-1] + 1 if generations else 1
+        data = {"version": BACKUP_STORE_VERSION, JSON_OBJ_NAME_CREATED: time.time(), JSON_OBJ_NAME_FILES: entries}
+        write_json_atomic(self.__generation_path(generation), data)
+        return generation
+
+    def import_legacy_backup(self, legacy_path=LEGACY_BACKUP_FILE):
+        """Moves the backup file of earlier versions into the store as its oldest generation, so it is undone after
+        every newer one, and returns the generation number. Returns None if there is no such file."""
+        if not os.path.isfile(legacy_path):
+            return None
+
+        with open(legacy_path, "r") as infile:
+            legacy_files = json.load(infile)
+
+        # The modules of legacy backups are not known, they can be undone completely or by file. The generation is
+        # numbered before the oldest one, below zero if need be.
+        generations = self.generations()
+        generation = generations[0] - 1 if generations else None
+        generation = self.create_generation({path: (content, []) for path, content in legacy_files.items()}, generation)
+        os.remove(legacy_path)
+        return generation
+
+    def restore(self, filepaths=None, modules=None, generation=None):
+        """Restores the files of 'generation', the newest one by default, limited to 'filepaths' and the files that
+        declare 'modules' if either is given. Files whose content already matches the backup are not written.
+        Restored files leave the generation, which is deleted once empty. Returns the (restored, unchanged) paths."""
+        generations = self.generations()
+        if generation is None:
+            if not generations:
+                return [], []
+            generation = generations[-1]
+        elif generation not in generations:
+            raise ValueError(f"Backup generation {generation} does not exist.")
+
+        data = self.__load_generation(generation)
+        entries = data[JSON_OBJ_NAME_FILES]
+
+        selected_paths = list(entries.keys())
+        if filepaths is not None or modules is not None:
+            wanted_paths = {os.path.abspath(filepath) for filepath in filepaths or []}
+            wanted_modules = set(modules or [])
+            selected_paths = [path for path in selected_paths if path in wanted_paths or wanted_modules.intersection(entries[path][JSON_OBJ_NAME_MODULES])]
+
+        restored_paths = []
+        unchanged_paths = []
+        for path in selected_paths:
+            digest = entries[path][JSON_OBJ_NAME_SHA256]
+            try:
+                with open(path, "r") as infile:
+                    is_unchanged = content_digest(infile.read()) == digest
+            except FileNotFoundError:
+                is_unchanged = False
+
+            if is_unchanged:
+                unchanged_paths.append(path)
+            else:
+                with open(self.__object_path(digest), "rb") as infile:
+                    write_text_atomic(path, gzip.decompress(infile.read()).decode())
+                restored_paths.append(path)
+            del entries[path]
+
+        if entries:
+            write_json_atomic(self.__generation_path(generation), data)
+        else:
+            os.remove(self.__generation_path(generation))
+        self.__remove_unreferenced_objects()
+
+        return restored_paths, unchanged_paths
+
+    def __remove_unreferenced_objects(self):
+        # Drops the stored contents that no generation refers to anymore.
+        referenced_digests = set()
+        for generation in self.generations():
+            for entry in self.__load_generation(generation)[JSON_OBJ_NAME_FILES].values():
+                referenced_digests.add(entry[JSON_OBJ_NAME_SHA256])
+
+        for object_path in glob.glob(os.path.join(self.backup_dir, BACKUP_OBJECTS_DIR, "*.gz")):
+            if os.path.basename(object_path)[: -len(".gz")] not in referenced_digests:
+                os.remove(object_path)
@@ -1,24 +1,33 @@
 # Copyright (c) 2024 texer.ai. All rights reserved.
+import queue
+import select
 import sys
 import termios
 import tty
 
 from source.enums import Command, ReturnCode
 
+# Seconds between two refreshes of the view while the analysis results are still arriving.
+REFRESH_INTERVAL = 0.5
+
 
 class SignalExplorerController:
-    def __init__(self, model, view):
+    def __init__(self, model, view, analysis=None):
         self.model = model
         self.view = view
+        self.analysis = analysis
         self.keyword = ""
         self.running = True
         self.selected_signals = {}
 
-    def read_key(self):
+    def read_key(self, timeout=None):
+        # Returns None if no key was pressed within 'timeout' seconds.
         fd = sys.stdin.fileno()
         old_settings = termios.tcgetattr(fd)
         try:
             tty.setraw(fd)
+            if timeout is not None and not select.select([fd], [], [], timeout)[0]:
+                return None
             ch = sys.stdin.read(1)
             if ch == "\x1b":
                 ch += sys.stdin.read(2)
@@ -29,8 +38,11 @@ class SignalExplorerController:
     def process_key(self, key):
         ret_command = Command.UNDEFINED
 
+        # No key, the view is refreshed.
+        if key is None:
+            ret_command = Command.REFRESH
         # Up.
-        if key == "\x1b[A":
+        elif key == "\x1b[A":
             ret_command = Command.UP
         # Down.
         elif key == "\x1b[B":
@@ -61,8 +73,32 @@ class SignalExplorerController:
 
         return ret_command
 
+    def collect_results(self):
+        # Moves the analysis results that arrived into the model without waiting for the others.
+        if self.analysis is None:
+            return
+        num_signals = len(self.model.selected_signals)
+        while True:
+            try:
+                module, result = self.analysis.results.get(block=False)
+            except queue.Empty:
+                break
+            if isinstance(result, Exception):
+                self.model.fail_module(module, result)
+            else:
+                self.model.add_module(module, result)
+
+        if len(self.model.selected_signals) != num_signals:
+            self.model.filter(self.keyword)
+            self.view.update_view_data(self.model.working_list, self.model.working_list_ids)
+        num_done, num_failed, num_modules = self.model.analysis_progress()
+        last_message = self.analysis.messages[-1] if self.analysis.messages else ""
+        self.view.update_analysis_status(num_done, num_failed, num_modules, self.model.pending_modules(), last_message, self.model.module_errors)
+
     def process_command(self, command):
-        if command == Command.SEARCH:
+        if command == Command.REFRESH:
+            pass
+        elif command == Command.SEARCH:
             prev_actual_index = self.view.actual_index
             self.model.filter(self.keyword)
             if not self.keyword:
@@ -115,6 +151,7 @@ class SignalExplorerController:
                 self.view.selected_or_ids.remove(current_id)
         elif command == Command.CONTINUE:
             if len(self.view.selected_and_ids) + len(self.view.selected_or_ids) > 0:
+                # A signal is only listed once its module is analysed, so the modules still pending are not waited for.
                 self.running = False
                 for id in self.view.selected_and_ids:
                     signal = self.model.selected_signals[id].split(" | ")[0]
@@ -136,8 +173,9 @@ class SignalExplorerController:
         self.view.update_view_data(self.model.working_list, self.model.working_list_ids)
 
         while self.running:
+            self.collect_results()
             self.view.update_view(self.keyword)
-            key = self.read_key()
+            key = self.read_key(REFRESH_INTERVAL if self.model.pending_modules() else None)
             command = self.process_key(key)
             return_code = self.process_command(command)
             if return_code == ReturnCode.TERMINATE:
@@ -66,7 +66,7 @@ class DesignExplorerController:
                 self.view.end_index = (self.view.page_number + 1) * self.view.display_width
                 self.view.highlighted_index = target_index % self.view.display_width
                 self.view.actual_index = target_index
-            self.view.update_view_data(self.model.working_list, self.model.working_list_ids)
+            self.view.update_view_data(self.model.working_list, self.model.working_list_ids, self.model.module_tokens)
         elif command == Command.UP:
             if self.view.actual_index > 0:
                 self.view.highlighted_index -= 1
@@ -76,7 +76,7 @@ class DesignExplorerController:
                     self.view.start_index = self.view.page_number * self.view.display_width
                     self.view.end_index = (self.view.page_number + 1) * self.view.display_width
                     self.view.highlighted_index = self.view.display_width - 1
-                    self.view.update_view_data(self.model.working_list, self.model.working_list_ids)
+                    self.view.update_view_data(self.model.working_list, self.model.working_list_ids, self.model.module_tokens)
         elif command == Command.DOWN:
             if self.view.actual_index < len(self.model.working_list) - 1:
                 self.view.highlighted_index += 1
@@ -86,7 +86,7 @@ class DesignExplorerController:
                     self.view.start_index = self.view.page_number * self.view.display_width
                     self.view.end_index = (self.view.page_number + 1) * self.view.display_width
                     self.view.highlighted_index = 0
-                    self.view.update_view_data(self.model.working_list, self.model.working_list_ids)
+                    self.view.update_view_data(self.model.working_list, self.model.working_list_ids, self.model.module_tokens)
         elif command == Command.SELECT:
             if not self.view.view_data:
                 return
@@ -113,10 +113,10 @@ class DesignExplorerController:
         self.view.print_intro()
 
         self.read_key()
-        self.view.update_view_data(self.model.working_list, self.model.working_list_ids)
+        self.view.update_view_data(self.model.working_list, self.model.working_list_ids, self.model.module_tokens)
 
         while self.running:
-            self.view.update_view(self.keyword)
+            self.view.update_view(self.keyword, self.model.selection_tokens(self.view.selected_ids))
             key = self.read_key()
             command = self.process_key(key)
             return_code = self.process_command(command)
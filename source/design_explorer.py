@@ -5,8 +5,8 @@ from source.controllers.terminal_controller import DesignExplorerController as C
 
 
 class DesignExplorer:
-    def __init__(self, json_design_hierarchy):
-        self.model = Model()
+    def __init__(self, json_design_hierarchy, source_index=None):
+        self.model = Model(source_index)
         self.model.load_json_design_hierarchy(json_design_hierarchy)
         self.view = View()
         self.controller = Controller(self.model, self.view)
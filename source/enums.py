@@ -12,9 +12,16 @@ class Command(enum.Enum):
     SELECT = 6
     SEARCH = 7
     CONTINUE = 8
+    REFRESH = 9
 
 
 class ReturnCode(enum.Enum):
     SUCCESS = 0
     FAILURE = 1
     TERMINATE = 2
+
+
+class AnalysisStatus(enum.Enum):
+    PENDING = 0
+    DONE = 1
+    FAILED = 2
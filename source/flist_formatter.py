@@ -1,12 +1,35 @@
 import os
 import re
 
+from source.sv_lexer import scan_includes
+
 REGEX_STRING_MATCH_ENV_VAR = r"\$\{(\w+)\}"
+# A comment starts a line or follows whitespace, '//' inside a path such as '${DIR}//rtl/top.sv' is kept.
+REGEX_STRING_MATCH_COMMENT = r"(?:^|\s)//.*"
+
+# Options of the flist format.
+FLIST_OPTION_FILE = "-f"
+FLIST_OPTION_RELATIVE_FILE = "-F"
+FLIST_OPTION_LIBRARY_FILE = "-v"
+FLIST_OPTION_LIBRARY_DIR = "-y"
+FLIST_PREFIX_INCDIR = "+incdir+"
+
+# Only these files are passed on to the source scanner.
+HDL_FILE_EXTENSIONS = frozenset([".v", ".sv", ".vh", ".svh"])
 
 
 class FlistFormatter:
-    def __init__(self):
-        """Initializes an empty class FlistFormatter instance."""
+    def __init__(self, source_index=None):
+        """Initializes an empty class FlistFormatter instance. The includes of a file are taken from 'source_index' if
+        it is given and its entry of the file is up to date."""
+        self.source_index = source_index
+        self.include_dirs = []
+        self.library_dirs = []
+        self.skipped_files = []
+        self.__expanded_flists = {}
+        self.__active_flists = []
+        self.__resolved_includes = {}
+        self.__seen_files = set()
 
     def __replace_env_var(self, match):
         """Private method for replacing placeholders with enviroment variables."""
@@ -17,40 +40,194 @@ class FlistFormatter:
             raise ValueError(f"Error: Environment variable '{env_var}' is not set.")
         return env_value
 
-    def format_cva6(self, flist_path):
-        """Public method for formating file list to plain text with absolute file path."""
+    def __resolve_path(self, path, base_dir):
+        """Private method resolving a path of a flist, relative paths are relative to 'base_dir'."""
+        return os.path.normpath(os.path.join(base_dir, path))
 
+    def __read_tokens(self, flist_path):
+        """Private method yielding the tokens of a flist with comments dropped and environment variables replaced."""
         env_var_pattern = re.compile(REGEX_STRING_MATCH_ENV_VAR)
-        formatted_lines = []
-
+        comment_pattern = re.compile(REGEX_STRING_MATCH_COMMENT)
         with open(flist_path, "r") as flist_file:
             for line in flist_file:
-                stripped_line = line.strip()
-                if not stripped_line or stripped_line.startswith("//") or stripped_line.startswith("#"):
+                stripped_line = comment_pattern.sub("", line).strip()
+                if not stripped_line or stripped_line.startswith("#"):
                     continue
+                yield from env_var_pattern.sub(self.__replace_env_var, stripped_line).split()
+
+    def __iter_flist(self, flist_path, relative_to_flist):
+        """Private method yielding the source files of a flist and of the flists it includes, in order, while they are
+        read. Include and library directories are collected on the way. Every flist is read once: its entries are kept
+        with the flists it includes as references, and replayed if it is included again."""
+        real_path = os.path.realpath(flist_path)
+        if real_path in self.__active_flists:
+            cycle = self.__active_flists[self.__active_flists.index(real_path) :] + [real_path]
+            raise ValueError(f"Error: Flists include each other in a cycle: {' -> '.join(cycle)}")
+
+        key = (real_path, relative_to_flist)
+        if key in self.__expanded_flists:
+            for entry_path, is_relative in self.__expanded_flists[key]:
+                if is_relative is None:
+                    yield entry_path
+                else:
+                    yield from self.__iter_flist(entry_path, is_relative)
+            return
 
-                replaced_line = env_var_pattern.sub(self.__replace_env_var, stripped_line)
-
-                if replaced_line.startswith("+incdir+"):
-                    include_path = replaced_line[8:]
-                    if os.path.isdir(include_path):
-                        for root, _, files in os.walk(include_path):
-                            for file in files:
-                                file_path = os.path.join(root, file)
-                                formatted_lines.append(file_path)
-                    else:
-                        raise FileNotFoundError(f"Directory not found: {include_path}")
-
-                elif replaced_line.startswith("-F"):
-                    f_file_path = replaced_line[3:].strip()
-                    if os.path.isfile(f_file_path):
-                        formatted_lines.extend(self.format_cva6(f_file_path).splitlines())
-                    else:
+        # Paths in a flist included with -F are relative to the flist, with -f relative to the working directory.
+        base_dir = os.path.dirname(flist_path) if relative_to_flist else ""
+        entries = []
+
+        self.__active_flists.append(real_path)
+        try:
+            tokens = self.__read_tokens(flist_path)
+            for token in tokens:
+                if token in (FLIST_OPTION_FILE, FLIST_OPTION_RELATIVE_FILE):
+                    f_file_path = self.__resolve_path(next(tokens, ""), base_dir)
+                    if not os.path.isfile(f_file_path):
                         raise FileNotFoundError(f"File not found: {f_file_path}")
+                    is_relative = token == FLIST_OPTION_RELATIVE_FILE
+                    entries.append((f_file_path, is_relative))
+                    yield from self.__iter_flist(f_file_path, is_relative)
+
+                elif token == FLIST_OPTION_LIBRARY_FILE:
+                    entries.append((self.__resolve_path(next(tokens, ""), base_dir), None))
+                    yield entries[-1][0]
+
+                elif token == FLIST_OPTION_LIBRARY_DIR:
+                    # Library directories are searched for missing modules by the simulator, their files are not listed.
+                    library_path = self.__resolve_path(next(tokens, ""), base_dir)
+                    if not os.path.isdir(library_path):
+                        raise FileNotFoundError(f"Directory not found: {library_path}")
+                    if library_path not in self.library_dirs:
+                        self.library_dirs.append(library_path)
+
+                elif token.startswith(FLIST_PREFIX_INCDIR):
+                    for include_path in filter(None, token[len(FLIST_PREFIX_INCDIR) :].split("+")):
+                        include_path = self.__resolve_path(include_path, base_dir)
+                        if not os.path.isdir(include_path):
+                            raise FileNotFoundError(f"Directory not found: {include_path}")
+                        if include_path not in self.include_dirs:
+                            self.include_dirs.append(include_path)
+
+                elif token.startswith("+") or token.startswith("-"):
+                    # Other simulator options, such as +define+ or -sverilog, do not name source files. The source scanner
+                    # does not evaluate `ifdef, so defines are not kept.
+                    continue
+
                 else:
-                    formatted_lines.append(replaced_line)
+                    entries.append((self.__resolve_path(token, base_dir), None))
+                    yield entries[-1][0]
+        finally:
+            self.__active_flists.pop()
+
+        self.__expanded_flists[key] = entries
+
+    def __resolve_include(self, name, including_dir):
+        """Private method resolving an included file name against the including file's directory, then the include
+        directories. Returns None if it is found in neither."""
+        if os.path.isabs(name):
+            return os.path.normpath(name) if os.path.isfile(name) else None
 
-        return "\n".join(formatted_lines)
+        candidate = os.path.normpath(os.path.join(including_dir, name))
+        if os.path.isfile(candidate):
+            return candidate
+
+        if name not in self.__resolved_includes:
+            self.__resolved_includes[name] = None
+            for include_dir in self.include_dirs:
+                candidate = os.path.join(include_dir, name)
+                if os.path.isfile(candidate):
+                    self.__resolved_includes[name] = candidate
+                    break
+        return self.__resolved_includes[name]
+
+    def __included_files(self, source_path):
+        """Private method returning the files 'source_path' includes that are found on the include path, and the
+        names of the ones that are not."""
+        names = self.source_index.cached_includes(source_path) if self.source_index is not None else None
+        if names is None:
+            try:
+                with open(source_path, "r", errors="ignore") as source_file:
+                    code = source_file.read()
+            except OSError:
+                return [], []
+            names = scan_includes(code) if "`include" in code else []
+
+        included_files = []
+        unresolved_names = []
+        for name in names:
+            include_path = self.__resolve_include(name, os.path.dirname(source_path))
+            if include_path is not None:
+                included_files.append(include_path)
+            else:
+                unresolved_names.append(name)
+        return included_files, unresolved_names
+
+    def iter_files(self, flist_path):
+        """Public method yielding the HDL source files a flist names, each once, while the flist and the flists it
+        includes are read. A file is followed by the files it includes, an included file is only yielded from the
+        include directories if a yielded file includes it."""
+        seen_files = self.__seen_files = set()
+        unresolved_includes = []
+        # Include directories added since the last expansion may resolve names that were not found before.
+        self.__resolved_includes = {}
+
+        def iter_with_includes(file_path):
+            pending_files = [file_path]
+            while pending_files:
+                file_path = pending_files.pop()
+                # A file listed both relative to the working directory and to a flist is the same file.
+                absolute_path = os.path.abspath(file_path)
+                if absolute_path in seen_files:
+                    continue
+                seen_files.add(absolute_path)
+
+                if os.path.splitext(file_path)[1] not in HDL_FILE_EXTENSIONS:
+                    self.skipped_files.append(file_path)
+                    continue
+
+                yield file_path
+                included_files, unresolved_names = self.__included_files(file_path)
+                pending_files.extend(reversed(included_files))
+                unresolved_includes.extend((name, os.path.dirname(file_path)) for name in unresolved_names)
+
+        for file_path in self.__iter_flist(flist_path, False):
+            yield from iter_with_includes(file_path)
+
+        # An include directory may come after the files that need it, their includes are resolved again at the end.
+        self.__resolved_includes = {name: path for name, path in self.__resolved_includes.items() if path is not None}
+        while unresolved_includes:
+            name, including_dir = unresolved_includes.pop(0)
+            include_path = self.__resolve_include(name, including_dir)
+            if include_path is not None:
+                yield from iter_with_includes(include_path)
+
+    def iter_library_files(self, walk_include_dirs=True):
+        """Public method yielding the HDL files of the library directories, then of the include directories and their
+        subdirectories unless 'walk_include_dirs' is False, that 'iter_files' did not yield. Modules that the flist does
+        not declare are looked up in these files, so it is consumed after 'iter_files'."""
+        search_dirs = [(library_dir, False) for library_dir in self.library_dirs]
+        if walk_include_dirs:
+            search_dirs += [(include_dir, True) for include_dir in self.include_dirs]
+
+        for search_dir, is_recursive in search_dirs:
+            for root, dirs, files in os.walk(search_dir):
+                dirs[:] = sorted(dirs) if is_recursive else []
+                for file in sorted(files):
+                    file_path = os.path.join(root, file)
+                    absolute_path = os.path.abspath(file_path)
+                    if os.path.splitext(file)[1] not in HDL_FILE_EXTENSIONS or absolute_path in self.__seen_files:
+                        continue
+                    self.__seen_files.add(absolute_path)
+                    yield file_path
+
+    def expand(self, flist_path):
+        """Public method expanding a flist into the deduplicated list of HDL source files it names."""
+        return list(self.iter_files(flist_path))
+
+    def format_cva6(self, flist_path):
+        """Public method for formating file list to plain text with absolute file path."""
+        return "\n".join(self.expand(flist_path))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,148 @@
+# Copyright (c) 2024 texer.ai. All rights reserved.
+import ast
+import asyncio
+import hashlib
+import json
+import re
+
+OPENAI_MODEL = "gpt-4o-2024-05-13"
+CLAUDE_MODEL = "claude-3-5-sonnet-20241022"
+MOCK_MODEL = "mock"
+
+# The mock backend proposes every target signal with a certainty derived from its name, and these control signals.
+MOCK_CONTROL_SIGNALS = {"clock": "clk_i", "reset": "rst_ni", "edge": "posedge"}
+MOCK_BATCH_MARKER = "keyed by its <source>"
+REGEX_MOCK_DOCUMENT = re.compile(r"<source>(.*?)</source>\s*<targets>(.*?)</targets>", re.DOTALL)
+
+
+class OpenAIBackend:
+    # Chat completions of the OpenAI API, or of any server compatible with it at 'base_url'.
+    MODEL_NAME = OPENAI_MODEL
+    RATE_LIMITED = True
+
+    def __init__(self, base_url=None):
+        import openai
+
+        # The SDK retries are disabled, rate limits and retries are handled by the communicator.
+        self.client = openai.AsyncOpenAI(base_url=base_url, max_retries=0)
+        self.api_errors = (openai.APIError,)
+
+    async def complete(self, role, prompt, max_tokens):
+        response_content = await self.client.chat.completions.create(
+            model=self.MODEL_NAME,
+            max_tokens=max_tokens,
+            temperature=0,
+            messages=[{"role": "system", "content": role}, {"role": "user", "content": prompt}],
+            response_format={"type": "json_object"},
+        )
+        return response_content.choices[0].message.content
+
+    async def close(self):
+        await self.client.close()
+
+
+class ClaudeBackend:
+    # Messages of the Anthropic API.
+    MODEL_NAME = CLAUDE_MODEL
+    RATE_LIMITED = True
+
+    def __init__(self, base_url=None):
+        import anthropic
+
+        self.client = anthropic.AsyncAnthropic(base_url=base_url, max_retries=0)
+        self.api_errors = (anthropic.APIError,)
+
+    async def complete(self, role, prompt, max_tokens):
+        response_content = await self.client.messages.create(
+            model=self.MODEL_NAME,
+            max_tokens=max_tokens,
+            temperature=0,
+            system=role,
+            messages=[
+                {
+                    "role": "user",
+                    "content": [
+                        {
+                            "type": "text",
+                            "text": prompt,
+                        }
+                    ],
+                }
+            ],
+        )
+        return response_content.content[0].text
+
+    async def close(self):
+        await self.client.close()
+
+
+class MockBackend:
+    # A deterministic local backend without network access, for offline runs and throughput benchmarks. Every
+    # request waits 'latency' seconds and is answered with canned JSON built from the documents of the prompt.
+    MODEL_NAME = MOCK_MODEL
+    RATE_LIMITED = False
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.api_errors = ()
+        self.num_requests = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def complete(self, role, prompt, max_tokens):
+        self.num_requests += 1
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            if self.latency > 0:
+                await asyncio.sleep(self.latency)
+        finally:
+            self.in_flight -= 1
+
+        analyses = {source: mock_analysis(source, targets) for source, targets in REGEX_MOCK_DOCUMENT.findall(prompt)}
+        if MOCK_BATCH_MARKER in prompt:
+            return json.dumps(analyses)
+        return json.dumps(next(iter(analyses.values()), mock_analysis("", "[]")))
+
+    async def close(self):
+        pass
+
+
+def mock_certainty(source, signal):
+    """Returns a certainty between 0 and 100 that only depends on the module and the signal name."""
+    return int(hashlib.sha256(f"{source}:{signal}".encode()).hexdigest()[:8], 16) % 101
+
+
+def mock_analysis(source, targets):
+    """Returns the canned analysis of the module 'source' for the target signals given as in the prompt."""
+    try:
+        signals = ast.literal_eval(targets.strip())
+    except (SyntaxError, ValueError):
+        signals = []
+    if not isinstance(signals, (list, tuple)):
+        signals = []
+
+    candidates = [
+        {"name": signal, "certainty": mock_certainty(source, signal), "explanation": "Mock analysis."} for signal in signals if isinstance(signal, str)
+    ]
+    return {"fuzz_candidates": {"signals": candidates}, "control_signals": dict(MOCK_CONTROL_SIGNALS)}
+
+
+# The provider SDKs are imported only when their backend is created.
+LLM_BACKENDS = {
+    "openai": OpenAIBackend,
+    "claude": ClaudeBackend,
+    "mock": MockBackend,
+}
+
+
+def get_backend_class(name):
+    """Returns the backend class registered as 'name'."""
+    if name not in LLM_BACKENDS:
+        raise ValueError(f"Unknown LLM backend '{name}', expected one of: {', '.join(sorted(LLM_BACKENDS))}")
+    return LLM_BACKENDS[name]
+
+
+def create_backend(name, **options):
+    """Creates the backend registered as 'name' with the given options, importing its SDK if it has one."""
+    return get_backend_class(name)(**options)
@@ -0,0 +1,72 @@
+# Copyright (c) 2024 texer.ai. All rights reserved.
+import glob
+import hashlib
+import json
+import os
+
+from source.parse_cache import CACHE_DIR, write_json_atomic
+
+# Bump whenever the format of the cached responses changes, so stale entries are never loaded.
+LLM_CACHE_VERSION = 1
+LLM_CACHE_FILE_PREFIX = "llm_"
+LLM_CACHE_MAX_SIZE = 64 << 20
+
+
+def text_digest(text):
+    """Returns the SHA-256 of the text 'text'."""
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+class LLMCache:
+    # An on-disk cache of LLM responses keyed by the module source, the target signals, the model and the prompt.
+    # 'evict' drops the least recently used entries once the cache has grown beyond 'max_size' bytes.
+    def __init__(self, cache_dir=CACHE_DIR, max_size=LLM_CACHE_MAX_SIZE):
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+
+    def make_key(self, module_content, signals, model_name, prompt):
+        """Builds the cache key from the module source, the sorted target signals, the model name and the prompt text."""
+        hasher = hashlib.sha256()
+        hasher.update(f"{LLM_CACHE_VERSION}\n{text_digest(module_content)}\n{model_name}\n{text_digest(prompt)}\n".encode())
+        for signal in sorted(signals):
+            hasher.update(f"{signal}\n".encode())
+        return hasher.hexdigest()
+
+    def __entry_path(self, key):
+        return os.path.join(self.cache_dir, f"{LLM_CACHE_FILE_PREFIX}{key}.json")
+
+    def load(self, key):
+        """Returns the cached response for 'key', or None on a miss or a corrupt entry. A hit marks the entry as used."""
+        entry_path = self.__entry_path(key)
+        try:
+            with open(entry_path, "r") as infile:
+                response = json.load(infile)["response"]
+            os.utime(entry_path)
+            return response
+        except (OSError, KeyError, TypeError, json.JSONDecodeError):
+            return None
+
+    def store(self, key, response):
+        """Stores the response under 'key'."""
+        write_json_atomic(self.__entry_path(key), {"response": response})
+
+    def evict(self):
+        """Drops the least recently used entries beyond the size limit. Lists the whole cache, so it is meant to run
+        once per analysis run rather than after every store."""
+        entries = []
+        for entry_path in glob.glob(os.path.join(self.cache_dir, f"{LLM_CACHE_FILE_PREFIX}*.json")):
+            try:
+                stat = os.stat(entry_path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime_ns, stat.st_size, entry_path))
+
+        total_size = sum(size for _, size, _ in entries)
+        for _, size, entry_path in sorted(entries):
+            if total_size <= self.max_size:
+                break
+            try:
+                os.remove(entry_path)
+            except OSError:
+                pass
+            total_size -= size
@@ -1,11 +1,19 @@
 # Copyright (c) 2024 texer.ai. All rights reserved.
 
+import asyncio
+import collections
 import json
-import anthropic
-import openai
-import tiktoken
+import queue
 import sys
-import time
+import threading
+
+from source.llm_backends import create_backend, get_backend_class
+from source.llm_rate_limiter import RateLimiter, call_with_retries
+from source.module_chunker import merge_window_results, pack_into_batches, referenced_signals, split_into_windows
+from source.module_fingerprint import map_identifiers, structural_fingerprint
+from source.prompt_compactor import compact_verilog, dedupe_signal_names, module_span
+from source.signal_ranker import select_top_signals
+from source.token_estimator import count_tokens, estimate_tokens_from_length, format_tokens
 
 ROLE = "You are a Verilog design verification expert specializing in signal analysis and testability."
 
@@ -58,16 +66,158 @@ Respond with ONLY valid JSON in the following format, without any additional tex
 Do not include any explanatory text before or after the JSON output.
 """
 
+BATCH_DOCUMENT = """
+<document>
+    <source>{}</source>
+    <targets>{}</targets>
+    <document_content>
+        {}
+    </document_content>
+</document>
+"""
+
+BATCH_PROMPT = """
+{}
+
+Given several Verilog processor modules, each with a list of target signals, identify for every module which of its
+signals can be safely fuzzed (randomized) without affecting core functionality. Consider only signals from the list
+of the same module. A signal is considered safe if:
+- It can be modified through AND/OR gates while maintaining correct operation.
+
+Focus on internal signals of these types:
+- Handshake/flow control signals
+- Status flags (ready, busy, full)
+- Debug/monitoring signals
+- Optional feature controls
+- Performance-related signals
+
+Exclude:
+- Instance ports (connections to submodule instances)
+
+Also, identify the primary clock and reset signals that control synchronous logic of every module.
+
+Respond with ONLY valid JSON in the following format, with one entry per module keyed by its <source>, without any
+additional text:
+{{
+    "<source>": {{
+        "fuzz_candidates": {{
+            "signals": [
+                {{
+                    "name": string,            // Use local signal name without hierarchy
+                    "certainty": integer,      // Fuzzing safety confidence (0-100)
+                    "explanation": string      // Justification for fuzzing safety
+                }}
+            ],
+            "note": string  // Optional. Include only for critical design observations
+                            // or potential edge cases. Keep to one sentence.
+        }},
+        "control_signals": {{
+            "clock": string,    // Clock signal name
+            "reset": string,    // Reset signal name
+            "edge": string      // "posedge"|"negedge" for clock
+        }}
+    }}
+}}
+
+Do not include any explanatory text before or after the JSON output.
+"""
+
+# Per-minute limits of the LLM API, and the number of requests kept in flight at once.
 TOKEN_LIMIT = 80000
+REQUEST_LIMIT = 50
+MAX_CONCURRENT_REQUESTS = 8
+MAX_OUTPUT_TOKENS = 1024
+
+# Modules whose prompt exceeds MAX_PROMPT_TOKENS are analysed in overlapping windows of CHUNK_WINDOW_TOKENS.
+MAX_PROMPT_TOKENS = 16000
+CHUNK_WINDOW_TOKENS = 8000
+CHUNK_OVERLAP_TOKENS = 400
+
+# Modules of up to PACK_MODULE_MAX_TOKENS are packed into requests of up to PACK_TOKEN_LIMIT tokens and
+# PACK_MAX_MODULES modules, a pack token limit of 0 disables packing.
+PACK_TOKEN_LIMIT = 6000
+PACK_MODULE_MAX_TOKENS = 1500
+PACK_MAX_MODULES = 8
+
+# Only the TOP_SIGNALS best ranked signals of a module are sent to the LLM, 0 sends all of them.
+TOP_SIGNALS = 64
+
+
+# Fields of the control signals every analysis must report.
+CONTROL_SIGNAL_NAMES = ("clock", "reset", "edge")
+
+
+def validate_analysis(data):
+    # Raises a ValueError unless 'data' is an analysis of the format the prompts ask for, so that a malformed response
+    # fails its own module only and is never cached.
+    if not isinstance(data, dict):
+        raise ValueError(f"LLM response is not a JSON object: {data}")
+
+    fuzz_candidates = data.get("fuzz_candidates")
+    if not isinstance(fuzz_candidates, dict) or not isinstance(fuzz_candidates.get("signals"), list):
+        raise ValueError(f"LLM response has no list of fuzz candidate signals: {data}")
+    for signal in fuzz_candidates["signals"]:
+        if not isinstance(signal, dict) or not isinstance(signal.get("name"), str):
+            raise ValueError(f"LLM response has a fuzz candidate without a name: {signal}")
+        if isinstance(signal.get("certainty"), bool) or not isinstance(signal.get("certainty"), (int, float)):
+            raise ValueError(f"LLM response has a fuzz candidate without a numeric certainty: {signal}")
+
+    control_signals = data.get("control_signals")
+    if not isinstance(control_signals, dict) or not all(isinstance(control_signals.get(name), str) for name in CONTROL_SIGNAL_NAMES):
+        raise ValueError(f"LLM response has no clock, reset and edge control signals: {data}")
+    return data
+
+
+def load_cached_analysis(llm_cache, cache_key):
+    # Returns the cached analysis for 'cache_key', or None on a miss or an entry that is not a valid analysis.
+    response = llm_cache.load(cache_key)
+    if response is None:
+        return None
+    try:
+        return validate_analysis(json.loads(response))
+    except ValueError:
+        return None
 
 
 class LLMCommunicator:
-    def __init__(self, modules, model_type="openai"):
+    def __init__(
+        self,
+        modules,
+        model_type="openai",
+        base_url=None,
+        max_concurrent_requests=MAX_CONCURRENT_REQUESTS,
+        llm_cache=None,
+        pack_tokens=PACK_TOKEN_LIMIT,
+        backend_options=None,
+        top_signals=TOP_SIGNALS,
+        toggle_activity=None,
+    ):
         self.modules = modules
         self.model_type = model_type
+        self.model_name = get_backend_class(model_type).MODEL_NAME
+        self.llm_cache = llm_cache
+        self.base_url = base_url
+        self.backend_options = dict(backend_options or {})
+        self.backend = None
+        self.results = None
+        self.messages = []
+        self.thread = None
+        self.loop = None
+        self.main_task = None
+        self.max_concurrent_requests = max_concurrent_requests
+        self.pack_tokens = pack_tokens
+        self.top_signals = top_signals
+        self.toggle_activity = toggle_activity
         sys.stdout.write("\x1b[2J\x1b[H")
         print(f"LLMCommunicator is initialized with {len(self.modules)} module(s) to process.\n")
 
+    def log(self, message):
+        # Messages of a background analysis are kept for the signal explorer instead of being printed over it.
+        if self.results is None:
+            print(message)
+        else:
+            self.messages.append(message.strip())
+
     def __read_module_content(self, module_path):
         try:
             with open(module_path, "r") as f:
@@ -75,101 +225,356 @@ class LLMCommunicator:
         except (IOError, FileNotFoundError) as e:
             raise FileNotFoundError(f"Could not read module at {module_path}: {str(e)}")
 
+    def __create_backend(self):
+        # The backend imports the SDK of its provider, so only the selected one is ever loaded.
+        options = dict(self.backend_options)
+        if self.base_url is not None:
+            options["base_url"] = self.base_url
+        return create_backend(self.model_type, **options)
+
     def count_module_tokens(self, module_content):
-        if self.model_type == "openai":
-            try:
-                encoding = tiktoken.encoding_for_model("gpt-4o-2024-05-13")
-            except KeyError:
-                encoding = tiktoken.get_encoding("cl100k_base")
-            return len(encoding.encode(module_content))
-        else:
-            return self.claude.beta.messages.count_tokens(
-                model="claude-3-5-sonnet-20241022",
-                messages=[
-                    {"role": "user", "content": module_content},
-                ],
-            ).input_tokens
-
-    def analyze_module(self, module_path, signals, module_content):
+        # Counted locally: exactly with the cached encoder for OpenAI models, estimated for the others.
+        return count_tokens(module_content, self.model_type)
+
+    def compact_prompt(self, module_path, module_name, signal_widths, module_content, toggle_counts=None):
+        # Keeps only the declaration of the analysed module without comments and redundant whitespace, and the
+        # base names of the best ranked target signals. Reports the prompt size before and after, estimated from the
+        # length, since the prompt may still be answered from the cache. The sent prompt is counted when it is sent.
+        signals = list(signal_widths)
+        compacted_content = compact_verilog(module_span(module_content, module_name))
+        compacted_signals = dedupe_signal_names(signals)
+        num_signals = len(compacted_signals)
+        compacted_signals = select_top_signals(compacted_content, compacted_signals, signal_widths, self.top_signals, toggle_counts)
+        if len(compacted_signals) < num_signals:
+            self.log(f"Ranked the signals of {module_path}: sending the best {len(compacted_signals)} of {num_signals}.")
+
+        file_name = module_path.split("/")[-1]
+        tokens_before = estimate_tokens_from_length(PROMPT.format(file_name, signals, module_content))
+        tokens_after = estimate_tokens_from_length(PROMPT.format(file_name, compacted_signals, compacted_content))
+        self.log(f"Compacted the prompt of {module_path}: {format_tokens(tokens_before)} -> {format_tokens(tokens_after)} tokens.")
+
+        return compacted_content, compacted_signals
+
+    async def __analyze_window(self, module_path, signals, module_content, backend, rate_limiter, request_slots):
+        # Analyses a module or a window of it with a single request, answered from the cache if possible.
         module_name = module_path.split("/")[-1]
-        print(f"\nAnalyzing module: {module_path}")
+        prompt = PROMPT.format(module_name, signals, module_content)
+
+        cache_key = None
+        if self.llm_cache is not None:
+            cache_key = self.llm_cache.make_key(module_content, signals, self.model_name, ROLE + PROMPT)
+            data = load_cached_analysis(self.llm_cache, cache_key)
+            if data is not None:
+                self.log(f"Using the cached analysis of {module_path}.")
+                return data
+
+        num_tokens = self.count_module_tokens(prompt) + MAX_OUTPUT_TOKENS
+
+        async def request():
+            # Every attempt, retries included, waits for its share of the rate limits.
+            if rate_limiter is not None:
+                await rate_limiter.acquire(num_tokens)
+            async with request_slots:
+                return await backend.complete(ROLE, prompt, MAX_OUTPUT_TOKENS)
+
+        response = await call_with_retries(request)
         try:
-            if self.model_type == "openai":
-                response_content = openai.ChatCompletion.create(
-                    model="gpt-4o-2024-05-13",
-                    max_tokens=1024,
-                    temperature=0,
-                    messages=[{"role": "system", "content": ROLE}, {"role": "user", "content": PROMPT.format(module_name, signals, module_content)}],
-                    response_format={"type": "json_object"},
-                )
+            data = json.loads(response)
+        except json.JSONDecodeError:
+            raise ValueError(f"LLM response is not a valid JSON: {response}")
+        validate_analysis(data)
+
+        if cache_key is not None:
+            self.llm_cache.store(cache_key, response)
+        return data
+
+    async def analyze_module(self, module_path, signals, module_content, backend, rate_limiter, request_slots):
+        self.log(f"\nAnalyzing module: {module_path}")
+        try:
+            # Modules too large for one request are split into overlapping windows, each window is analysed for the
+            # signals it references and the results are merged.
+            windows = [module_content]
+            if self.count_module_tokens(PROMPT.format(module_path.split("/")[-1], signals, module_content)) > MAX_PROMPT_TOKENS:
+                windows = split_into_windows(module_content, CHUNK_WINDOW_TOKENS, CHUNK_OVERLAP_TOKENS, self.model_type)
 
-                response = response_content.choices[0].message.content
+            if len(windows) == 1:
+                data = await self.__analyze_window(module_path, signals, module_content, backend, rate_limiter, request_slots)
             else:
-                response = (
-                    self.claude.messages.create(
-                        model="claude-3-5-sonnet-20241022",
-                        max_tokens=1024,
-                        temperature=0,
-                        system=ROLE,
-                        messages=[
-                            {
-                                "role": "user",
-                                "content": [
-                                    {
-                                        "type": "text",
-                                        "text": PROMPT.format(module_name, signals, module_content),
-                                    }
-                                ],
-                            }
-                        ],
+                self.log(f"Analyzing {module_path} in {len(windows)} windows.")
+                window_jobs = [(referenced_signals(window, signals), window) for window in windows]
+                window_jobs = [(window_signals, window) for window_signals, window in window_jobs if window_signals] or [(list(signals), windows[0])]
+                responses = await asyncio.gather(
+                    *(
+                        self.__analyze_window(module_path, window_signals, window, backend, rate_limiter, request_slots)
+                        for window_signals, window in window_jobs
                     )
-                    .content[0]
-                    .text
                 )
-
-            data = json.loads(response)
+                data = merge_window_results([(window_signals, response) for (window_signals, _), response in zip(window_jobs, responses)])
 
             validated_fuzz_candidates = [signal for signal in data["fuzz_candidates"]["signals"] if signal["name"] in signals]
             control_signals = data["control_signals"]
 
-            print(f"Successfully analyzed {module_path}: found {len(validated_fuzz_candidates)} signals.")
+            self.log(f"Successfully analyzed {module_path}: found {len(validated_fuzz_candidates)} signals.")
             if "note" in data["fuzz_candidates"]:
-                print(f"Note: {data['fuzz_candidates']['note']}")
+                self.log(f"Note: {data['fuzz_candidates']['note']}")
 
             return validated_fuzz_candidates, control_signals
 
-        except anthropic.APIError as e:
+        except backend.api_errors as e:
             raise RuntimeError(f"API error while analyzing {module_path}: {str(e)}")
-        except openai.BadRequestError as e:
-            raise RuntimeError(f"API error while analyzing {module_path}: {str(e)}")
-        except json.JSONDecodeError:
-            raise ValueError(f"LLM response is not a valid JSON: {response_content}")
 
-    def run(self):
-        print("Starting module analysis...")
-        total_tokens = 0
-        last_request_time = time.time()
+    async def analyze_batch(self, declarations, backend, rate_limiter, request_slots):
+        # Analyses several small modules, given as (source key, path, content, signals), with a single request. Returns
+        # the (fuzz candidates, control signals) of every module found in the response, keyed by its source key.
+        results = {}
+        cache_keys = {}
+        pending = []
+        for source_key, path, content, signals in declarations:
+            if self.llm_cache is not None:
+                cache_keys[source_key] = self.llm_cache.make_key(content, signals, self.model_name, ROLE + BATCH_PROMPT)
+                module_data = load_cached_analysis(self.llm_cache, cache_keys[source_key])
+                if module_data is not None:
+                    self.log(f"Using the cached analysis of {path}.")
+                    results[source_key] = module_data
+                    continue
+            pending.append((source_key, path, content, signals))
+
+        if pending:
+            self.log(f"\nAnalyzing {len(pending)} modules in one request: {', '.join(path for _, path, _, _ in pending)}")
+            documents = "".join(BATCH_DOCUMENT.format(source_key, signals, content) for source_key, _, content, signals in pending)
+            prompt = BATCH_PROMPT.format(documents)
+            max_tokens = MAX_OUTPUT_TOKENS * len(pending)
+            num_tokens = self.count_module_tokens(prompt) + max_tokens
+
+            async def request():
+                if rate_limiter is not None:
+                    await rate_limiter.acquire(num_tokens)
+                async with request_slots:
+                    return await backend.complete(ROLE, prompt, max_tokens)
+
+            try:
+                response = await call_with_retries(request)
+                data = json.loads(response)
+            except backend.api_errors as e:
+                raise RuntimeError(f"API error while analyzing a batch of {len(pending)} modules: {str(e)}")
+            except json.JSONDecodeError:
+                self.log("Warning: LLM response to a batch is not a valid JSON, the modules are analyzed one by one.")
+                data = {}
+
+            for source_key, _, _, _ in pending:
+                module_data = data.get(source_key) if isinstance(data, dict) else None
+                try:
+                    validate_analysis(module_data)
+                except ValueError:
+                    continue
+                results[source_key] = module_data
+                if self.llm_cache is not None:
+                    self.llm_cache.store(cache_keys[source_key], json.dumps(module_data))
+
+        analyzed = {}
+        for source_key, path, _, signals in declarations:
+            if source_key not in results:
+                continue
+            module_data = results[source_key]
+            validated_fuzz_candidates = [signal for signal in module_data["fuzz_candidates"]["signals"] if signal["name"] in signals]
+            self.log(f"Successfully analyzed {path}: found {len(validated_fuzz_candidates)} signals.")
+            if "note" in module_data["fuzz_candidates"]:
+                self.log(f"Note: {module_data['fuzz_candidates']['note']}")
+            analyzed[source_key] = (validated_fuzz_candidates, module_data["control_signals"])
+        return analyzed
 
+    def pack_declarations(self, declarations):
+        # Bin-packs the small declarations into batches, every large declaration gets a batch of its own.
+        if self.pack_tokens <= 0:
+            return [[declaration] for declaration in declarations]
+
+        small = []
+        batches = []
+        for declaration in declarations:
+            _, _, content, signals, _ = declaration
+            num_tokens = self.count_module_tokens(BATCH_DOCUMENT.format("", signals, content))
+            if num_tokens <= PACK_MODULE_MAX_TOKENS:
+                small.append((declaration, num_tokens))
+            else:
+                batches.append([declaration])
+
+        for indices in pack_into_batches([num_tokens for _, num_tokens in small], self.pack_tokens, PACK_MAX_MODULES):
+            batches.append([small[i][0] for i in indices])
+        return batches
+
+    def merge_variants(self, declarations):
+        # Declarations with the same structural fingerprint, e.g. variants of a module that only differ in parameter
+        # values or in a prefix, are analysed once. The first of them is analysed for the signals of all, mapped to
+        # its names. Returns the declarations to analyse, and for each of them, keyed by its first instance, the
+        # instances of its variants with the mapping of its names to theirs.
+        representatives = {}
+        merged = []
+        variants = {}
+        for declaration in declarations:
+            declaration_name, path, content, signals, instance_names = declaration
+            fingerprint, identifiers = structural_fingerprint(content)
+            if fingerprint not in representatives:
+                representatives[fingerprint] = (len(merged), identifiers)
+                merged.append(declaration)
+                continue
+
+            index, representative_identifiers = representatives[fingerprint]
+            to_representative = map_identifiers(identifiers, representative_identifiers)
+            representative = merged[index]
+            representative_signals = list(representative[3])
+            for signal in signals:
+                if signal in to_representative and to_representative[signal] not in representative_signals:
+                    representative_signals.append(to_representative[signal])
+            merged[index] = representative[:3] + (representative_signals,) + representative[4:]
+
+            variants.setdefault(representative[4][0], []).append((instance_names, map_identifiers(representative_identifiers, identifiers)))
+            self.log(f"Reusing the analysis of {representative[1]} for {path}, the modules have the same structure.")
+        return merged, variants
+
+    def __batch_instances(self, batch, variants):
+        # The instances whose result depends on the batch, the ones of the variants of its declarations included.
+        instance_names = []
+        for declaration in batch:
+            instance_names.extend(declaration[4])
+            for variant_instance_names, _ in variants.get(declaration[4][0], []):
+                instance_names.extend(variant_instance_names)
+        return instance_names
+
+    def group_instances(self):
+        # Groups the selected instances by their (module name, declaration path), every group is analysed once.
+        groups = {}
         for module_name, module_info in self.modules.items():
-            path = module_info["declaration_path"]
-            rtl_patcher_signals = module_info["signal_width_data"].keys()
+            group_key = (module_info.get("module_name"), module_info["declaration_path"])
+            groups.setdefault(group_key, []).append(module_name)
+        return groups
+
+    async def run_async(self):
+        self.log("Starting module analysis...")
+        backend = self.__create_backend()
+        self.backend = backend
+        # Only the providers enforce rate limits, a local backend is limited by the request slots alone.
+        rate_limiter = RateLimiter(REQUEST_LIMIT, TOKEN_LIMIT) if backend.RATE_LIMITED else None
+        request_slots = asyncio.Semaphore(self.max_concurrent_requests)
+        groups = self.group_instances()
+
+        # Every declaration is analysed with the union of the signals of its instances.
+        declarations = []
+        for (declaration_name, path), instance_names in groups.items():
+            signal_width_data = {}
+            toggle_counts = None
+            for module_name in instance_names:
+                signal_width_data.update(self.modules[module_name]["signal_width_data"])
+                if self.toggle_activity is not None:
+                    toggle_counts = toggle_counts or collections.Counter()
+                    toggle_counts.update(self.toggle_activity.get(module_name, {}))
             content = self.__read_module_content(path)
-            num_tokens = self.count_module_tokens(content)
+            content, rtl_patcher_signals = self.compact_prompt(path, declaration_name, signal_width_data, content, toggle_counts)
+            declarations.append((declaration_name, path, content, rtl_patcher_signals, instance_names))
+        declarations, variants = self.merge_variants(declarations)
+
+        def share_instances(instance_names, fuzz_candidates, control_signals):
+            for module_name in instance_names:
+                instance_signals = self.modules[module_name]["signal_width_data"]
+                self.modules[module_name]["fuzz_candidates"] = [signal for signal in fuzz_candidates if signal["name"] in instance_signals]
+                self.modules[module_name]["control_signals"] = control_signals
+                if self.results is not None:
+                    self.results.put((module_name, self.modules[module_name]))
+
+        def share(instance_names, fuzz_candidates, control_signals):
+            # The result of a declaration is shared with its instances and, in their own names, with its variants.
+            share_instances(instance_names, fuzz_candidates, control_signals)
+            for variant_instance_names, names in variants.get(instance_names[0], []):
+                variant_fuzz_candidates = [dict(signal, name=names[signal["name"]]) for signal in fuzz_candidates if signal["name"] in names]
+                variant_control_signals = {key: names.get(value, value) for key, value in control_signals.items()}
+                share_instances(variant_instance_names, variant_fuzz_candidates, variant_control_signals)
 
-            if total_tokens + num_tokens >= TOKEN_LIMIT:
-                time_since_last = time.time() - last_request_time
-                if time_since_last < 60:
-                    wait_time = 60 - time_since_last
-                    print(f"\nApproaching rate limit. Waiting {wait_time:.1f} seconds...")
-                    time.sleep(wait_time)
+        async def guarded(analysis, instance_names):
+            # In the background a failed analysis is reported for its modules, the other modules go on. Any error is
+            # caught here, so that an unexpected one cannot cancel the analyses of the other modules either.
+            try:
+                await analysis
+            except Exception as e:
+                if self.results is None:
+                    raise
+                self.log(f"Failed to analyze {', '.join(instance_names)}: {e}")
+                for module_name in instance_names:
+                    self.results.put((module_name, e))
+
+        async def analyze(declaration):
+            _, path, content, rtl_patcher_signals, instance_names = declaration
+            fuzz_candidates, control_signals = await self.analyze_module(path, rtl_patcher_signals, content, backend, rate_limiter, request_slots)
+            share(instance_names, fuzz_candidates, control_signals)
+
+        async def analyze_batch(batch):
+            # The modules are keyed by their name in the prompt, modules missing from the response are analysed alone.
+            source_keys = []
+            for declaration_name, path, _, _, _ in batch:
+                source_key = declaration_name or path.split("/")[-1]
+                while source_key in source_keys:
+                    source_key += "_"
+                source_keys.append(source_key)
 
-                total_tokens = 0
-                last_request_time = time.time()
+            batch_declarations = [(source_key, path, content, signals) for source_key, (_, path, content, signals, _) in zip(source_keys, batch)]
+            analyzed = await self.analyze_batch(batch_declarations, backend, rate_limiter, request_slots)
+            missing_declarations = []
+            for source_key, declaration in zip(source_keys, batch):
+                if source_key in analyzed:
+                    share(declaration[4], *analyzed[source_key])
+                else:
+                    missing_declarations.append(declaration)
 
-            total_tokens += num_tokens
-            fuzz_candidates, control_signals = self.analyze_module(path, rtl_patcher_signals, content)
-            self.modules[module_name]["fuzz_candidates"] = fuzz_candidates
-            self.modules[module_name]["control_signals"] = control_signals
+            # The missing modules are analysed concurrently, the rate limiter and the request slots bound the requests.
+            await asyncio.gather(*(guarded(analyze(declaration), self.__batch_instances([declaration], variants)) for declaration in missing_declarations))
 
-        print(f"\nAnalysis complete. Processed {len(self.modules)} modules.\n")
+        batches = self.pack_declarations(declarations)
+        tasks = [
+            asyncio.create_task(guarded(analyze(batch[0]) if len(batch) == 1 else analyze_batch(batch), self.__batch_instances(batch, variants)))
+            for batch in batches
+        ]
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await backend.close()
+            # The cache is trimmed once per run, off the event loop, rather than after every stored response.
+            if self.llm_cache is not None:
+                await asyncio.to_thread(self.llm_cache.evict)
+
+        self.log(f"\nAnalysis complete. Processed {len(self.modules)} modules, {len(groups)} declaration(s) in {len(batches)} batch(es).\n")
         return self.modules
+
+    def run(self):
+        return asyncio.run(self.run_async())
+
+    def __run_in_background(self):
+        try:
+            self.loop.run_until_complete(self.main_task)
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            # The modules still pending when the analysis stopped are reported with its error.
+            self.results.put((None, e))
+        finally:
+            self.loop.close()
+
+    def start(self):
+        # Runs the analysis on a background thread. Every analysed module is put on 'self.results' as soon as it is
+        # done, as a (module name, module info) pair, or a (module name, error) pair if its analysis failed.
+        self.results = queue.Queue()
+        self.loop = asyncio.new_event_loop()
+        self.main_task = self.loop.create_task(self.run_async())
+        self.thread = threading.Thread(target=self.__run_in_background, daemon=True)
+        self.thread.start()
+        return self.results
+
+    def stop(self):
+        # Cancels the requests of a background analysis that are still running and waits for it to wind down.
+        if self.thread is None:
+            return
+        try:
+            self.loop.call_soon_threadsafe(self.main_task.cancel)
+        except RuntimeError:
+            # The event loop is already closed, the analysis has finished.
+            pass
+        self.thread.join()
@@ -0,0 +1,78 @@
+# Copyright (c) 2024 texer.ai. All rights reserved.
+import asyncio
+import random
+import time
+
+# Retry policy for rate limited (429) and failed (5xx) requests: full jitter exponential backoff.
+LLM_MAX_RETRIES = 6
+LLM_RETRY_BASE_DELAY = 1.0
+LLM_RETRY_MAX_DELAY = 60.0
+
+HTTP_STATUS_TOO_MANY_REQUESTS = 429
+HTTP_STATUS_SERVER_ERROR = 500
+
+# Connection errors of the OpenAI and Anthropic SDKs, matched by name so that neither SDK has to be imported here.
+RETRYABLE_SDK_ERRORS = frozenset(["APIConnectionError", "APITimeoutError"])
+
+
+class RateLimiter:
+    # A token bucket for requests and one for tokens, both refilled continuously up to their per-minute limits,
+    # the way the LLM providers enforce them. Waiters are served in arrival order.
+    def __init__(self, requests_per_minute, tokens_per_minute, clock=time.monotonic, sleep=asyncio.sleep):
+        self.request_capacity = requests_per_minute
+        self.token_capacity = tokens_per_minute
+        self.clock = clock
+        self.sleep = sleep
+        self.requests = float(requests_per_minute)
+        self.tokens = float(tokens_per_minute)
+        self.last_refill = clock()
+        self.lock = asyncio.Lock()
+
+    def __refill(self):
+        now = self.clock()
+        elapsed = now - self.last_refill
+        self.last_refill = now
+        self.requests = min(self.request_capacity, self.requests + elapsed * self.request_capacity / 60)
+        self.tokens = min(self.token_capacity, self.tokens + elapsed * self.token_capacity / 60)
+
+    async def acquire(self, num_tokens):
+        """Waits until one request and 'num_tokens' tokens are available and takes them.
+        A request larger than the token limit waits for a full bucket instead of forever."""
+        num_tokens = min(num_tokens, self.token_capacity)
+        async with self.lock:
+            while True:
+                self.__refill()
+                if self.requests >= 1 and self.tokens >= num_tokens:
+                    self.requests -= 1
+                    self.tokens -= num_tokens
+                    return
+
+                request_wait = (1 - self.requests) * 60 / self.request_capacity
+                token_wait = (num_tokens - self.tokens) * 60 / self.token_capacity
+                await self.sleep(max(request_wait, token_wait))
+
+
+def is_retryable_error(error):
+    """Returns True for rate limit (429) and server (5xx) errors, as well as dropped connections and timeouts."""
+    status_code = getattr(error, "status_code", None)
+    if status_code is not None:
+        return status_code == HTTP_STATUS_TOO_MANY_REQUESTS or status_code >= HTTP_STATUS_SERVER_ERROR
+    return isinstance(error, (ConnectionError, asyncio.TimeoutError)) or type(error).__name__ in RETRYABLE_SDK_ERRORS
+
+
+def retry_delay(attempt, base_delay=LLM_RETRY_BASE_DELAY, max_delay=LLM_RETRY_MAX_DELAY):
+    """Returns a random delay between zero and the exponential backoff of 'attempt', capped at 'max_delay'."""
+    return random.uniform(0, min(max_delay, base_delay * 2**attempt))
+
+
+async def call_with_retries(request, max_retries=LLM_MAX_RETRIES, sleep=asyncio.sleep):
+    """Awaits 'request()' and retries it on retryable errors with jittered backoff, up to 'max_retries' times."""
+    attempt = 0
+    while True:
+        try:
+            return await request()
+        except Exception as e:
+            if attempt >= max_retries or not is_retryable_error(e):
+                raise
+            await sleep(retry_delay(attempt))
+            attempt += 1
@@ -1,8 +1,11 @@
 # Copyright (c) 2024 texer.ai. All rights reserved.
+
+
 class DesignExplorerModel:
-    def __init__(self):
+    def __init__(self, source_index=None):
         self.json_design_hierarchy = {}
         self.design_module_list = {}
+        self.source_index = source_index
         self.working_list = []
         self.working_list_ids = []
         self.command_buffer = ""
@@ -15,6 +18,22 @@ class DesignExplorerModel:
             i += 1
         self.filter("")
 
+    def module_tokens(self, id):
+        # Estimated when the declaration file is scanned and stored in the source index. The exact count is only taken
+        # on the LLM path. Instances of one declaration share the estimate.
+        if self.source_index is None:
+            return None
+        data = self.json_design_hierarchy[self.design_module_list[id]]
+        return self.source_index.module_tokens(data.get("declaration_path"), data.get("module_name"))
+
+    def selection_tokens(self, selected_ids):
+        # Instances of the same declaration are analysed once, so they are only counted once.
+        declarations = {}
+        for id in selected_ids:
+            data = self.json_design_hierarchy[self.design_module_list[id]]
+            declarations[(data.get("module_name"), data.get("declaration_path"))] = self.module_tokens(id) or 0
+        return sum(declarations.values())
+
     def get_model_range(self, start, end):
         if start >= end:
             return []
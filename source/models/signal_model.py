@@ -1,8 +1,15 @@
 # Copyright (c) 2024 texer.ai. All rights reserved.
+from source.enums import AnalysisStatus
+
+
 class SignalExplorerModel:
     def __init__(self):
         self.all_signals = {}
         self.selected_signals = {}
+        self.module_status = {}
+        self.module_errors = {}
+        self.working_list = []
+        self.working_list_ids = []
 
     def flatten_data(self, modules_with_signals):
         flattened = {}
@@ -22,13 +29,45 @@ class SignalExplorerModel:
         return flattened
 
     def load_signals(self, modules_with_signals):
-        self.all_signals = self.flatten_data(modules_with_signals)
-        i = 0
-        for signal, data in self.all_signals.items():
-            self.selected_signals[i] = f"{signal} | Fuzzing safety confidence: {data['certainty']}"
-            i += 1
+        for module, module_info in modules_with_signals.items():
+            self.add_module(module, module_info)
         self.filter("")
 
+    def track_modules(self, module_names):
+        # The modules whose analysis is still running, their signals are added as their results arrive.
+        for module in module_names:
+            self.module_status.setdefault(module, AnalysisStatus.PENDING)
+
+    def add_module(self, module, module_info):
+        # Signals keep the id they got on arrival, so the ids already selected stay valid while results stream in.
+        if self.module_status.get(module) == AnalysisStatus.DONE:
+            return
+        self.module_status[module] = AnalysisStatus.DONE
+        flattened = self.flatten_data({module: module_info})
+        for signal, data in flattened.items():
+            if signal not in self.all_signals:
+                self.selected_signals[len(self.selected_signals)] = f"{signal} | Fuzzing safety confidence: {data['certainty']}"
+            self.all_signals[signal] = data
+
+    def fail_module(self, module, error):
+        if module is None:
+            # The whole analysis stopped, every module still pending failed with it.
+            for pending_module in self.pending_modules():
+                self.fail_module(pending_module, error)
+        elif self.module_status.get(module, AnalysisStatus.PENDING) == AnalysisStatus.PENDING:
+            self.module_status[module] = AnalysisStatus.FAILED
+            self.module_errors[module] = str(error)
+
+    def pending_modules(self, modules=None):
+        if modules is None:
+            modules = self.module_status.keys()
+        return [module for module in modules if self.module_status.get(module) == AnalysisStatus.PENDING]
+
+    def analysis_progress(self):
+        # Returns the number of analysed and failed modules out of all tracked modules.
+        statuses = list(self.module_status.values())
+        return statuses.count(AnalysisStatus.DONE), statuses.count(AnalysisStatus.FAILED), len(statuses)
+
     def filter(self, keyword):
         self.working_list = []
         self.working_list_ids = []
@@ -0,0 +1,115 @@
+# Copyright (c) 2024 texer.ai. All rights reserved.
+import collections
+
+from source.sv_lexer import TOKEN_KIND_ID, scan_verilog, tokenize
+from source.token_estimator import count_tokens
+
+# Tokens after which a module body may be split into windows.
+CHUNK_BOUNDARY_TOKENS = frozenset([";", "begin", "end", "endcase", "endgenerate", "endfunction", "endtask"])
+
+
+def split_statements(module_body):
+    """Splits a module body into consecutive pieces that each end at a statement boundary."""
+    statements = []
+    last_end = 0
+    for token in tokenize(module_body):
+        if token.value in CHUNK_BOUNDARY_TOKENS:
+            statements.append(module_body[last_end : token.end])
+            last_end = token.end
+    if module_body[last_end:].strip():
+        statements.append(module_body[last_end:])
+    return statements
+
+
+def split_into_windows(module_code, max_tokens, overlap_tokens, model_type="openai"):
+    """Splits a module into windows of at most 'max_tokens' tokens at statement boundaries. Every window repeats the
+    module header and up to 'overlap_tokens' tokens from the end of the previous window's body. A single statement larger than
+    the budget gets a window of its own. Returns the module unsplit if it is not a single complete module."""
+    modules = scan_verilog(module_code).modules
+    if len(modules) != 1 or modules[0].header_end is None or modules[0].body_end is None:
+        return [module_code]
+
+    module = modules[0]
+    header = module_code[module.start : module.header_end]
+    footer = module_code[module.body_end : module.end]
+    budget = max(1, max_tokens - count_tokens(header + footer, model_type))
+
+    statements = [(statement, count_tokens(statement, model_type)) for statement in split_statements(module_code[module.header_end : module.body_end])]
+
+    windows = []
+    window = []
+    window_tokens = 0
+    for statement, num_tokens in statements:
+        if window and window_tokens + num_tokens > budget:
+            windows.append(window)
+            # Carry the tail of the finished window over, so statements at the cut are seen with their context. The
+            # overlap never takes more than half of a window, so every window makes progress.
+            overlap = []
+            overlap_size = 0
+            for previous in reversed(window):
+                if overlap_size + previous[1] > min(overlap_tokens, budget // 2, budget - num_tokens):
+                    break
+                overlap.insert(0, previous)
+                overlap_size += previous[1]
+            window = overlap
+            window_tokens = overlap_size
+        window.append((statement, num_tokens))
+        window_tokens += num_tokens
+    if window or not windows:
+        windows.append(window)
+
+    return [f"{header}{''.join(statement for statement, _ in window)}\n{footer}" for window in windows]
+
+
+def referenced_signals(verilog_code, signals):
+    """Returns the signals of 'signals' that appear as identifiers in 'verilog_code', in the order of 'signals'."""
+    identifiers = {token.value for token in tokenize(verilog_code) if token.kind == TOKEN_KIND_ID}
+    return [signal for signal in signals if signal in identifiers]
+
+
+def merge_window_results(window_results):
+    """Merges the LLM analyses of the windows of one module, given as (signals of the window, response data) pairs.
+    A signal proposed by any window is kept. Its certainty is the average over every window that saw it, a window
+    that did not propose it counting as zero. The control signals are the ones reported most often."""
+    proposals = collections.defaultdict(list)
+    num_windows_seen = collections.Counter()
+    control_signal_votes = collections.Counter()
+    notes = []
+
+    for window_signals, data in window_results:
+        num_windows_seen.update(set(window_signals))
+        proposed_names = set()
+        for signal in data["fuzz_candidates"]["signals"]:
+            if signal["name"] in window_signals and signal["name"] not in proposed_names:
+                proposed_names.add(signal["name"])
+                proposals[signal["name"]].append(signal)
+        control_signal_votes[tuple(sorted(data["control_signals"].items()))] += 1
+        note = data["fuzz_candidates"].get("note")
+        if note and note not in notes:
+            notes.append(note)
+
+    merged_signals = []
+    for name, signal_proposals in proposals.items():
+        merged_signal = dict(signal_proposals[0])
+        merged_signal["certainty"] = round(sum(signal["certainty"] for signal in signal_proposals) / num_windows_seen[name])
+        merged_signals.append(merged_signal)
+
+    data = {"fuzz_candidates": {"signals": merged_signals}, "control_signals": dict(control_signal_votes.most_common(1)[0][0])}
+    if notes:
+        data["fuzz_candidates"]["note"] = " ".join(notes)
+    return data
+
+
+def pack_into_batches(sizes, max_tokens, max_items):
+    """Bin-packs items of the given token 'sizes' into batches of at most 'max_tokens' tokens and 'max_items' items,
+    first fit in decreasing size. Returns the batches as lists of item indices."""
+    batches = []
+    for i in sorted(range(len(sizes)), key=lambda i: -sizes[i]):
+        for batch in batches:
+            if batch[1] + sizes[i] <= max_tokens and len(batch[0]) < max_items:
+                batch[0].append(i)
+                batch[1] += sizes[i]
+                break
+        else:
+            batches.append([[i], sizes[i]])
+    return [sorted(indices) for indices, _ in batches]
@@ -0,0 +1,35 @@
+# Copyright (c) 2024 texer.ai. All rights reserved.
+import hashlib
+
+from source.sv_lexer import SV_KEYWORDS, TOKEN_KIND_ID, TOKEN_KIND_NUMBER, TOKEN_KIND_STRING, tokenize
+
+# Bump whenever the normalisation changes, so fingerprints of different versions never match.
+FINGERPRINT_VERSION = 1
+
+# Masks of the literals, their values do not take part in the fingerprint.
+FINGERPRINT_NUMBER = "<num>"
+FINGERPRINT_STRING = "<str>"
+
+
+def structural_fingerprint(verilog_code):
+    """Returns the fingerprint of the structure of 'verilog_code' and its identifiers in order of first occurrence.
+    Comments and literal values are ignored and every identifier that is not a keyword is replaced by its position in
+    that order, so modules that only differ in parameter values or in naming share a fingerprint."""
+    hasher = hashlib.sha256(f"{FINGERPRINT_VERSION}\n".encode())
+    identifiers = {}
+    for token in tokenize(verilog_code):
+        if token.kind == TOKEN_KIND_ID and token.value not in SV_KEYWORDS:
+            value = f"<id{identifiers.setdefault(token.value, len(identifiers))}>"
+        elif token.kind == TOKEN_KIND_NUMBER:
+            value = FINGERPRINT_NUMBER
+        elif token.kind == TOKEN_KIND_STRING:
+            value = FINGERPRINT_STRING
+        else:
+            value = token.value
+        hasher.update(f"{value}\n".encode())
+    return hasher.hexdigest(), list(identifiers)
+
+
+def map_identifiers(identifiers, target_identifiers):
+    """Maps every identifier of a module to the identifier at the same position of a module with the same fingerprint."""
+    return dict(zip(identifiers, target_identifiers))
@@ -0,0 +1,104 @@
+# Copyright (c) 2024 texer.ai. All rights reserved.
+import glob
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+# Default location of the on-disk caches, relative to the working directory like the patch backup.
+CACHE_DIR = "./.ailof_cache"
+
+# Bump whenever the format of the parsed design hierarchy changes, so stale entries are never loaded.
+PARSE_CACHE_VERSION = 5
+PARSE_CACHE_FILE_PREFIX = "design_"
+PARSE_CACHE_MAX_ENTRIES = 8
+
+
+def file_stat_signature(filepath):
+    """Returns the (path, size, mtime) triple of a file, or (path, None, None) if it does not exist."""
+    try:
+        stat = os.stat(filepath)
+    except OSError:
+        return filepath, None, None
+    return filepath, stat.st_size, stat.st_mtime_ns
+
+
+def write_json_atomic(output_path, data):
+    """Writes JSON to a temporary file next to 'output_path' and renames it into place."""
+    directory = os.path.dirname(os.path.abspath(output_path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as outfile:
+            json.dump(data, outfile)
+        os.replace(tmp_path, output_path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+def write_text_atomic(output_path, text):
+    """Writes text to a temporary file next to 'output_path' and renames it into place, keeping the mode of an existing file."""
+    directory = os.path.dirname(os.path.abspath(output_path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as outfile:
+            outfile.write(text)
+        if os.path.exists(output_path):
+            shutil.copymode(output_path, tmp_path)
+        else:
+            # Temporary files are private, give a new file the mode 'open' would have given it.
+            umask = os.umask(0)
+            os.umask(umask)
+            os.chmod(tmp_path, 0o666 & ~umask)
+        os.replace(tmp_path, output_path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+class ParseCache:
+    # An on-disk cache of parsed design hierarchies keyed by the VCD header and the flist entries.
+    def __init__(self, cache_dir=CACHE_DIR):
+        self.cache_dir = cache_dir
+
+    def start_key(self, header_digest):
+        """Starts a cache key from the VCD header digest, the flist entries are added one by one with 'add_to_key'."""
+        key_hasher = hashlib.sha256()
+        key_hasher.update(f"{PARSE_CACHE_VERSION}\n{header_digest}\n".encode())
+        return key_hasher
+
+    def add_to_key(self, key_hasher, filepath):
+        """Adds the (path, size, mtime) of a flist entry to a key started with 'start_key'."""
+        filepath, size, mtime = file_stat_signature(filepath)
+        key_hasher.update(f"{filepath}\0{size}\0{mtime}\n".encode())
+
+    def make_key(self, header_digest, filepaths):
+        """Builds the cache key from the VCD header digest and the (path, size, mtime) of every flist entry."""
+        key_hasher = self.start_key(header_digest)
+        for filepath in filepaths:
+            self.add_to_key(key_hasher, filepath)
+        return key_hasher.hexdigest()
+
+    def __entry_path(self, key):
+        return os.path.join(self.cache_dir, f"{PARSE_CACHE_FILE_PREFIX}{key}.json")
+
+    def load(self, key):
+        """Returns the cached design hierarchy for 'key', or None on a miss or a corrupt entry."""
+        try:
+            with open(self.__entry_path(key), "r") as infile:
+                return json.load(infile)
+        except (OSError, json.JSONDecodeError):
+            return None
+
+    def store(self, key, design_info):
+        """Stores the design hierarchy under 'key' and drops the oldest entries beyond the limit."""
+        write_json_atomic(self.__entry_path(key), design_info)
+
+        entries = sorted(glob.glob(os.path.join(self.cache_dir, f"{PARSE_CACHE_FILE_PREFIX}*.json")), key=os.path.getmtime)
+        for stale_entry in entries[:-PARSE_CACHE_MAX_ENTRIES]:
+            try:
+                os.remove(stale_entry)
+            except OSError:
+                pass
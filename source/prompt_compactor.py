@@ -0,0 +1,34 @@
+# Copyright (c) 2024 texer.ai. All rights reserved.
+import re
+
+from source.sv_lexer import scan_verilog
+
+# A string literal, kept as is, or a gap of whitespace and comments between two tokens.
+REGEX_COMPACT_GAP = re.compile(r'(?P<string>"(?:\\.|[^"\\\n])*")|(?P<gap>(?:\s+|//[^\n]*|/\*[\s\S]*?\*/)+)')
+
+
+def module_span(verilog_code, module_name):
+    """Returns the text of the first declaration of 'module_name', or the whole code if it is not declared there."""
+    if module_name is not None:
+        for module in scan_verilog(verilog_code).modules:
+            if module.name == module_name:
+                return verilog_code[module.start : module.end]
+    return verilog_code
+
+
+def compact_verilog(verilog_code):
+    """Removes the comments and collapses every gap between two tokens into a single space, or into a single
+    newline if the gap spans lines. String literals are kept as they are."""
+
+    def replace(match):
+        gap = match.group("gap")
+        if gap is None:
+            return match.group("string")
+        return "\n" if "\n" in gap else " "
+
+    return REGEX_COMPACT_GAP.sub(replace, verilog_code).strip()
+
+
+def dedupe_signal_names(signals):
+    """Reduces signal names such as 'sig[3:0]' to their base name and drops duplicates, keeping the first order."""
+    return list(dict.fromkeys(signal.split("[", 1)[0] for signal in signals))
@@ -1,112 +1,99 @@
 # Copyright (c) 2024 texer.ai. All rights reserved.
-import json
+import concurrent.futures
+import os
 import random
 import re
 import sys
 
+from source.backup_store import BackupStore
 from source.enums import ReturnCode
+from source.parse_cache import write_text_atomic
+from source.source_index import SourceIndex
+from source.sv_lexer import TOKEN_KIND_ID, TOKEN_KIND_SYMBOL, scan_verilog, tokenize
 
-REGEX_STRING_MATCH_SPEC_MODULE_BEGIN = r"module\s+{}(?:\s+import\s+[\w:.*]+;)?(?:\s*#\(\s*([\s\S]*?)\s*\))?\s*\("
-REGEX_STRING_MATCH_SIGNAL = r"(?<![\w.]){}\b(?![\w.])"
-REGEX_STRING_MATCH_INSTANCE_BEGIN = r"{}\ +(#\([^;]*?\))?\s+\)\ {}\ +\("
-REGEX_STRING_MATCH_ALL_MODULES = r"(\w+)\s*#?\s*\([^;]*?\)\s*(\w+)\s*\(\s*(?:[^;]*?)\s*\)\s*;"
 REGEX_STRING_MATCH_IMPORT_FUNCTION = r'import "DPI-C" function void (\w+)\s*\(([^)]*)\);'
 
-BACKUP_FILE = "./backup.json"
+# Direction of submodule ports the scanner could not resolve, such as interface and modport ports.
+PORT_DIRECTION_UNRESOLVED = "unresolved"
 
+# Keywords that start the declarations in which internal signals keep their name.
+GATE_DECLARATION_KEYWORDS = frozenset(["wire", "reg", "logic"])
+# Tokens that may precede the target of an assignment.
+GATE_ASSIGNMENT_TARGET_PREFIXES = frozenset([";", ")", "begin", "end", "else", "assign", ":", "always", "always_comb", "always_latch"])
 
-def is_signal(verilog_code, signal, port_type):
-    pattern = rf"{port_type}\s+(?:[\w:]+\s+)*(?:\[[^\]]+\]\s+)*{re.escape(signal)}\b"
 
-    return bool(re.search(pattern, verilog_code, re.MULTILINE))
+def index_module_boundaries(verilog_code):
+    # Maps the name of every complete module in the code to its boundaries (header end, port list end, body span),
+    # found in a single pass. The first declaration wins if a module is declared more than once.
+    module_index = {}
+    for module in scan_verilog(verilog_code).modules:
+        if module.header_end is not None and module.body_end is not None:
+            module_index.setdefault(module.name, module)
+    return module_index
 
 
-def extract_module_parts(verilog_code, module_name):
+def extract_module_parts(verilog_code, module_name, module_index=None):
     # A function to extract the header, definition and body of the module from the Verilog code.
-    module_pattern = f"module\\s+{module_name}\\s*"
-    module_match = re.search(module_pattern, verilog_code)
-    if not module_match:
-        return None, None, None
-
-    header_content = verilog_code[: module_match.start()].strip()
-
-    start_pos = module_match.start()
-    pos = module_match.end()
-
-    paren_count = 0
-    port_start = None
-    port_end = None
-
-    while pos < len(verilog_code):
-        char = verilog_code[pos]
-        if char == "(":
-            if paren_count == 0:
-                port_start = pos
-            paren_count += 1
-        elif char == ")":
-            paren_count -= 1
-            if paren_count == 0:
-                port_end = pos + 1
-                break
-        pos += 1
-
-    if port_start is None or port_end is None:
-        return None, None, None
+    if module_index is None:
+        module_index = index_module_boundaries(verilog_code)
 
-    # Find the semicolon after port list.
-    pos = port_end
-    while pos < len(verilog_code) and verilog_code[pos] != ";":
-        pos += 1
-    if pos >= len(verilog_code):
+    module = module_index.get(module_name)
+    if module is None:
         return None, None, None
 
-    module_definition = verilog_code[start_pos : pos + 1]
-
-    # Find module body (everything between module definition and matching endmodule).
-    body_start = pos + 1
-    pos = body_start
+    header_content = verilog_code[: module.start].strip()
+    module_definition = verilog_code[module.start : module.header_end]
+    module_body = verilog_code[module.header_end : module.body_end].strip()
 
-    while pos < len(verilog_code):
-        # Look for "endmodule" keyword.
-        if verilog_code[pos:].lstrip().startswith("endmodule"):
-            # Extract body excluding the endmodule keyword.
-            module_body = verilog_code[body_start:pos].strip()
-            return header_content, module_definition, module_body
-        pos += 1
+    return header_content, module_definition, module_body
 
-    return None, None, None
 
+def gate_signal_occurrences(module_body, port_signals, internal_signals, kept_connections):
+    # Renames the selected signals to 'modified_<signal>' in a single pass over the module body tokens.
+    # Port signals are renamed everywhere. Internal signals keep their original name in declarations, as assignment
+    # targets, right before ';' and in the port connections whose start offset is in 'kept_connections'.
+    # Returns the modified body and the number of uses of every signal.
+    tokens = list(tokenize(module_body))
+    occurrences = dict.fromkeys(port_signals | internal_signals, 0)
+    pieces = []
+    last_end = 0
+    in_declaration = False
 
-def restore_internal_signal_based_on_assignment(signal, module_body):
-    # A function to restore the internal signal based on the assignment.
-    lines = module_body.split("\n")
-
-    for i, line in enumerate(lines):
-        if not line.strip():
+    for i, token in enumerate(tokens):
+        value = token.value
+        if token.kind == TOKEN_KIND_SYMBOL and value == ";":
+            in_declaration = False
             continue
-
-        eq_pos = line.find("=")
-        le_pos = line.find("<=")
-
-        if eq_pos == -1 and le_pos == -1:
+        if token.kind != TOKEN_KIND_ID:
+            continue
+        if value in GATE_DECLARATION_KEYWORDS:
+            in_declaration = True
+            continue
+        if value not in occurrences:
             continue
 
-        op_pos = le_pos if le_pos != -1 else eq_pos
-
-        left_part = line[:op_pos].strip()
-        assignment_target = left_part.split()[-1] if left_part.split() else ""
-
-        right_part = line[op_pos:].strip()
+        previous_value = tokens[i - 1].value if i > 0 else ";"
+        next_value = tokens[i + 1].value if i + 1 < len(tokens) else ";"
 
-        modified_left_part = left_part
+        # Port names ('.signal(') and hierarchical references ('u_sub.signal') are not uses of the signal.
+        if previous_value == "." or next_value == ".":
+            continue
+        occurrences[value] += 1
 
-        if f"modified_{signal}" == assignment_target:
-            modified_left_part = " ".join(left_part.split()[:-1] + [signal])
+        if value in internal_signals:
+            if in_declaration or next_value == ";":
+                continue
+            if next_value in ("=", "<=") and previous_value in GATE_ASSIGNMENT_TARGET_PREFIXES:
+                continue
+            if i >= 3 and previous_value == "(" and next_value == ")" and tokens[i - 3].start in kept_connections:
+                continue
 
-        if left_part != modified_left_part:
-            lines[i] = f"{modified_left_part} {right_part}"
+        pieces.append(module_body[last_end : token.start])
+        pieces.append(f"modified_{value}")
+        last_end = token.end
 
-    return "\n".join(lines)
+    pieces.append(module_body[last_end:])
+    return "".join(pieces), occurrences
 
 
 def generate_dpi_always_block(control_signals, import_function):
@@ -129,7 +116,11 @@ def generate_dpi_always_block(control_signals, import_function):
     return dpi_always_block
 
 
-def add_dpi_calls(verilog_code, initial_block, always_block):
+def add_dpi_calls(verilog_code, initial_block, always_block, endmodule_pos=None):
+    # Inserts the DPI blocks before the 'endmodule' at 'endmodule_pos', or before the last 'endmodule' if not given.
+    if endmodule_pos is not None:
+        return verilog_code[:endmodule_pos] + "\n" + initial_block + always_block + "\n" + verilog_code[endmodule_pos:]
+
     parts = verilog_code.rsplit("endmodule", 1)
     if len(parts) == 2:
         modified_code = parts[0] + "\n" + initial_block + always_block + "\nendmodule" + parts[1]
@@ -138,65 +129,45 @@ def add_dpi_calls(verilog_code, initial_block, always_block):
         return verilog_code
 
 
-def find_submodules_using_internal_signal(signal, verilog_code):
-    # Finds all submodules that use the given signal as a parameter.
-
-    lines = verilog_code.split("\n")
-    code_without_comments = []
-    original_lines = {}
+def index_module_connectivity(verilog_code):
+    # Maps every signal connected by name to a submodule port ('.port(signal)') to its (instance, connection) pairs,
+    # found in a single scan of the code.
+    connectivity = {}
+    for instance in scan_verilog(verilog_code).instances:
+        for connection in instance.connections:
+            if connection.port is None or not connection.expression:
+                continue
+            connectivity.setdefault(connection.expression, []).append((instance, connection))
+    return connectivity
 
-    for i, line in enumerate(lines):
-        # Remove single-line comments but keep the original
-        cleaned_line = re.sub(r"//.*$", "", line)
-        code_without_comments.append(cleaned_line)
-        original_lines[i] = line
 
-    # Rejoin the code
-    code_without_comments = "\n".join(code_without_comments)
+# The patcher of a worker process, installed once per worker by the pool initializer.
+worker_rtl_patcher = None
 
-    results = []
 
-    # Find all module instantiations with their port connections
+def init_patch_worker(rtl_patcher):
+    global worker_rtl_patcher
+    worker_rtl_patcher = rtl_patcher
 
-    for match in re.finditer(REGEX_STRING_MATCH_ALL_MODULES, code_without_comments, re.DOTALL | re.MULTILINE):
-        instance_name = match.group(2)
-        instance_text = match.group(0)
-        instance_start = match.start()
 
-        # Find the specific port connection line - handle both input and output ports
-        port_pattern = r"\.(\w+)(?:_[io])?(?:\s*\(\s*" + re.escape(signal) + r"\s*\)|\s*\(\s*" + re.escape(signal) + r"\s*\))"
-
-        # Get all lines of this instance
-        instance_lines = instance_text.split("\n")
-        base_line_num = code_without_comments[:instance_start].count("\n")
-
-        # Search each line for the port connection
-        for i, line in enumerate(instance_lines):
-            port_match = re.search(port_pattern, line)
-            if port_match:
-                port_name = port_match.group(1)
-                line_number = base_line_num + i
-                results.append((instance_name, port_name, original_lines[line_number]))
-
-    return results
-
-
-def identify_internal_port_type(verilog_code, signal):
-    # A function to identify the type of the given signal.
-    if is_signal(verilog_code, signal, "input"):
-        return "input"
-    elif is_signal(verilog_code, signal, "output"):
-        return "output"
-    else:
-        return None
+def build_patched_file_in_worker(module_hierarchy, module_path, signals):
+    return worker_rtl_patcher.build_patched_file(module_hierarchy, module_path, signals)
 
 
 class RtlPatcher:
-    def __init__(self, json_design_hierarchy, selected_modules, selected_signals):
+    def __init__(self, json_design_hierarchy, selected_modules, selected_signals, source_index=None, jobs=1, backup_store=None):
         self.json_design_hierarchy = json_design_hierarchy
         self.selected_modules = selected_modules
         self.selected_signals = selected_signals
         self.grouped_signals = []
+        # Port directions of the submodules, every declaration file is scanned at most once per patch run.
+        self.source_index = source_index if source_index is not None else SourceIndex(index_path=None)
+        self.indexed_paths = set()
+        self.jobs = jobs
+        self.backup_store = backup_store if backup_store is not None else BackupStore()
+        self.original_files = {}
+        # Fuzzer seed of every patched module, drawn in this process so that pool workers do not repeat them.
+        self.dpi_seeds = {}
         # Clear the screen and print the header.
         sys.stdout.write("\x1b[2J\x1b[H")
         print(f"RTL patcher is initialized with {len(self.selected_signals)} signal(s) to process.\n")
@@ -222,27 +193,34 @@ class RtlPatcher:
 
         for module_path, data in temp_grouped_signals.items():
             self.grouped_signals.append((data["module_hierarchy"], module_path, data["signals"]))
+            self.dpi_seeds.setdefault(data["signals"][0]["signal_info"]["module_name"], random.randint(0, 1000))
 
-    def __backup(self):
-        # Create backups of all files that will be modified.
-        backed_up_files = {}
-
+    def __read_files(self):
+        # Read all files that will be modified once, the patches are built from these contents.
         for _, parent_module_path, _ in self.grouped_signals:
             with open(parent_module_path, "r") as f:
-                verilog_code = f.read()
-            backed_up_files[parent_module_path] = verilog_code
+                self.original_files[parent_module_path] = f.read()
+
+    def __backup(self):
+        # Create a backup generation of all files that will be modified.
+        backed_up_files = {}
+        for _, parent_module_path, signals in self.grouped_signals:
+            modules = sorted({signal["signal_info"]["module_name"] for signal in signals})
+            backed_up_files[parent_module_path] = (self.original_files[parent_module_path], modules)
 
-        with open(BACKUP_FILE, "w") as json_file:
-            json.dump(backed_up_files, json_file, indent=4)
+        # A pending backup of an earlier version stays undoable, after this one.
+        self.backup_store.import_legacy_backup()
+        self.backup_store.create_generation(backed_up_files)
 
     def __create_dpi(self, module_name, punch_signals):
+        # Returns the C++ source of the module's DPI functions.
         cpp_content = '#include "logic_fuzzer.h"\n\n'
         cpp_content += "#include <memory>\n"
         cpp_content += "#include <vector>\n"
         cpp_content += "#include <cstdint>\n\n"
         cpp_content += "static std::vector<std::shared_ptr<lf::LogicFuzzer>> fuzzers;\n\n"
         cpp_content += f'extern "C" void init_{module_name}()\n{{\n'
-        cpp_content += f"    const int kSeed = {random.randint(0, 1000)};\n"
+        cpp_content += f"    const int kSeed = {self.dpi_seeds[module_name]};\n"
         cpp_content += f"    for (size_t i = 0; i < {len(punch_signals)}; ++i)\n"
         cpp_content += "    {\n"
         cpp_content += "        fuzzers.push_back(std::make_shared<lf::LogicFuzzer>(i + kSeed));\n"
@@ -259,90 +237,124 @@ class RtlPatcher:
             i += 1
         cpp_content += "}"
 
-        with open(f"{module_name}_dpi.cpp", "w") as f:
-            f.write(cpp_content)
+        return cpp_content
+
+    def __submodule_port_direction(self, submodule_hierarchy, port):
+        # Looks up the direction of a submodule port in the source index, indexing its declaration file on first use.
+        submodule = self.json_design_hierarchy[submodule_hierarchy]
+        submodule_path = submodule["declaration_path"]
+
+        if submodule_path not in self.indexed_paths:
+            self.source_index.update([submodule_path])
+            self.indexed_paths.add(submodule_path)
+
+        return self.source_index.port_direction(submodule_path, submodule["module_name"], port)
+
+    def __module_connectivity(self, module_hierarchy, module_name, module_body, signals):
+        # Maps each of 'signals' to its (instance, port, direction, start offset) submodule connections.
+        # The direction is None for submodules missing from the hierarchy, and PORT_DIRECTION_UNRESOLVED for ports
+        # whose direction the scanner could not resolve, such as interface ports.
+        connectivity = {}
+
+        for signal, connections in index_module_connectivity(module_body).items():
+            if signal not in signals:
+                continue
+
+            for instance, connection in connections:
+                submodule_hierarchy = f"{module_hierarchy}.{instance.name}"
+
+                if submodule_hierarchy not in self.json_design_hierarchy:
+                    print(
+                        f"Warning: Submodule '{submodule_hierarchy}' in module '{module_name}' not found in design hierarchy. Ensure that:\n"
+                        f"  1. The module declaration is included in the filelist\n"
+                        f"  2. The module instance is present in the VCD dump\n"
+                        f"Skipping submodule processing...\n"
+                    )
+                    direction = None
+                else:
+                    direction = self.__submodule_port_direction(submodule_hierarchy, connection.port)
+                    if direction is None:
+                        print(
+                            f"Warning: Direction of port '{connection.port}' of submodule '{submodule_hierarchy}' in module '{module_name}' "
+                            f"could not be resolved. The port is connected to the gated signal.\n"
+                        )
+                        direction = PORT_DIRECTION_UNRESOLVED
 
-    def __insert_gate(self, module_hierarchy, module_name, verilog_code, signal, punch_signal, gate_type):
-        is_input_port = is_signal(verilog_code, signal, "input")
-        is_output_port = is_signal(verilog_code, signal, "output")
+                connectivity.setdefault(signal, []).append((instance.name, connection.port, direction, connection.start))
 
-        header_content, module_definition, module_body = extract_module_parts(verilog_code, module_name)
+        return connectivity
 
-        if module_definition is None:
-            err_message = f"Module '{module_name}' not found in the Verilog code."
-            raise ValueError(err_message)
+    def __kept_connections(self, module_hierarchy, module_name, module_body, internal_signals):
+        # Start offsets of the port connections that must keep an internal signal's original name: connections to
+        # submodule outputs, which drive the signal, and connections to submodules missing from the hierarchy.
+        # Ports of unresolved direction see the gated signal, like inputs.
+        kept_connections = set()
 
-        # Check if the signal is used in the module.
-        if not re.search(REGEX_STRING_MATCH_SIGNAL.format(signal), module_body):
-            err_message = f"Warning: Signal '{signal}' not found in module '{module_name}'."
-            raise ValueError(err_message)
+        connectivity = self.__module_connectivity(module_hierarchy, module_name, module_body, internal_signals)
+        for connections in connectivity.values():
+            for _, _, direction, start in connections:
+                if direction in (None, "output"):
+                    kept_connections.add(start)
 
-        modified_signal = f"modified_{signal}"
-        gate_logic = f"    logic {punch_signal};\n"
-        gate_logic += f"    logic {modified_signal};\n"
+        return kept_connections
 
-        # Insert the gate logic into the Verilog code.
-        if is_output_port:
-            gate_logic += f"    assign {signal} = {modified_signal} {gate_type} {punch_signal};\n"
-            modified_body = re.sub(rf"(?<!\w){signal}(?!\w)", modified_signal, module_body)
-        else:
-            gate_logic += f"    assign {modified_signal} = {signal} {gate_type} {punch_signal};\n"
+    def __insert_gate_logic(self, module_hierarchy, module_name, module, module_body, signals):
+        # Gates all selected signals of the module with a single rewrite of its body.
+        port_signals = set()
+        internal_signals = set()
+        gate_logic = ""
 
-            if is_input_port:
-                modified_body = re.sub(rf"(?<!\w){signal}(?!\w)", modified_signal, module_body)
+        for s in signals:
+            signal = s["signal_info"]["name"]
+            punch_signal = s["signal_info"]["punch_name"]
+            gate_type = s["gate_type"]
+            modified_signal = f"modified_{signal}"
+
+            gate_logic += f"    logic {punch_signal};\n"
+            gate_logic += f"    logic {modified_signal};\n"
+
+            if module.ports.get(signal) == "output":
+                gate_logic += f"    assign {signal} = {modified_signal} {gate_type} {punch_signal};\n"
+                port_signals.add(signal)
             else:
-                modified_body = re.sub(
-                    rf"((wire|reg|logic)\s+[^;]*\b{signal}\b)|(?<!\.|\w)\b{signal}\b(?!\s*;)",
-                    lambda m: m.group(0) if m.group(1) else modified_signal,
-                    module_body,
-                )
-                modified_body = restore_internal_signal_based_on_assignment(signal, modified_body)
-                signal_usage = find_submodules_using_internal_signal(modified_signal, modified_body)
-
-                for submodule_name, submodule_port_name, line_content in signal_usage:
-                    submodule_hierarchy = f"{module_hierarchy}.{submodule_name}"
-
-                    if submodule_hierarchy not in self.json_design_hierarchy:
-                        print(
-                            f"Warning: Submodule '{submodule_hierarchy}' in module '{module_name}' not found in design hierarchy. Ensure that:\n"
-                            f"  1. The module declaration is included in the filelist\n"
-                            f"  2. The module instance is present in the VCD dump\n"
-                            f"Skipping submodule processing...\n"
-                        )
-                        modified_line = re.sub(rf"\(modified_{signal}\)", f"({signal})", line_content)
-                        modified_body = modified_body.replace(line_content, modified_line)
-                        continue
+                gate_logic += f"    assign {modified_signal} = {signal} {gate_type} {punch_signal};\n"
+                if module.ports.get(signal) == "input":
+                    port_signals.add(signal)
+                else:
+                    internal_signals.add(signal)
 
-                    submodule_path = self.json_design_hierarchy[submodule_hierarchy]["declaration_path"]
+        kept_connections = self.__kept_connections(module_hierarchy, module_name, module_body, internal_signals)
+        modified_body, occurrences = gate_signal_occurrences(module_body, port_signals, internal_signals, kept_connections)
 
-                    with open(submodule_path, "r") as infile:
-                        submodule_verilog_code = "".join(infile.readlines())
+        # Check if the signals are used in the module.
+        for signal, count in occurrences.items():
+            if count == 0:
+                err_message = f"Warning: Signal '{signal}' not found in module '{module_name}'."
+                raise ValueError(err_message)
 
-                    port_type = identify_internal_port_type(submodule_verilog_code, submodule_port_name)
+        return gate_logic + modified_body
 
-                    if port_type == "output":
-                        modified_line = re.sub(rf"\(modified_{signal}\)", f"({signal})", line_content)
-                        modified_body = modified_body.replace(line_content, modified_line)
+    def __insert_gates(self, module_hierarchy, module_path, module_name, signals):
+        # Returns the patched code and the position of the module's 'endmodule' in it.
+        verilog_code = self.original_files[module_path]
 
-        modified_body = gate_logic + modified_body
-        modified_code = f"{header_content}\n\n{module_definition}\n{modified_body}\nendmodule"
+        # The boundaries are found once, the gates only ever rewrite the module body.
+        module_index = index_module_boundaries(verilog_code)
+        header_content, module_definition, module_body = extract_module_parts(verilog_code, module_name, module_index)
 
-        return modified_code
+        if module_definition is None:
+            err_message = f"Module '{module_name}' not found in the Verilog code."
+            raise ValueError(err_message)
 
-    def __insert_gates(self, module_hierarchy, module_path, module_name, signals):
-        with open(module_path, "r") as f:
-            verilog_code = f.read()
+        module = module_index[module_name]
+        modified_body = self.__insert_gate_logic(module_hierarchy, module_name, module, module_body, signals)
 
-        modified_code = verilog_code
-        for s in signals:
-            signal = s["signal_info"]["name"]
-            punch_signal = s["signal_info"]["punch_name"]
-            modified_code = self.__insert_gate(module_hierarchy, module_name, modified_code, signal, punch_signal, s["gate_type"])
+        code_before_endmodule = f"{header_content}\n\n{module_definition}\n{modified_body}\n"
+        modified_code = code_before_endmodule + verilog_code[module.body_end :]
 
-        with open(module_path, "w") as f:
-            f.write(modified_code)
+        return modified_code, len(code_before_endmodule)
 
-    def __insert_dpi_calls(self, module_name, module_path, punch_signals, control_signals):
+    def __insert_dpi_calls(self, module_name, punch_signals, control_signals, verilog_code, endmodule_pos):
         import_init = f'import "DPI-C" function void init_{module_name}();'
         import_fuzz = f'import "DPI-C" function void fuzz_{module_name}('
         for signal in punch_signals:
@@ -354,29 +366,68 @@ class RtlPatcher:
         initial_block += "    end\n"
         always_block = generate_dpi_always_block(control_signals, import_fuzz)
 
-        with open(module_path, "r") as f:
-            verilog_code = f.read()
-
-        modified_code = add_dpi_calls(verilog_code, initial_block, always_block)
+        modified_code = add_dpi_calls(verilog_code, initial_block, always_block, endmodule_pos)
         modified_code = import_init + "\n" + import_fuzz + "\n\n" + modified_code
 
-        with open(module_path, "w") as f:
-            f.write(modified_code)
+        return modified_code
 
-    def __patch_module(self, module_hierarchy, module_path, signals):
+    def build_patched_file(self, module_hierarchy, module_path, signals):
+        # Builds the final patched code of a file and the C++ source of its DPI functions, without writing anything.
         module_name = signals[0]["signal_info"]["module_name"]
         punch_signals = [signal["signal_info"]["punch_name"] for signal in signals]
         control_signals = signals[0]["signal_info"]["parent_module_control_signals"]
-        self.__create_dpi(module_name, punch_signals)
-        self.__insert_gates(module_hierarchy, module_path, module_name, signals)
-        self.__insert_dpi_calls(module_name, module_path, punch_signals, control_signals)
+        cpp_content = self.__create_dpi(module_name, punch_signals)
+        verilog_code, endmodule_pos = self.__insert_gates(module_hierarchy, module_path, module_name, signals)
+        verilog_code = self.__insert_dpi_calls(module_name, punch_signals, control_signals, verilog_code, endmodule_pos)
+        return verilog_code, f"{module_name}_dpi.cpp", cpp_content
+
+    def __commit(self, patched_files):
+        # Writes every patched file and its DPI source atomically. If a write fails, the files written so far are
+        # restored and DPI sources that did not exist before are removed.
+        written_paths = []
+        original_cpp_files = {}
+        try:
+            for module_path, (verilog_code, cpp_path, cpp_content) in patched_files.items():
+                write_text_atomic(module_path, verilog_code)
+                written_paths.append(module_path)
+
+                if cpp_path not in original_cpp_files:
+                    original_cpp_files[cpp_path] = None
+                    if os.path.isfile(cpp_path):
+                        with open(cpp_path, "r") as f:
+                            original_cpp_files[cpp_path] = f.read()
+                write_text_atomic(cpp_path, cpp_content)
+        except BaseException:
+            for module_path in written_paths:
+                write_text_atomic(module_path, self.original_files[module_path])
+            for cpp_path, cpp_content in original_cpp_files.items():
+                if cpp_content is not None:
+                    write_text_atomic(cpp_path, cpp_content)
+                elif os.path.isfile(cpp_path):
+                    os.remove(cpp_path)
+            raise
 
     def patch(self):
+        # All files are patched in memory first, on a process pool with more than one job. Nothing is written
+        # unless every file was patched successfully.
+        module_hierarchy, module_path = None, None
         try:
             self.__preprocess()
+            self.__read_files()
+
+            patched_files = {}
+            if self.jobs > 1 and len(self.grouped_signals) > 1:
+                with concurrent.futures.ProcessPoolExecutor(max_workers=self.jobs, initializer=init_patch_worker, initargs=(self,)) as executor:
+                    futures = [executor.submit(build_patched_file_in_worker, *group) for group in self.grouped_signals]
+                    for (module_hierarchy, module_path, _), future in zip(self.grouped_signals, futures):
+                        patched_files[module_path] = future.result()
+            else:
+                for module_hierarchy, module_path, signals in self.grouped_signals:
+                    patched_files[module_path] = self.build_patched_file(module_hierarchy, module_path, signals)
+
+            module_hierarchy, module_path = None, None
             self.__backup()
-            for module_hierarchy, module_path, signals in self.grouped_signals:
-                self.__patch_module(module_hierarchy, module_path, signals)
+            self.__commit(patched_files)
 
             return ReturnCode.SUCCESS
 
@@ -5,11 +5,20 @@ from source.controllers.signal_controller import SignalExplorerController as Con
 
 
 class SignalExplorer:
-    def __init__(self, all_signals):
+    # Explores the signals of 'all_signals', or the ones streamed in by a background 'analysis' as they arrive.
+    def __init__(self, all_signals=None, analysis=None):
         self.model = Model()
-        self.model.load_signals(all_signals)
+        if all_signals is not None:
+            self.model.load_signals(all_signals)
+        if analysis is not None:
+            self.model.track_modules(analysis.modules)
+        self.analysis = analysis
         self.view = View()
-        self.controller = Controller(self.model, self.view)
+        self.controller = Controller(self.model, self.view, analysis)
 
     def run(self):
-        return self.controller.run()
+        try:
+            return self.controller.run()
+        finally:
+            if self.analysis is not None:
+                self.analysis.stop()
@@ -0,0 +1,104 @@
+# Copyright (c) 2024 texer.ai. All rights reserved.
+import collections
+import math
+import re
+
+# Name parts of signals that are typically safe and worthwhile to fuzz, and of ones that are not. Long keywords match
+# anywhere in the name, e.g. 'wvalid', short ones only as a part between underscores or digits, e.g. 'rd_en_q'.
+NAME_KEYWORD_WEIGHTS = {
+    "valid": 3.0,
+    "ready": 3.0,
+    "busy": 3.0,
+    "stall": 3.0,
+    "full": 2.5,
+    "empty": 2.5,
+    "flush": 2.5,
+    "hold": 2.0,
+    "kill": 2.0,
+    "pending": 1.5,
+    "grant": 1.5,
+    "done": 1.0,
+    "error": 1.0,
+    "clock": -4.0,
+    "reset": -4.0,
+    "data": -1.0,
+    "addr": -1.0,
+}
+NAME_PART_WEIGHTS = {
+    "vld": 3.0,
+    "rdy": 3.0,
+    "req": 2.0,
+    "ack": 2.0,
+    "gnt": 1.5,
+    "en": 1.5,
+    "hit": 1.0,
+    "miss": 1.0,
+    "err": 1.0,
+    "clk": -4.0,
+    "rst": -4.0,
+    "rstn": -4.0,
+}
+REGEX_NAME_PARTS = re.compile(r"[a-z]+")
+
+# Identifiers, and based literals such as 8'hff whose digits must not be taken for one.
+REGEX_REFERENCE = re.compile(r"'[sS]?[bBoOdDhH]\s*[0-9a-fA-FxXzZ?_]+|[A-Za-z_][\w$]*")
+
+# Weights of the remaining features: single bit flags are preferred over wide buses, signals used often in the module
+# body over rarely used ones, and signals that toggle over constant ones. Signals that do not appear in the module body
+# at all cannot be gated there and go last.
+WEIGHT_SINGLE_BIT = 1.5
+WEIGHT_LOG_WIDTH = -0.5
+WEIGHT_LOG_FAN_OUT = 0.5
+WEIGHT_ACTIVITY = 1.0
+WEIGHT_CONSTANT = -1.0
+WEIGHT_UNREFERENCED = -20.0
+
+
+def name_score(signal):
+    """Scores the name of 'signal' by the keywords and name parts it contains."""
+    name = signal.lower()
+    score = sum(weight for keyword, weight in NAME_KEYWORD_WEIGHTS.items() if keyword in name)
+    score += sum(NAME_PART_WEIGHTS.get(part, 0.0) for part in set(REGEX_NAME_PARTS.findall(name)))
+    return score
+
+
+def count_references(module_code):
+    """Counts the occurrences of every identifier in 'module_code'. Comments are counted too, so callers pass the code
+    compacted with 'compact_verilog'."""
+    return collections.Counter(REGEX_REFERENCE.findall(module_code))
+
+
+def score_signals(module_code, signals, signal_widths, toggle_counts=None):
+    """Scores every signal of 'signals' from its name, its width, its fan-out in the compacted 'module_code' and, if
+    given, the number of times it toggled in the simulation. A higher score means a better fuzzing candidate."""
+    references = count_references(module_code)
+    max_toggles = max((toggle_counts or {}).get(signal, 0) for signal in signals) if signals else 0
+
+    scores = {}
+    for signal in signals:
+        score = name_score(signal)
+
+        width = signal_widths.get(signal, 1)
+        score += WEIGHT_SINGLE_BIT if width == 1 else WEIGHT_LOG_WIDTH * math.log2(width)
+
+        # The declaration is one of the references, every other one is a use.
+        fan_out = references[signal] - 1
+        score += WEIGHT_LOG_FAN_OUT * math.log2(1 + fan_out) if fan_out >= 0 else WEIGHT_UNREFERENCED
+
+        if toggle_counts is not None and signal in toggle_counts:
+            toggles = toggle_counts[signal]
+            score += WEIGHT_ACTIVITY * math.log2(1 + toggles) / math.log2(1 + max_toggles) if toggles > 0 else WEIGHT_CONSTANT
+
+        scores[signal] = score
+    return scores
+
+
+def select_top_signals(module_code, signals, signal_widths, top_k, toggle_counts=None):
+    """Returns the 'top_k' best scored signals of 'signals' in their original order, or all of them if 'top_k' is 0."""
+    signals = list(signals)
+    if top_k <= 0 or len(signals) <= top_k:
+        return signals
+
+    scores = score_signals(module_code, signals, signal_widths, toggle_counts)
+    selected = set(sorted(signals, key=lambda signal: -scores[signal])[:top_k])
+    return [signal for signal in signals if signal in selected]
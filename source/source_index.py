@@ -0,0 +1,174 @@
+# Copyright (c) 2024 texer.ai. All rights reserved.
+import hashlib
+import json
+import os
+
+from source.parse_cache import CACHE_DIR, write_json_atomic
+from source.prompt_compactor import compact_verilog
+from source.sv_lexer import scan_verilog
+from source.token_estimator import estimate_tokens
+
+# Persistent index location and format version, bump the version whenever the scanner output changes.
+SOURCE_INDEX_FILE = os.path.join(CACHE_DIR, "source_index.json")
+SOURCE_INDEX_VERSION = 7
+
+# JSON object names.
+JSON_OBJ_NAME_SIZE = "size"
+JSON_OBJ_NAME_MTIME = "mtime"
+JSON_OBJ_NAME_SHA256 = "sha256"
+JSON_OBJ_NAME_MODULES = "modules"
+JSON_OBJ_NAME_ENTITIES = "entities"
+JSON_OBJ_NAME_PORTS = "ports"
+JSON_OBJ_NAME_INCLUDES = "includes"
+JSON_OBJ_NAME_TOKENS = "tokens"
+
+
+def scan_source(content):
+    """Scans Verilog source text for module declarations, instances (class and name), port directions, included file
+    names and the estimated token count of every module declaration as it is sent to the LLM."""
+    scan_result = scan_verilog(content)
+
+    ports = {}
+    tokens = {}
+    for module in scan_result.modules:
+        module_ports = ports.setdefault(module.name, {})
+        for port, direction in module.ports.items():
+            module_ports.setdefault(port, direction)
+        if module.name not in tokens:
+            tokens[module.name] = estimate_tokens(compact_verilog(content[module.start : module.end]))
+
+    return {
+        JSON_OBJ_NAME_MODULES: [module.name for module in scan_result.modules],
+        JSON_OBJ_NAME_ENTITIES: [[instance.module_class, instance.name] for instance in scan_result.instances],
+        JSON_OBJ_NAME_PORTS: ports,
+        JSON_OBJ_NAME_INCLUDES: scan_result.includes,
+        JSON_OBJ_NAME_TOKENS: tokens,
+    }
+
+
+def index_file(filepath, known_digest=None):
+    """Reads and hashes one source file, and scans it unless its hash equals 'known_digest'.
+    Runs in worker processes, so errors are returned instead of raised."""
+    try:
+        stat = os.stat(filepath)
+        with open(filepath, "rb") as f:
+            raw_content = f.read()
+        digest = hashlib.sha256(raw_content).hexdigest()
+
+        entry = None
+        if digest != known_digest:
+            entry = scan_source(raw_content.decode("utf-8", errors="replace"))
+
+        return None, stat.st_size, stat.st_mtime_ns, digest, entry
+    except Exception as e:
+        return str(e), None, None, None, None
+
+
+def index_stale_file(stale_file):
+    """Indexes one (filepath, known digest) pair and returns the filepath with the result of 'index_file'."""
+    filepath, known_digest = stale_file
+    return filepath, index_file(filepath, known_digest)
+
+
+class SourceIndex:
+    # A persistent per-file index of the RTL sources. Only files whose content changed are scanned again.
+    def __init__(self, index_path=SOURCE_INDEX_FILE):
+        """Loads the index from 'index_path'. With 'index_path' set to None the index lives in memory only."""
+        self.index_path = index_path
+        self.files = {}
+        self.is_dirty = False
+        self.num_scanned = 0
+
+        if self.index_path is not None and os.path.isfile(self.index_path):
+            try:
+                with open(self.index_path, "r") as infile:
+                    data = json.load(infile)
+                if data.get("version") == SOURCE_INDEX_VERSION:
+                    self.files = data["files"]
+            except (OSError, ValueError, KeyError):
+                self.files = {}
+
+    def __is_stale(self, filepath):
+        # Cheap (size, mtime) check, the content hash is only computed for files that fail it.
+        entry = self.files.get(filepath)
+        if entry is None:
+            return True
+        stat = os.stat(filepath)
+        return entry[JSON_OBJ_NAME_SIZE] != stat.st_size or entry[JSON_OBJ_NAME_MTIME] != stat.st_mtime_ns
+
+    def update(self, filepaths, executor=None, chunksize=1):
+        """Brings the index up to date for 'filepaths' and returns the paths that could be indexed.
+        'filepaths' may be any iterable, it is consumed once and stale files are indexed as they come, on 'executor' if
+        given. Results are merged in the order of 'filepaths'."""
+        candidates = []
+
+        def iter_stale_files():
+            for filepath in filepaths:
+                if not os.path.isfile(filepath):
+                    print(f"File {filepath} not found.")
+                    continue
+                candidates.append(filepath)
+
+                if self.__is_stale(filepath):
+                    yield filepath, self.files[filepath][JSON_OBJ_NAME_SHA256] if filepath in self.files else None
+
+        if executor is not None:
+            results = executor.map(index_stale_file, iter_stale_files(), chunksize=chunksize)
+        else:
+            results = map(index_stale_file, iter_stale_files())
+
+        failed_filepaths = set()
+        for filepath, (error, size, mtime, digest, entry) in results:
+            if error is not None:
+                print(f"Failed to read {filepath}: {error}")
+                failed_filepaths.add(filepath)
+                continue
+
+            if entry is None:
+                entry = self.files[filepath]
+            else:
+                entry[JSON_OBJ_NAME_SHA256] = digest
+                self.num_scanned += 1
+
+            entry[JSON_OBJ_NAME_SIZE] = size
+            entry[JSON_OBJ_NAME_MTIME] = mtime
+            self.files[filepath] = entry
+            self.is_dirty = True
+
+        if failed_filepaths:
+            candidates = [filepath for filepath in candidates if filepath not in failed_filepaths]
+        return candidates
+
+    def entry(self, filepath):
+        """Returns the index entry of 'filepath'."""
+        return self.files[filepath]
+
+    def cached_includes(self, filepath):
+        """Returns the file names 'filepath' includes if its entry matches the file's size and mtime, None otherwise."""
+        try:
+            if self.__is_stale(filepath):
+                return None
+        except OSError:
+            return None
+        return self.files[filepath][JSON_OBJ_NAME_INCLUDES]
+
+    def port_direction(self, filepath, module_name, port_name):
+        """Returns 'input', 'output', 'inout' or None for a port of a module declared in 'filepath'."""
+        entry = self.files.get(filepath)
+        if entry is None:
+            return None
+        return entry[JSON_OBJ_NAME_PORTS].get(module_name, {}).get(port_name)
+
+    def module_tokens(self, filepath, module_name):
+        """Returns the estimated token count of a module declared in 'filepath', or None if it is not indexed."""
+        entry = self.files.get(filepath)
+        if entry is None:
+            return None
+        return entry[JSON_OBJ_NAME_TOKENS].get(module_name)
+
+    def save(self):
+        """Writes the index to disk if anything changed since it was loaded."""
+        if self.index_path is None or not self.is_dirty:
+            return
+        write_json_atomic(self.index_path, {"version": SOURCE_INDEX_VERSION, "files": self.files})
+        self.is_dirty = False
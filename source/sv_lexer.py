@@ -0,0 +1,430 @@
+# Copyright (c) 2024 texer.ai. All rights reserved.
+import collections
+import re
+
+# Token kinds.
+TOKEN_KIND_ID = "id"
+TOKEN_KIND_NUMBER = "number"
+TOKEN_KIND_STRING = "string"
+TOKEN_KIND_SYSTEM_ID = "system_id"
+TOKEN_KIND_DIRECTIVE = "directive"
+TOKEN_KIND_SYMBOL = "symbol"
+TOKEN_KIND_COMMENT = "comment"
+
+# One alternation over the whole text, leading whitespace is consumed with each token. Every branch is anchored on
+# its first character, so tokenizing is linear.
+REGEX_TOKEN = re.compile(
+    r"""
+    \s*(?:
+    (?P<comment>//[^\n]*|/\*.*?\*/)
+    |(?P<string>"(?:[^"\\\n]|\\.)*")
+    |(?P<number>\d[\d_]*(?:\.\d+)?(?:\s*'[sS]?[bBoOdDhH]\s*[0-9a-fA-FxXzZ?_]+)?|'[sS]?[bBoOdDhH]\s*[0-9a-fA-FxXzZ?_]+|'[01xXzZ])
+    |(?P<id>[A-Za-z_][\w$]*|\\\S+)
+    |(?P<system_id>\$[\w$]*)
+    |(?P<directive>`\w+)
+    |(?P<symbol>::|===|!==|==|!=|<=|>=|&&|\|\||<<<|>>>|<<|>>|->|\+\+|--|[-+*/%&|^]=|.)
+    )""",
+    re.DOTALL | re.VERBOSE,
+)
+
+SV_PORT_DIRECTIONS = frozenset(["input", "output", "inout"])
+SV_SUBROUTINE_BEGIN = frozenset(["function", "task"])
+SV_SUBROUTINE_END = frozenset(["endfunction", "endtask"])
+SV_SUBROUTINE_PROTOTYPE_PREFIXES = frozenset(["import", "export", "extern", "pure", "virtual"])
+SV_OPEN_BRACKETS = frozenset(["(", "[", "{"])
+SV_CLOSE_BRACKETS = frozenset([")", "]", "}"])
+
+# Tokens after which a new module item may start, i.e. where an instance header is looked for.
+SV_STATEMENT_BOUNDARIES = frozenset([";", ")", "begin", "end", "generate", "endgenerate", "else", "endfunction", "endtask", "endcase"])
+
+SV_KEYWORDS = frozenset(
+    """
+    accept_on alias always always_comb always_ff always_latch and assert assign assume automatic before begin bind bins binsof bit break buf
+    bufif0 bufif1 byte case casex casez cell chandle checker class clocking cmos config const constraint context continue cover covergroup
+    coverpoint cross deassign default defparam design disable dist do edge else end endcase endchecker endclass endclocking endconfig
+    endfunction endgenerate endgroup endinterface endmodule endpackage endprimitive endprogram endproperty endspecify endsequence endtable
+    endtask enum event eventually expect export extends extern final first_match for force foreach forever fork forkjoin function generate
+    genvar global highz0 highz1 if iff ifnone ignore_bins illegal_bins implements implies import incdir include initial inout input inside
+    instance int integer interconnect interface intersect join join_any join_none large let liblist library local localparam logic longint
+    macromodule matches medium modport module nand negedge nettype new nexttime nmos nor noshowcancelled not notif0 notif1 null or output
+    package packed parameter pmos posedge primitive priority program property protected pull0 pull1 pulldown pullup pulsestyle_ondetect
+    pulsestyle_onevent pure rand randc randcase randsequence rcmos real realtime ref reg reject_on release repeat restrict return rnmos
+    rpmos rtran rtranif0 rtranif1 s_always s_eventually s_nexttime s_until s_until_with scalared sequence shortint shortreal showcancelled
+    signed small soft solve specify specparam static string strong strong0 strong1 struct super supply0 supply1 sync_accept_on
+    sync_reject_on table tagged task this throughout time timeprecision timeunit tran tranif0 tranif1 tri tri0 tri1 triand trior trireg
+    type typedef union unique unique0 unsigned until until_with untyped use uwire var vectored virtual void wait wait_order wand weak
+    weak0 weak1 while wildcard wire with within wor xnor xor
+    """.split()
+)
+
+Token = collections.namedtuple("Token", "kind value start end")
+Connection = collections.namedtuple("Connection", "port expression start end")
+
+
+class ModuleInfo:
+    # Boundaries and ports of one module declaration. Positions are offsets into the scanned text.
+    def __init__(self, name, start):
+        self.name = name
+        self.start = start
+        self.ports_start = None
+        self.ports_end = None
+        self.header_end = None
+        self.body_end = None
+        self.end = None
+        self.ports = {}
+        self.instances = []
+
+
+class InstanceInfo:
+    # A module instance: its class, name, span and port connections.
+    def __init__(self, module_class, name, start):
+        self.module_class = module_class
+        self.name = name
+        self.start = start
+        self.end = None
+        self.connections = []
+
+
+class ScanResult:
+    # Modules, instances and included file names found in a piece of Verilog code. Instances outside of any module
+    # are kept too, so module bodies can be scanned on their own.
+    def __init__(self):
+        self.modules = []
+        self.instances = []
+        self.includes = []
+
+    def module(self, module_name):
+        """Returns the first module named 'module_name', or None."""
+        for module in self.modules:
+            if module.name == module_name:
+                return module
+        return None
+
+
+def tokenize(text, keep_comments=False):
+    """Yields the tokens of 'text'. Whitespace is dropped, comments are dropped unless 'keep_comments' is set."""
+    for match in REGEX_TOKEN.finditer(text):
+        kind = match.lastgroup
+        if kind == TOKEN_KIND_COMMENT and not keep_comments:
+            continue
+        start = match.start(kind)
+        end = match.end()
+        yield Token(kind, text[start:end], start, end)
+
+
+def strip_comments(text):
+    """Returns 'text' with every comment replaced by spaces. Line breaks and all offsets are preserved."""
+    pieces = []
+    last_end = 0
+    for token in tokenize(text, keep_comments=True):
+        if token.kind == TOKEN_KIND_COMMENT:
+            pieces.append(text[last_end : token.start])
+            pieces.append(re.sub(r"[^\n]", " ", token.value))
+            last_end = token.end
+    pieces.append(text[last_end:])
+    return "".join(pieces)
+
+
+def _value(tokens, i):
+    return tokens[i].value if i < len(tokens) else ""
+
+
+def _include_name(tokens, i):
+    # The file name of '`include "name"' at tokens[i], or None.
+    if tokens[i].kind == TOKEN_KIND_DIRECTIVE and tokens[i].value == "`include":
+        if i + 1 < len(tokens) and tokens[i + 1].kind == TOKEN_KIND_STRING:
+            return tokens[i + 1].value[1:-1]
+    return None
+
+
+def _skip_balanced(tokens, i):
+    # 'i' points at an opening bracket. Returns the index after its matching closing bracket.
+    depth = 0
+    while i < len(tokens):
+        token = tokens[i]
+        if token.kind == TOKEN_KIND_SYMBOL:
+            if token.value in SV_OPEN_BRACKETS:
+                depth += 1
+            elif token.value in SV_CLOSE_BRACKETS:
+                depth -= 1
+                if depth == 0:
+                    return i + 1
+        i += 1
+    return i
+
+
+def _skip_statement(tokens, i):
+    # Returns the index after the next ';'.
+    while i < len(tokens) and tokens[i].value != ";":
+        i += 1
+    return i + 1
+
+
+def _scan_port_declaration(tokens, i, ports):
+    # 'i' points at a direction keyword. Records every declared name and returns the index of the token that ends the
+    # declaration: the one after ';', the closing ')' of an ANSI port list, or the next direction keyword.
+    direction = tokens[i].value
+    i += 1
+    depth = 0
+    last_name = None
+    in_default_value = False
+
+    while i < len(tokens):
+        token = tokens[i]
+        if token.kind == TOKEN_KIND_SYMBOL:
+            if token.value in SV_OPEN_BRACKETS:
+                depth += 1
+            elif token.value in SV_CLOSE_BRACKETS:
+                if depth == 0:
+                    break
+                depth -= 1
+            elif depth == 0 and token.value in (",", ";", "="):
+                if last_name is not None:
+                    ports.setdefault(last_name, direction)
+                last_name = None
+                in_default_value = token.value == "="
+                if token.value == ";":
+                    return i + 1
+        elif token.kind == TOKEN_KIND_ID and depth == 0:
+            if token.value in SV_PORT_DIRECTIONS:
+                break
+            if not in_default_value and token.value not in SV_KEYWORDS:
+                last_name = token.value
+        i += 1
+
+    if last_name is not None:
+        ports.setdefault(last_name, direction)
+    return i
+
+
+def _scan_port_list(tokens, i, ports):
+    # 'i' points at the '(' of a module port list. Returns the index after the matching ')'.
+    i += 1
+    depth = 0
+    while i < len(tokens):
+        token = tokens[i]
+        if token.kind == TOKEN_KIND_ID and depth == 0 and token.value in SV_PORT_DIRECTIONS:
+            i = _scan_port_declaration(tokens, i, ports)
+            continue
+        if token.kind == TOKEN_KIND_SYMBOL:
+            if token.value in SV_OPEN_BRACKETS:
+                depth += 1
+            elif token.value in SV_CLOSE_BRACKETS:
+                if depth == 0:
+                    return i + 1
+                depth -= 1
+        i += 1
+    return i
+
+
+def _scan_module_header(tokens, i):
+    # 'i' points at the 'module' keyword. Returns the module and the index of the first body token.
+    module_token = tokens[i]
+    i += 1
+    if _value(tokens, i) in ("automatic", "static"):
+        i += 1
+
+    module = ModuleInfo(_value(tokens, i), module_token.start)
+    i += 1
+
+    while i < len(tokens):
+        value = tokens[i].value
+        if value == "import":
+            i = _skip_statement(tokens, i)
+        elif value == "#":
+            i += 1
+            if _value(tokens, i) == "(":
+                i = _skip_balanced(tokens, i)
+        elif value == "(":
+            module.ports_start = tokens[i].start
+            i = _scan_port_list(tokens, i, module.ports)
+            module.ports_end = tokens[i - 1].end
+        elif value == ";":
+            module.header_end = tokens[i].end
+            return module, i + 1
+        else:
+            i += 1
+
+    return module, i
+
+
+def _add_connection(tokens, start, end, instance, text):
+    # tokens[start:end] is one item of an instance port list: '.port(expression)', '.port', '.*' or a positional expression.
+    if start >= end:
+        return
+
+    first, last = tokens[start], tokens[end - 1]
+    if first.value == "." and end - start >= 2:
+        port = tokens[start + 1].value
+        if end - start >= 3 and tokens[start + 2].value == "(":
+            expression = text[tokens[start + 2].end : last.start].strip()
+        else:
+            expression = port
+        instance.connections.append(Connection(port, expression, first.start, last.end))
+    else:
+        instance.connections.append(Connection(None, text[first.start : last.end], first.start, last.end))
+
+
+def _scan_connections(tokens, i, instance, text):
+    # 'i' points at the '(' of an instance port list. Returns the index after the matching ')'.
+    i += 1
+    depth = 0
+    item_start = i
+
+    while i < len(tokens):
+        token = tokens[i]
+        if token.kind == TOKEN_KIND_SYMBOL:
+            if token.value in SV_OPEN_BRACKETS:
+                depth += 1
+            elif token.value in SV_CLOSE_BRACKETS:
+                if depth == 0:
+                    _add_connection(tokens, item_start, i, instance, text)
+                    return i + 1
+                depth -= 1
+            elif token.value == "," and depth == 0:
+                _add_connection(tokens, item_start, i, instance, text)
+                item_start = i + 1
+        i += 1
+
+    return i
+
+
+def _is_statement_start(tokens, i):
+    # True if a module item may start at tokens[i].
+    if i == 0:
+        return True
+
+    previous = tokens[i - 1]
+    if previous.kind == TOKEN_KIND_DIRECTIVE or previous.value in SV_STATEMENT_BOUNDARIES:
+        return True
+
+    # Block labels, as in 'begin : gen_block', and macro arguments, as in '`ifdef FOO'.
+    if previous.kind == TOKEN_KIND_ID and i >= 2:
+        before_previous = tokens[i - 2]
+        if before_previous.kind == TOKEN_KIND_DIRECTIVE:
+            return True
+        if before_previous.value == ":" and i >= 3 and tokens[i - 3].value in ("begin", "end"):
+            return True
+
+    return False
+
+
+def _match_instances(tokens, i, text):
+    # Tries to read 'class [#(parameters)] name [dimensions] (connections) {, name ...};' at tokens[i].
+    # Returns the instances and the index after ';', or (None, i) if this is not an instance declaration.
+    module_class = tokens[i].value
+    j = i + 1
+
+    if _value(tokens, j) == "#":
+        j += 1
+        if _value(tokens, j) == "(":
+            j = _skip_balanced(tokens, j)
+        else:
+            j += 1
+
+    instances = []
+    while j < len(tokens):
+        name_token = tokens[j]
+        if name_token.kind != TOKEN_KIND_ID or name_token.value in SV_KEYWORDS:
+            return None, i
+        j += 1
+
+        while _value(tokens, j) == "[":
+            j = _skip_balanced(tokens, j)
+        if _value(tokens, j) != "(":
+            return None, i
+
+        instance = InstanceInfo(module_class, name_token.value, tokens[i].start if not instances else name_token.start)
+        j = _scan_connections(tokens, j, instance, text)
+        instance.end = tokens[j - 1].end
+        instances.append(instance)
+
+        if _value(tokens, j) == ",":
+            j += 1
+            continue
+        if _value(tokens, j) == ";":
+            instances[-1].end = tokens[j].end
+            return instances, j + 1
+        return None, i
+
+    return None, i
+
+
+def scan_includes(text):
+    """Returns the names of the files 'text' includes with '`include "name"', in order. Commented out includes are
+    skipped."""
+    tokens = list(tokenize(text))
+    return [name for name in (_include_name(tokens, i) for i in range(len(tokens))) if name is not None]
+
+
+def scan_verilog(text):
+    """Scans Verilog/SystemVerilog text in one linear pass. Returns the modules with their boundaries and ports, every
+    module instance with its port connections, and the included file names. Comments and strings are never mistaken for
+    code."""
+    tokens = list(tokenize(text))
+    result = ScanResult()
+    module_stack = []
+    subroutine_depth = 0
+    i = 0
+
+    while i < len(tokens):
+        token = tokens[i]
+        if token.kind != TOKEN_KIND_ID:
+            include_name = _include_name(tokens, i)
+            if include_name is not None:
+                result.includes.append(include_name)
+            i += 1
+            continue
+
+        value = token.value
+
+        if value in ("module", "macromodule"):
+            module, i = _scan_module_header(tokens, i)
+            module_stack.append(module)
+            result.modules.append(module)
+            continue
+
+        if value == "endmodule":
+            if module_stack:
+                module = module_stack.pop()
+                module.body_end = token.start
+                module.end = token.end
+            i += 1
+            continue
+
+        if value in SV_SUBROUTINE_BEGIN:
+            # Prototypes such as 'import "DPI-C" function ...;' have no body and no matching end keyword.
+            previous_values = {tokens[k].value for k in range(max(0, i - 3), i)}
+            if previous_values & SV_SUBROUTINE_PROTOTYPE_PREFIXES:
+                i = _skip_statement(tokens, i)
+            else:
+                subroutine_depth += 1
+                i += 1
+            continue
+
+        if value in SV_SUBROUTINE_END:
+            subroutine_depth = max(0, subroutine_depth - 1)
+            i += 1
+            continue
+
+        if subroutine_depth == 0:
+            if value in SV_PORT_DIRECTIONS:
+                if module_stack:
+                    i = _scan_port_declaration(tokens, i, module_stack[-1].ports)
+                else:
+                    i += 1
+                continue
+
+            if value not in SV_KEYWORDS and _is_statement_start(tokens, i):
+                instances, next_i = _match_instances(tokens, i, text)
+                if instances:
+                    for instance in instances:
+                        result.instances.append(instance)
+                        if module_stack:
+                            module_stack[-1].instances.append(instance)
+                    i = next_i
+                    continue
+
+        i += 1
+
+    return result
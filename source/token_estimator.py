@@ -0,0 +1,57 @@
+# Copyright (c) 2024 texer.ai. All rights reserved.
+import functools
+import re
+
+TIKTOKEN_MODEL = "gpt-4o-2024-05-13"
+TIKTOKEN_FALLBACK_ENCODING = "cl100k_base"
+
+# Offline estimate: BPE vocabularies split identifiers and numbers into pieces of about four characters and
+# give most punctuation its own token, whitespace is mostly merged into the following piece.
+REGEX_ESTIMATE_TOKENS = re.compile(r"\w{1,4}|[^\w\s]")
+
+# Characters per token of typical source code, for estimates that only look at the length of a text.
+CHARS_PER_TOKEN = 4
+
+
+@functools.lru_cache(maxsize=None)
+def get_encoder():
+    """Returns the tiktoken encoder, loaded once per process, or None if tiktoken or its data is unavailable."""
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+
+    try:
+        try:
+            return tiktoken.encoding_for_model(TIKTOKEN_MODEL)
+        except KeyError:
+            return tiktoken.get_encoding(TIKTOKEN_FALLBACK_ENCODING)
+    except Exception:
+        # The encodings are downloaded on first use, which fails without network access.
+        return None
+
+
+def estimate_tokens(text):
+    """Estimates the number of tokens in 'text' without a tokenizer."""
+    return len(REGEX_ESTIMATE_TOKENS.findall(text))
+
+
+def estimate_tokens_from_length(text):
+    """Estimates the number of tokens in 'text' from its length alone, for sizes that are only reported."""
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+
+def count_tokens(text, model_type="openai"):
+    """Counts the tokens of 'text' exactly with the cached encoder for OpenAI models, estimates them otherwise."""
+    if model_type == "openai":
+        encoder = get_encoder()
+        if encoder is not None:
+            return len(encoder.encode(text, disallowed_special=()))
+    return estimate_tokens(text)
+
+
+def format_tokens(num_tokens):
+    """Formats a token count for display, e.g. '~850' or '~12.4k'."""
+    if num_tokens < 1000:
+        return f"~{num_tokens}"
+    return f"~{num_tokens / 1000:.1f}k"
@@ -1,20 +1,36 @@
 # Copyright (c) 2024 texer.ai. All rights reserved.
+import bz2
+import collections
+import concurrent.futures
+import gzip
+import hashlib
+import itertools
 import json
+import lzma
 import os
-import re
 
-
-# Regex match constant strings.
-REGEX_STRING_MATCH_MODULE = r"\$scope module (\S+) \$end"
-REGEX_STRING_MATCH_STRUCT = r"\$scope struct (\S+) \$end"
-REGEX_STRING_MATCH_INTERFACE = r"\$scope interface (\S+) \$end"
-REGEX_STRING_MATCH_UNION = r"\$scope union (\S+) \$end"
-REGEX_STRING_MATCH_SIGNAL = r"\$var wire\s+(\d+)\s+\S+\s+([\w\[\]]+)(?:\s+\[\d+:\d+\])?\s+\$end"
-REGEX_STRING_MATCH_VERILOG_MODULE_DECLARE = r"^\s*module\s+([^\s#(]+)"
-REGEX_STRING_MATCH_VERILOG_ENTITY = r"^\s*(\w+)\s*(?:#\s*\((?:[^()]|\([^()]*\))*\))?\s+(\w+)\s*\("
+from source.source_index import JSON_OBJ_NAME_ENTITIES, JSON_OBJ_NAME_MODULES, SourceIndex
 
 # VCD related constants.
-STRING_VCD_UNSCOPE = "$upscope $end"
+VCD_KEYWORD_SCOPE = "$scope"
+VCD_KEYWORD_UPSCOPE = "$upscope"
+VCD_KEYWORD_VAR = "$var"
+VCD_SCOPE_TYPE_MODULE = "module"
+STRING_VCD_END_DEFINITIONS = "$enddefinitions"
+
+# Size of a single read from the VCD file, the header scanner never holds more than one chunk plus one line.
+VCD_READ_CHUNK_SIZE = 1 << 20
+
+# Number of RTL sources per work item when they are scanned on a process pool. The flist is streamed, so its length is
+# not known up front; a chunk is handed to the pool as soon as it is full.
+SOURCE_SCAN_CHUNK_SIZE = 16
+
+# Magic bytes of the compressed VCD formats that are decompressed on the fly.
+VCD_COMPRESSION_MAGIC = {
+    b"\x1f\x8b": gzip.open,
+    b"BZh": bz2.open,
+    b"\xfd7zXZ\x00": lzma.open,
+}
 
 # JSON object names.
 JSON_OBJ_NAME_DECLARE_PATH = "declaration_path"
@@ -22,6 +38,150 @@ JSON_OBJ_NAME_MODULE_NAME = "module_name"
 JSON_OBJ_NAME_SIGNALS = "signal_width_data"
 
 
+def open_vcd_file(vcd_file_path):
+    """Opens a plain, gzip, bzip2 or xz compressed VCD file for reading as text. The format is detected by magic bytes."""
+    with open(vcd_file_path, "rb") as raw_file:
+        magic = raw_file.read(max(len(key) for key in VCD_COMPRESSION_MAGIC))
+
+    for magic_bytes, open_function in VCD_COMPRESSION_MAGIC.items():
+        if magic.startswith(magic_bytes):
+            return open_function(vcd_file_path, "rt")
+
+    return open(vcd_file_path, "r")
+
+
+def read_vcd_header_lines(vcd_file_path, chunk_size=VCD_READ_CHUNK_SIZE):
+    """Yields the lines of the VCD header. Reads the file in bounded chunks and stops at '$enddefinitions'."""
+    with open_vcd_file(vcd_file_path) as vcd_file:
+        remainder = ""
+        while True:
+            chunk = vcd_file.read(chunk_size)
+            if not chunk:
+                break
+
+            lines = (remainder + chunk).split("\n")
+            remainder = lines.pop()
+
+            for line in lines:
+                end_pos = line.find(STRING_VCD_END_DEFINITIONS)
+                if end_pos != -1:
+                    # Everything after the header is the value change section, which is never needed.
+                    if line[:end_pos].strip():
+                        yield line[:end_pos]
+                    return
+                yield line
+
+        if remainder and STRING_VCD_END_DEFINITIONS not in remainder:
+            yield remainder
+
+
+def vcd_header_digest(vcd_file_path):
+    """Returns a SHA-256 hex digest of the VCD header, the value change section is not read."""
+    hasher = hashlib.sha256()
+    for line in read_vcd_header_lines(vcd_file_path):
+        hasher.update(line.encode())
+        hasher.update(b"\n")
+    return hasher.hexdigest()
+
+
+def parse_vcd_hierarchy(vcd_file_path):
+    """Parses the header of the vcd file and returns the hierarchy of modules. Picklable for worker processes."""
+    hierarchy = {}
+
+    # Module node of every open scope. Non-module scopes (struct, interface, begin, ...) reuse the node
+    # of the closest enclosing module, so their variables are attributed to that module.
+    scope_nodes = []
+
+    for line in read_vcd_header_lines(vcd_file_path):
+        tokens = line.split()
+        if not tokens:
+            continue
+
+        keyword = tokens[0]
+
+        if keyword == VCD_KEYWORD_VAR:
+            # $var <kind> <width> <id_code> <reference> [<bit_range>] $end, for every kind of variable. Malformed
+            # declarations are skipped, as are the ones outside of any module.
+            if len(tokens) < 5 or not tokens[2].isdigit() or not scope_nodes or scope_nodes[-1] is None:
+                continue
+
+            signals = scope_nodes[-1][JSON_OBJ_NAME_SIGNALS]
+            signal_width = int(tokens[2])
+            full_signal_name = tokens[4]
+
+            signals[full_signal_name] = signal_width
+            bit_select_pos = full_signal_name.find("[")
+            if bit_select_pos > 0:
+                signals[full_signal_name[:bit_select_pos]] = signal_width
+
+        elif keyword == VCD_KEYWORD_SCOPE:
+            # $scope <type> <name> $end
+            if len(tokens) < 3:
+                continue
+
+            parent_node = scope_nodes[-1] if scope_nodes else hierarchy
+            if tokens[1] == VCD_SCOPE_TYPE_MODULE and parent_node is not None:
+                scope_nodes.append(parent_node.setdefault(tokens[2], {JSON_OBJ_NAME_SIGNALS: {}}))
+            else:
+                scope_nodes.append(scope_nodes[-1] if scope_nodes else None)
+
+        elif keyword == VCD_KEYWORD_UPSCOPE:
+            if scope_nodes:
+                scope_nodes.pop()
+
+    return hierarchy
+
+
+def read_vcd_toggle_activity(vcd_file_path, design_info):
+    """Counts how often every signal of the modules of 'design_info' changed its value in the VCD file, keyed by module
+    path and signal name. Unlike the header scan this reads the whole value change section."""
+    # Signals of non-module scopes and of modules without a declaration belong to the closest enclosing module in
+    # 'design_info', the way the design hierarchy is built.
+    declared_names = {name for path in design_info for name in path.split(".")}
+    id_code_signals = collections.defaultdict(list)
+    module_scopes = []
+    changes = collections.Counter()
+
+    with open_vcd_file(vcd_file_path) as vcd_file:
+        for line in vcd_file:
+            tokens = line.split()
+            if not tokens:
+                continue
+
+            keyword = tokens[0]
+            if keyword == VCD_KEYWORD_SCOPE and len(tokens) >= 3:
+                module_scopes.append(tokens[2] if tokens[1] == VCD_SCOPE_TYPE_MODULE and tokens[2] in declared_names else None)
+            elif keyword == VCD_KEYWORD_UPSCOPE and module_scopes:
+                module_scopes.pop()
+            elif keyword == VCD_KEYWORD_VAR and len(tokens) >= 5:
+                module_path = ".".join(name for name in module_scopes if name is not None)
+                if module_path in design_info:
+                    full_signal_name = tokens[4]
+                    id_code_signals[tokens[3]].append((module_path, full_signal_name))
+                    bit_select_pos = full_signal_name.find("[")
+                    if bit_select_pos > 0:
+                        id_code_signals[tokens[3]].append((module_path, full_signal_name[:bit_select_pos]))
+            elif keyword.startswith(STRING_VCD_END_DEFINITIONS):
+                break
+
+        # Value changes are '<value><id_code>' for scalars and 'b<value> <id_code>' or 'r<value> <id_code>' for vectors.
+        for line in vcd_file:
+            first = line[:1]
+            if not first:
+                continue
+            if first in "01xXzZ":
+                changes[line[1:].strip()] += 1
+            elif first in "bBrR":
+                changes[line.split(None, 1)[-1].strip()] += 1
+
+    toggle_activity = collections.defaultdict(collections.Counter)
+    for id_code, signals in id_code_signals.items():
+        # The first change of every signal is its initial value.
+        for module_path, signal_name in signals:
+            toggle_activity[module_path][signal_name] += max(0, changes[id_code] - 1)
+    return {module_path: dict(toggles) for module_path, toggles in toggle_activity.items()}
+
+
 class VcdParser:
     # A class to parse VCD files and generate JSON about the design structure.
     def __init__(self):
@@ -46,68 +206,6 @@ class VcdParser:
                     raise ModuleNotFoundError(f"Module '{missing_module}' is not found in {ancestor}")
         return True
 
-    def __vcd_file_parser(self, vcd_file_path):
-        """Parses vcd file and builds hierarchy of modules"""
-        with open(vcd_file_path, "r") as vcd_file:
-            lines = vcd_file.readlines()
-
-        current_path = []
-        current_scope_type = []
-
-        for line in lines:
-            line = line.strip()
-
-            scope_module_match = re.match(REGEX_STRING_MATCH_MODULE, line)
-            scope_struct_match = re.match(REGEX_STRING_MATCH_STRUCT, line)
-            scope_interface_match = re.match(REGEX_STRING_MATCH_INTERFACE, line)
-            scope_union_match = re.match(REGEX_STRING_MATCH_UNION, line)
-            signal_match = re.match(REGEX_STRING_MATCH_SIGNAL, line)
-
-            if any([scope_module_match, scope_struct_match, scope_interface_match, scope_union_match]):
-                scope_name = (scope_module_match or scope_struct_match or scope_interface_match or scope_union_match).group(1)
-
-                if scope_module_match:
-                    scope_type = "module"
-                elif scope_struct_match:
-                    scope_type = "struct"
-                elif scope_interface_match:
-                    scope_type = "interface"
-                else:
-                    scope_type = "union"
-
-                current_path.append(scope_name)
-                current_scope_type.append(scope_type)
-
-                if scope_type == "module":
-                    current_module = self.hierarchy
-                    for path_part in current_path:
-                        current_module = current_module.setdefault(path_part, {JSON_OBJ_NAME_SIGNALS: {}})
-
-            elif signal_match:
-                signal_width = int(signal_match.group(1))
-                full_signal_name = signal_match.group(2)
-
-                base_signal_name = re.match(r"([^\[]+)", full_signal_name).group(1)
-
-                if current_path:
-                    parent_module_idx = -1
-                    for i in range(len(current_path) - 1, -1, -1):
-                        if current_scope_type[i] == "module":
-                            parent_module_idx = i
-                            break
-
-                    current_module = self.hierarchy
-                    for path_part in current_path[: parent_module_idx + 1]:
-                        current_module = current_module[path_part]
-
-                    current_module[JSON_OBJ_NAME_SIGNALS][full_signal_name] = signal_width
-                    current_module[JSON_OBJ_NAME_SIGNALS][base_signal_name] = signal_width
-
-            elif line == STRING_VCD_UNSCOPE:
-                if current_path:
-                    current_path.pop()
-                    current_scope_type.pop()
-
     def __process_hierarchy(self, node, current_path="", last_valid_path=""):
         """Processes generated hierarchy tree and builds base for design_info"""
         for key, value in node.items():
@@ -134,39 +232,74 @@ class VcdParser:
             if isinstance(value, dict):
                 self.__process_hierarchy(value, full_path, last_valid_path)
 
-    def parse(self, vcd_file_path, f_list):
-        """Parses the VCD file and design files to generate a design hierarchy."""
+    def parse(self, vcd_file_path, f_list, parse_cache=None, source_index=None, jobs=1, library_files=None):
+        """Parses the VCD file and design files to generate a design hierarchy. Uses 'parse_cache' and 'source_index' if given.
+        'f_list' is the flist as text or an iterable of paths, such as 'FlistFormatter.iter_files', which is consumed
+        once while the sources are scanned. With 'jobs' above one, the RTL sources are scanned on a process pool.
+        'library_files', such as 'FlistFormatter.iter_library_files', is scanned after the flist and only declares the
+        modules the flist does not."""
         if not os.path.isfile(vcd_file_path):
             raise FileNotFoundError(f"The file {vcd_file_path} does not exist.")
 
-        self.__vcd_file_parser(vcd_file_path)
+        filepaths = (line.strip() for line in f_list.splitlines()) if isinstance(f_list, str) else f_list
 
-        for line in f_list.splitlines():
-            filepath = line.strip()
+        library_filepaths = set()
+        if library_files is not None:
 
-            if not os.path.isfile(filepath):
-                print(f"File {filepath} not found.")
-                continue
+            def mark_library_files(library_files):
+                for filepath in library_files:
+                    library_filepaths.add(filepath)
+                    yield filepath
+
+            filepaths = itertools.chain(filepaths, mark_library_files(library_files))
 
-            try:
-                with open(filepath, "r") as f:
-                    content = f.read()
-                    modules = re.findall(REGEX_STRING_MATCH_VERILOG_MODULE_DECLARE, content, re.MULTILINE)
+        if parse_cache is not None:
+            # The key is built from the paths while they stream into the source scanner, on a hit the warm source index
+            # has only compared the same file signatures the key needs.
+            key_hasher = parse_cache.start_key(vcd_header_digest(vcd_file_path))
 
-                    for module in modules:
-                        self.module_declarations[module] = filepath
+            def add_to_key(filepaths):
+                for filepath in filepaths:
+                    parse_cache.add_to_key(key_hasher, filepath)
+                    yield filepath
 
-                    entities = re.finditer(REGEX_STRING_MATCH_VERILOG_ENTITY, content, re.MULTILINE | re.DOTALL)
+            filepaths = add_to_key(filepaths)
 
-                    for entity in entities:
-                        module_class = entity.group(1)
-                        module_entity = entity.group(2)
+        if source_index is None:
+            source_index = SourceIndex(index_path=None)
 
-                        self.entity_to_path[module_entity] = filepath
-                        self.entity_to_class[module_entity] = module_class
+        hierarchy_future = None
+        if jobs > 1:
+            with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as executor:
+                # Without a parse cache the hierarchy is always needed, so the VCD header is parsed in one worker while
+                # the remaining workers scan the RTL sources.
+                if parse_cache is None:
+                    hierarchy_future = executor.submit(parse_vcd_hierarchy, vcd_file_path)
+                indexed_filepaths = source_index.update(filepaths, executor, SOURCE_SCAN_CHUNK_SIZE)
+        else:
+            indexed_filepaths = source_index.update(filepaths)
 
-            except Exception as e:
-                print(f"Failed to read {filepath}: {e}")
+        source_index.save()
+
+        if parse_cache is not None:
+            cache_key = key_hasher.hexdigest()
+            cached_design_info = parse_cache.load(cache_key)
+            if cached_design_info is not None:
+                self.design_info = cached_design_info
+                return self.design_info
+
+        self.hierarchy = hierarchy_future.result() if hierarchy_future is not None else parse_vcd_hierarchy(vcd_file_path)
+
+        # Library files come first, so that the declarations of the flist replace theirs.
+        for filepath in sorted(indexed_filepaths, key=lambda filepath: filepath not in library_filepaths):
+            entry = source_index.entry(filepath)
+
+            for module in entry[JSON_OBJ_NAME_MODULES]:
+                self.module_declarations[module] = filepath
+
+            for module_class, module_entity in entry[JSON_OBJ_NAME_ENTITIES]:
+                self.entity_to_path[module_entity] = filepath
+                self.entity_to_class[module_entity] = module_class
 
         self.__process_hierarchy(self.hierarchy)
 
@@ -188,6 +321,10 @@ class VcdParser:
         self.design_info = {path: data for path, data in self.design_info.items() if data[JSON_OBJ_NAME_DECLARE_PATH] is not None}
 
         self.__validate_design_info(self.design_info)
+
+        if parse_cache is not None:
+            parse_cache.store(cache_key, self.design_info)
+
         return self.design_info
 
     def export_json(self, output_path):
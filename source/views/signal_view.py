@@ -16,6 +16,7 @@ class SignalExplorerTerminalView:
         self.working_list_size = 0
         self.page_number = 0
         self.total_pages = 0
+        self.analysis_status = None
 
     def update_view_data(self, working_list, working_list_ids):
         self.view_data = []
@@ -31,6 +32,38 @@ class SignalExplorerTerminalView:
         self.working_list_size = len(working_list)
         self.total_pages = self.working_list_size / self.display_width
 
+    def update_analysis_status(self, num_done, num_failed, num_modules, pending_modules, last_message, module_errors=None):
+        self.analysis_status = {
+            "num_done": num_done,
+            "num_failed": num_failed,
+            "num_modules": num_modules,
+            "pending_modules": pending_modules,
+            "last_message": last_message,
+            "module_errors": module_errors or {},
+        }
+
+    def print_analysis_status(self):
+        status = self.analysis_status
+        if status is None or status["num_modules"] == 0:
+            return
+        line_to_print = f"Analysis: {status['num_done']}/{status['num_modules']} module(s) done"
+        if status["num_failed"]:
+            line_to_print += f", {status['num_failed']} failed"
+        print(line_to_print)
+
+        pending_modules = status["pending_modules"]
+        if pending_modules:
+            more = f" (+{len(pending_modules) - self.display_width} more)" if len(pending_modules) > self.display_width else ""
+            print(f"Waiting for: {', '.join(pending_modules[: self.display_width])}{more}")
+        # The modules whose analysis failed are listed with their error, their signals are not offered.
+        module_errors = list(status["module_errors"].items())
+        for module, error in module_errors[: self.display_width]:
+            print(f"Failed: {module}: {error}")
+        if len(module_errors) > self.display_width:
+            print(f"Failed: +{len(module_errors) - self.display_width} more")
+        if status["last_message"]:
+            print(f"Last: {status['last_message']}")
+
     def update_view(self, keyword):
         sys.stdout.write("\x1b[2J\x1b[H")
         print("\nSearch: " + keyword, end="", flush=True)
@@ -50,6 +83,7 @@ class SignalExplorerTerminalView:
                 print(f"    {line_to_print}")
             i += 1
         print(f"\n=================== Page {self.page_number}/{math.ceil(self.total_pages) - 1}")
+        self.print_analysis_status()
         print(
             "Commands: Enter/space/1 key to select the signal and fuzz via AND gate | 2 to fuzz via OR gate | Ctrl+c to exit | Ctrl+n to pass signal info further"
         )
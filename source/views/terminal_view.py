@@ -2,6 +2,8 @@
 import math
 import sys
 
+from source.token_estimator import format_tokens
+
 
 class DesignExplorerTerminalView:
     def __init__(self):
@@ -17,7 +19,7 @@ class DesignExplorerTerminalView:
         self.total_pages = 0
 
     # Function to update the view data.
-    def update_view_data(self, working_list, working_list_ids):
+    def update_view_data(self, working_list, working_list_ids, module_tokens=None):
         self.view_data = []
         for i in range(self.start_index, self.end_index):
             if i < len(working_list):
@@ -25,6 +27,7 @@ class DesignExplorerTerminalView:
                     {
                         "id": working_list_ids[i],
                         "hierarchy": working_list[i],
+                        "tokens": module_tokens(working_list_ids[i]) if module_tokens else None,
                     }
                 )
 
@@ -32,7 +35,7 @@ class DesignExplorerTerminalView:
         self.total_pages = self.working_list_size / self.display_width
 
     # Function to display the list with the selected item highlighted.
-    def update_view(self, keyword):
+    def update_view(self, keyword, selection_tokens=0):
         sys.stdout.write("\x1b[2J\x1b[H")
         print("\nSearch: " + keyword, end="", flush=True)
         print("\n===================\n")
@@ -42,6 +45,8 @@ class DesignExplorerTerminalView:
                 line_to_print = "{}. [x] {}".format(data["id"], data["hierarchy"])
             else:
                 line_to_print = "{}. [ ] {}".format(data["id"], data["hierarchy"])
+            if data["tokens"] is not None:
+                line_to_print += f" ({format_tokens(data['tokens'])} tokens)"
 
             if i == self.highlighted_index:
                 print(f"--> {line_to_print}")  # Highlight the selected item
@@ -49,6 +54,7 @@ class DesignExplorerTerminalView:
                 print(f"    {line_to_print}")
             i += 1
         print(f"\n=================== Page {self.page_number}/{math.ceil(self.total_pages) - 1}")
+        print(f"Selected: {len(self.selected_ids)} module(s), {format_tokens(selection_tokens)} tokens to analyze")
         print("Commands: Enter/space key to select the module | Ctrl+c to exit | Ctrl+n to pass module info further")
 
     def register_command(self, command):
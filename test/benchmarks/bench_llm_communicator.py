@@ -0,0 +1,64 @@
+# Copyright (c) 2024 texer.ai. All rights reserved.
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from source.llm_communicator import PACK_TOKEN_LIMIT, LLMCommunicator
+
+NUM_MODULES = 200
+NUM_SIGNALS_PER_MODULE = 8
+MOCK_LATENCY = 0.5
+CONCURRENCY = [1, 8, 32]
+
+
+def generate_modules(directory, num_modules=NUM_MODULES, num_structures=None, num_signals=NUM_SIGNALS_PER_MODULE):
+    # Writes 'num_modules' small modules and returns them as selected in the design explorer. The operators of a
+    # module follow the bits of its index modulo 'num_structures', so there are that many distinct structures.
+    modules = {}
+    for i in range(num_modules):
+        structure = i % (num_structures or num_modules)
+        operators = ["|" if structure >> j & 1 else "&" for j in range(num_signals)]
+        signals = [f"valid_{j}" for j in range(num_signals)]
+        lines = [f"module gen_{i} (input logic clk_i, input logic rst_ni);"]
+        lines.extend(f"  logic {signal};" for signal in signals)
+        lines.extend(f"  always_ff @(posedge clk_i) {signals[j]} <= {signals[j - 1]} {operators[j]} rst_ni;" for j in range(num_signals))
+        lines.append("endmodule")
+
+        path = os.path.join(directory, f"gen_{i}.sv")
+        with open(path, "w") as f:
+            f.write("\n".join(lines) + "\n")
+        modules[f"top.u_gen_{i}"] = {"declaration_path": path, "module_name": f"gen_{i}", "signal_width_data": {signal: 1 for signal in signals}}
+    return modules
+
+
+def run(modules, latency, concurrency, pack_tokens):
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        communicator = LLMCommunicator(modules, "mock", max_concurrent_requests=concurrency, pack_tokens=pack_tokens, backend_options={"latency": latency})
+        communicator.run()
+    return time.perf_counter() - start, communicator.backend.num_requests
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="End-to-end throughput of the LLM communicator against the mock backend.")
+    parser.add_argument("--modules", type=int, default=NUM_MODULES, help="number of selected modules.")
+    parser.add_argument("--structures", type=int, default=None, help="number of distinct module structures, all modules differ by default.")
+    parser.add_argument("--latency", type=float, default=MOCK_LATENCY, help="simulated latency of every request in seconds.")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=CONCURRENCY, help="requests kept in flight at once.")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        modules = generate_modules(directory, args.modules, args.structures)
+        print(f"{args.modules} modules of {args.structures or args.modules} structures, {args.latency:.2f} s per request")
+        print(f"{'in flight':>9} {'packing':>8} {'requests':>9} {'time s':>8} {'modules/s':>10}")
+
+        for concurrency in args.concurrency:
+            for pack_tokens in (0, PACK_TOKEN_LIMIT):
+                elapsed, num_requests = run(modules, args.latency, concurrency, pack_tokens)
+                print(f"{concurrency:>9} {'on' if pack_tokens else 'off':>8} {num_requests:>9} {elapsed:>8.2f} {args.modules / elapsed:>10.1f}")
@@ -0,0 +1,89 @@
+# Copyright (c) 2024 texer.ai. All rights reserved.
+import argparse
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from source.rtl_patcher import extract_module_parts, gate_signal_occurrences, index_module_boundaries
+
+NUM_SIGNALS = 200
+NUM_STATEMENTS = 4000
+SIGNALS_PER_MODULE = [1, 10, 200]
+
+
+def generate_module(num_signals=NUM_SIGNALS, num_statements=NUM_STATEMENTS):
+    # A module with 'num_signals' internal handshake signals used all over a large body.
+    lines = ["module big (input logic clk_i, input logic rst_ni, output logic done_o);"]
+    for i in range(num_signals):
+        lines.append(f"  logic valid_{i};")
+    for j in range(num_statements):
+        a, b = j % num_signals, (j * 7 + 3) % num_signals
+        lines.append(f"  assign valid_{a} = valid_{b} & rst_ni;  // statement {j}")
+    lines.append("  assign done_o = valid_0;")
+    lines.append("endmodule")
+    return "\n".join(lines) + "\n"
+
+
+def legacy_insert_gate(verilog_code, module_name, signal):
+    # The per-signal flow: re-extract the module, run the whole-body substitutions and rebuild the file.
+    header_content, module_definition, module_body = extract_module_parts(verilog_code, module_name)
+    modified_signal = f"modified_{signal}"
+    modified_body = re.sub(
+        rf"((wire|reg|logic)\s+[^;]*\b{signal}\b)|(?<!\.|\w)\b{signal}\b(?!\s*;)",
+        lambda m: m.group(0) if m.group(1) else modified_signal,
+        module_body,
+    )
+
+    lines = modified_body.split("\n")
+    for i, line in enumerate(lines):
+        op_pos = line.find("<=") if line.find("<=") != -1 else line.find("=")
+        if op_pos == -1:
+            continue
+        left_part = line[:op_pos].strip()
+        if left_part.split() and left_part.split()[-1] == modified_signal:
+            lines[i] = " ".join(left_part.split()[:-1] + [signal]) + " " + line[op_pos:].strip()
+    modified_body = "\n".join(lines)
+
+    gate_logic = f"    logic punch_{signal};\n    logic {modified_signal};\n    assign {modified_signal} = {signal} & punch_{signal};\n"
+    return f"{header_content}\n\n{module_definition}\n{gate_logic}{modified_body}\nendmodule\n"
+
+
+def per_signal(verilog_code, signals):
+    modified_code = verilog_code
+    for signal in signals:
+        modified_code = legacy_insert_gate(modified_code, "big", signal)
+    return modified_code
+
+
+def batched(verilog_code, signals):
+    module = index_module_boundaries(verilog_code)["big"]
+    header_content, module_definition, module_body = extract_module_parts(verilog_code, "big", {"big": module})
+    modified_body, _ = gate_signal_occurrences(module_body, set(), set(signals), set())
+    gate_logic = "".join(f"    logic punch_{s};\n    logic modified_{s};\n    assign modified_{s} = {s} & punch_{s};\n" for s in signals)
+    return f"{header_content}\n\n{module_definition}\n{gate_logic}{modified_body}\n" + verilog_code[module.body_end :]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark of per-signal vs. batched gate insertion.")
+    parser.add_argument("--signals", type=int, nargs="+", default=SIGNALS_PER_MODULE, help="selected signals per module.")
+    args = parser.parse_args()
+
+    verilog_code = generate_module()
+    print(f"Module body: {verilog_code.count(chr(10))} lines")
+    print(f"{'signals':>8} {'per-signal s':>13} {'batched s':>10} {'speedup':>9}")
+
+    for num_signals in args.signals:
+        signals = [f"valid_{i}" for i in range(num_signals)]
+
+        start = time.perf_counter()
+        per_signal(verilog_code, signals)
+        per_signal_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        batched(verilog_code, signals)
+        batched_time = time.perf_counter() - start
+
+        print(f"{num_signals:>8} {per_signal_time:>13.3f} {batched_time:>10.3f} {per_signal_time / batched_time:>8.1f}x")
@@ -0,0 +1,44 @@
+# Copyright (c) 2024 texer.ai. All rights reserved.
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from source.llm_communicator import PROMPT, TOP_SIGNALS
+from source.signal_ranker import select_top_signals
+from source.token_estimator import count_tokens
+
+NUM_SIGNALS = [100, 1000, 5000]
+SIGNAL_KINDS = ["valid", "ready", "busy", "data", "addr", "cnt", "state", "full"]
+
+
+def generate_module(num_signals):
+    # A module with 'num_signals' signals of mixed kinds and widths, each used once or twice.
+    signals = {f"{SIGNAL_KINDS[i % len(SIGNAL_KINDS)]}_{i}": 1 if i % 3 else 32 for i in range(num_signals)}
+    names = list(signals)
+    lines = ["module big (input logic clk_i);"]
+    lines.extend(f"  logic [{width - 1}:0] {name};" for name, width in signals.items())
+    lines.extend(f"  assign {names[i]} = {names[i - 1]} ^ {names[(i * 7) % num_signals]};" for i in range(num_signals))
+    lines.append("endmodule")
+    return "\n".join(lines) + "\n", signals
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark of the signal pre-ranker.")
+    parser.add_argument("--signals", type=int, nargs="+", default=NUM_SIGNALS, help="signals per module.")
+    parser.add_argument("--top", type=int, default=TOP_SIGNALS, help="signals sent to the LLM.")
+    args = parser.parse_args()
+
+    print(f"{'signals':>8} {'rank ms':>8} {'targets before':>15} {'targets after':>14}")
+    for num_signals in args.signals:
+        module_code, signal_widths = generate_module(num_signals)
+
+        start = time.perf_counter()
+        top_signals = select_top_signals(module_code, signal_widths, signal_widths, args.top)
+        elapsed = time.perf_counter() - start
+
+        tokens_before = count_tokens(PROMPT.format("big.sv", list(signal_widths), ""))
+        tokens_after = count_tokens(PROMPT.format("big.sv", top_signals, ""))
+        print(f"{num_signals:>8} {elapsed * 1000:>8.1f} {tokens_before:>15} {tokens_after:>14}")
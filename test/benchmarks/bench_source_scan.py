@@ -0,0 +1,61 @@
+# Copyright (c) 2024 texer.ai. All rights reserved.
+import argparse
+import concurrent.futures
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from source.source_index import SourceIndex
+from source.vcd_parser import SOURCE_SCAN_CHUNK_SIZE
+
+NUM_FILES = 2000
+NUM_INSTANCES_PER_FILE = 20
+
+
+def generate_sources(directory, num_files=NUM_FILES, num_instances=NUM_INSTANCES_PER_FILE):
+    # Writes 'num_files' generated modules, each instantiating the previous one with a parameter list.
+    filepaths = []
+    for i in range(num_files):
+        lines = [f"module gen_{i} #(parameter int WIDTH = {i % 64 + 1}) (input logic clk_i, input logic [WIDTH-1:0] data_i, output logic valid_o);"]
+        for j in range(num_instances):
+            lines.append(f"  gen_{max(i - 1, 0)} #(.WIDTH($clog2(WIDTH) + {j})) u_{j} (.clk_i(clk_i), .data_i(data_i[{j}]), .valid_o());")
+        lines.append("  assign valid_o = |data_i;")
+        lines.append("endmodule")
+
+        filepaths.append(os.path.join(directory, f"gen_{i}.sv"))
+        with open(filepaths[-1], "w") as f:
+            f.write("\n".join(lines) + "\n")
+
+    return filepaths
+
+
+def scan(filepaths, jobs):
+    # Cold scan of all files with a fresh in-memory index.
+    source_index = SourceIndex(index_path=None)
+    start = time.perf_counter()
+    if jobs > 1:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as executor:
+            source_index.update(filepaths, executor, SOURCE_SCAN_CHUNK_SIZE)
+    else:
+        source_index.update(filepaths)
+    return time.perf_counter() - start, source_index
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark of parallel RTL source scanning.")
+    parser.add_argument("--files", type=int, default=NUM_FILES, help="number of generated source files.")
+    parser.add_argument("--jobs", type=int, nargs="+", default=[1, 2, 4, 8, os.cpu_count()], help="worker counts to benchmark.")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        filepaths = generate_sources(tmp_dir, args.files)
+        serial_time, serial_index = scan(filepaths, 1)
+
+        print(f"Scanning {len(filepaths)} files on {os.cpu_count()} CPU(s)")
+        print(f"{'jobs':>6} {'time s':>10} {'speedup':>10} {'same index':>12}")
+        for jobs in sorted(set(args.jobs)):
+            elapsed, source_index = (serial_time, serial_index) if jobs == 1 else scan(filepaths, jobs)
+            print(f"{jobs:>6} {elapsed:>10.3f} {serial_time / elapsed:>9.2f}x {str(source_index.files == serial_index.files):>12}")
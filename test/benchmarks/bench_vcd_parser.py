@@ -0,0 +1,183 @@
+# Copyright (c) 2024 texer.ai. All rights reserved.
+import argparse
+import os
+import re
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from source.vcd_parser import VcdParser, read_vcd_header_lines
+
+PATH_TO_VCD_FILE = "test/test_files/vcds/hello_world.cv32a65x.vcd"
+
+NUM_MODULES = 200
+NUM_SIGNALS_PER_MODULE = 50
+SIMULATION_CYCLES = [1000, 10000, 50000]
+
+# Regexes of the original line-by-line parser, kept here as the baseline.
+LEGACY_REGEX_STRING_MATCH_MODULE = r"\$scope module (\S+) \$end"
+LEGACY_REGEX_STRING_MATCH_STRUCT = r"\$scope struct (\S+) \$end"
+LEGACY_REGEX_STRING_MATCH_INTERFACE = r"\$scope interface (\S+) \$end"
+LEGACY_REGEX_STRING_MATCH_UNION = r"\$scope union (\S+) \$end"
+LEGACY_REGEX_STRING_MATCH_SIGNAL = r"\$var wire\s+(\d+)\s+\S+\s+([\w\[\]]+)(?:\s+\[\d+:\d+\])?\s+\$end"
+
+
+def generate_vcd(path, num_cycles, num_modules=NUM_MODULES, num_signals=NUM_SIGNALS_PER_MODULE):
+    # Writes a synthetic Verilator-like VCD with a fixed header and 'num_cycles' value change blocks.
+    id_codes = []
+    with open(path, "w") as vcd:
+        vcd.write("$version Generated by bench_vcd_parser $end\n$timescale 1ps $end\n")
+        vcd.write("$scope module TOP $end\n$scope module top $end\n")
+        for m in range(num_modules):
+            vcd.write(f"$scope module sub_{m} $end\n")
+            for s in range(num_signals):
+                id_code = f"s{m}_{s}"
+                id_codes.append(id_code)
+                vcd.write(f"$var wire 1 {id_code} sig_{s} $end\n")
+            vcd.write("$var wire 32 w{0} data [31:0] $end\n".format(m))
+            vcd.write("$upscope $end\n")
+        vcd.write("$upscope $end\n$upscope $end\n$enddefinitions $end\n")
+
+        for cycle in range(num_cycles):
+            vcd.write(f"#{cycle * 10}\n")
+            for id_code in id_codes[cycle % 7 :: 97]:
+                vcd.write(f"{cycle & 1}{id_code}\n")
+
+
+def legacy_vcd_file_parser(vcd_file_path):
+    # The original parser: reads the whole file and runs every regex on every line.
+    with open(vcd_file_path, "r") as vcd_file:
+        lines = vcd_file.readlines()
+
+    return legacy_parse_lines(lines)
+
+
+def legacy_parse_lines(lines):
+    # The original per-line matching: five scope/signal regexes plus a bit-select regex per signal.
+    hierarchy = {}
+    current_path = []
+    current_scope_type = []
+
+    for line in lines:
+        line = line.strip()
+
+        scope_module_match = re.match(LEGACY_REGEX_STRING_MATCH_MODULE, line)
+        scope_struct_match = re.match(LEGACY_REGEX_STRING_MATCH_STRUCT, line)
+        scope_interface_match = re.match(LEGACY_REGEX_STRING_MATCH_INTERFACE, line)
+        scope_union_match = re.match(LEGACY_REGEX_STRING_MATCH_UNION, line)
+        signal_match = re.match(LEGACY_REGEX_STRING_MATCH_SIGNAL, line)
+
+        if any([scope_module_match, scope_struct_match, scope_interface_match, scope_union_match]):
+            scope_match = scope_module_match or scope_struct_match or scope_interface_match or scope_union_match
+            current_path.append(scope_match.group(1))
+            current_scope_type.append("module" if scope_module_match else "other")
+
+            if scope_module_match:
+                current_module = hierarchy
+                for path_part in current_path:
+                    current_module = current_module.setdefault(path_part, {"signal_width_data": {}})
+
+        elif signal_match:
+            signal_width = int(signal_match.group(1))
+            full_signal_name = signal_match.group(2)
+            base_signal_name = re.match(r"([^\[]+)", full_signal_name).group(1)
+
+            if current_path:
+                parent_module_idx = -1
+                for i in range(len(current_path) - 1, -1, -1):
+                    if current_scope_type[i] == "module":
+                        parent_module_idx = i
+                        break
+
+                current_module = hierarchy
+                for path_part in current_path[: parent_module_idx + 1]:
+                    current_module = current_module[path_part]
+
+                current_module["signal_width_data"][full_signal_name] = signal_width
+                current_module["signal_width_data"][base_signal_name] = signal_width
+
+        elif line == "$upscope $end":
+            if current_path:
+                current_path.pop()
+                current_scope_type.pop()
+
+    return hierarchy
+
+
+def measure(function, *args):
+    # Returns wall time in seconds and peak traced memory in MiB of a single call.
+    tracemalloc.start()
+    start = time.perf_counter()
+    function(*args)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak / (1 << 20)
+
+
+def bench_header_scan(cycles_list):
+    # Shows that the streaming parser does not depend on the length of the value change section.
+    print("Header scan vs. simulation length")
+    print(f"{'cycles':>10} {'size MiB':>10} {'legacy s':>10} {'legacy MiB':>11} {'stream s':>10} {'stream MiB':>11}")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for num_cycles in cycles_list:
+            vcd_path = os.path.join(tmp_dir, f"bench_{num_cycles}.vcd")
+            generate_vcd(vcd_path, num_cycles)
+            size = os.path.getsize(vcd_path) / (1 << 20)
+
+            legacy_time, legacy_mem = measure(legacy_vcd_file_parser, vcd_path)
+            stream_time, stream_mem = measure(VcdParser().parse, vcd_path, "")
+
+            print(f"{num_cycles:>10} {size:>10.1f} {legacy_time:>10.3f} {legacy_mem:>11.1f} {stream_time:>10.3f} {stream_mem:>11.1f}")
+            os.remove(vcd_path)
+
+
+def best_of(repeats, function, *args):
+    # Returns the best wall time in seconds over 'repeats' calls and the result of the last call.
+    best = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = function(*args)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def bench_dispatch(vcd_path, repeats=3):
+    # Compares the regex-per-line header parsing against the keyword dispatcher on the same header.
+    print(f"Declaration parsing on {vcd_path}")
+
+    legacy_time, legacy_hierarchy = best_of(repeats, lambda: legacy_parse_lines(read_vcd_header_lines(vcd_path)))
+
+    def dispatch():
+        parser = VcdParser()
+        parser.parse(vcd_path, "")
+        return parser.hierarchy
+
+    dispatch_time, dispatch_hierarchy = best_of(repeats, dispatch)
+
+    print(f"  legacy regex matching: {legacy_time:.3f} s")
+    print(f"  keyword dispatch:      {dispatch_time:.3f} s ({legacy_time / dispatch_time:.1f}x)")
+    print(f"  same hierarchy:        {legacy_hierarchy == dispatch_hierarchy}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks for the VCD parser.")
+    parser.add_argument("--vcd", default=PATH_TO_VCD_FILE, help="VCD dump used by the declaration parsing benchmark.")
+    parser.add_argument("--cycles", type=int, nargs="+", default=SIMULATION_CYCLES, help="simulation lengths to benchmark.")
+    args = parser.parse_args()
+
+    bench_header_scan(args.cycles)
+
+    if os.path.isfile(args.vcd):
+        bench_dispatch(args.vcd)
+    else:
+        # The CVA6 dump is produced by the test flow, fall back to a synthetic one of a similar size.
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            vcd_path = os.path.join(tmp_dir, "synthetic.vcd")
+            generate_vcd(vcd_path, 100, num_modules=2000)
+            bench_dispatch(vcd_path)
@@ -0,0 +1,14 @@
+import pytest
+
+
+@pytest.fixture
+def write_module(tmp_path):
+    # Writes a small module declaring 'busy' and 'idle' to 'tmp_path' and returns its path. Modules with a different
+    # number of spare signals differ in structure, so each of them is analysed instead of sharing one analysis.
+    def write(name, num_spare_signals=0):
+        path = tmp_path / f"{name}.sv"
+        spare_signals = "".join(f" logic spare_{j};" for j in range(num_spare_signals))
+        path.write_text(f"module {name} (input logic clk_i); logic busy; logic idle;{spare_signals} endmodule\n")
+        return str(path)
+
+    return write
@@ -0,0 +1,128 @@
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from source.backup_store import BackupStore
+
+
+def write_file(path, content):
+    with open(path, "w") as f:
+        f.write(content)
+
+
+def read_file(path):
+    with open(path, "r") as f:
+        return f.read()
+
+
+def make_files(directory):
+    paths = {name: os.path.join(directory, f"{name}.sv") for name in ("top", "sub", "fifo")}
+    for name, path in paths.items():
+        write_file(path, f"module {name}; endmodule\n")
+    return paths
+
+
+def test_restore_latest_generation(tmp_path):
+    paths = make_files(str(tmp_path))
+    store = BackupStore(str(tmp_path / "backup"))
+    store.create_generation({path: (read_file(path), [name]) for name, path in paths.items()})
+
+    write_file(paths["top"], "patched\n")
+    write_file(paths["sub"], "patched\n")
+    restored, unchanged = store.restore()
+
+    # Only the modified files are written back.
+    assert sorted(restored) == sorted([paths["top"], paths["sub"]])
+    assert unchanged == [paths["fifo"]]
+    assert read_file(paths["top"]) == "module top; endmodule\n"
+    assert store.generations() == []
+    assert os.listdir(str(tmp_path / "backup" / "objects")) == []
+
+
+def test_restore_one_file_or_module(tmp_path):
+    paths = make_files(str(tmp_path))
+    store = BackupStore(str(tmp_path / "backup"))
+    store.create_generation({path: (read_file(path), [name]) for name, path in paths.items()})
+    for path in paths.values():
+        write_file(path, "patched\n")
+
+    assert store.restore(filepaths=[paths["sub"]]) == ([paths["sub"]], [])
+    assert store.restore(modules=["fifo"]) == ([paths["fifo"]], [])
+    assert read_file(paths["top"]) == "patched\n"
+    assert store.generations() == [1]
+
+    assert store.restore() == ([paths["top"]], [])
+    assert store.generations() == []
+
+
+def test_restore_generations_newest_first(tmp_path):
+    paths = make_files(str(tmp_path))
+    store = BackupStore(str(tmp_path / "backup"))
+    original = read_file(paths["top"])
+
+    assert store.create_generation({paths["top"]: (original, ["top"])}) == 1
+    write_file(paths["top"], "first patch\n")
+    assert store.create_generation({paths["top"]: ("first patch\n", ["top"])}) == 2
+    write_file(paths["top"], "second patch\n")
+
+    store.restore()
+    assert read_file(paths["top"]) == "first patch\n"
+    store.restore()
+    assert read_file(paths["top"]) == original
+    assert store.restore() == ([], [])
+
+
+def test_identical_contents_are_stored_once(tmp_path):
+    paths = make_files(str(tmp_path))
+    store = BackupStore(str(tmp_path / "backup"))
+    write_file(paths["sub"], read_file(paths["top"]))
+
+    store.create_generation({path: (read_file(path), [name]) for name, path in paths.items()})
+    store.create_generation({paths["top"]: (read_file(paths["top"]), ["top"])})
+
+    assert len(os.listdir(str(tmp_path / "backup" / "objects"))) == 2
+
+
+def test_legacy_backup_is_undone_last(tmp_path):
+    paths = make_files(str(tmp_path))
+    store = BackupStore(str(tmp_path / "backup"))
+    legacy_path = str(tmp_path / "backup.json")
+    original = read_file(paths["top"])
+
+    # A baseline patch run left its backup behind, a newer run patched the file again.
+    write_file(legacy_path, json.dumps({paths["top"]: original}))
+    write_file(paths["top"], "first patch\n")
+    store.create_generation({paths["top"]: ("first patch\n", ["top"])})
+    write_file(paths["top"], "second patch\n")
+
+    assert store.import_legacy_backup(legacy_path) == 0
+    assert not os.path.isfile(legacy_path)
+    assert store.import_legacy_backup(legacy_path) is None
+
+    store.restore()
+    assert read_file(paths["top"]) == "first patch\n"
+    store.restore()
+    assert read_file(paths["top"]) == original
+
+
+def test_legacy_backup_goes_before_generation_zero(tmp_path):
+    paths = make_files(str(tmp_path))
+    store = BackupStore(str(tmp_path / "backup"))
+    legacy_path = str(tmp_path / "backup.json")
+    original = read_file(paths["top"])
+
+    # An earlier legacy import already took generation 0, a second legacy backup is older still.
+    write_file(legacy_path, json.dumps({paths["top"]: original}))
+    store.create_generation({paths["top"]: ("first patch\n", ["top"])}, 0)
+    write_file(paths["top"], "second patch\n")
+
+    assert store.import_legacy_backup(legacy_path) == -1
+    assert store.generations() == [-1, 0]
+
+    store.restore()
+    assert read_file(paths["top"]) == "first patch\n"
+    store.restore()
+    assert read_file(paths["top"]) == original
+    assert store.generations() == []
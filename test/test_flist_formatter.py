@@ -0,0 +1,121 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import source.flist_formatter as flist_formatter_module
+from source.flist_formatter import FlistFormatter
+from source.source_index import SourceIndex
+
+
+def write_file(path, content=""):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        f.write(content)
+    return path
+
+
+@pytest.fixture
+def design(tmp_path, monkeypatch):
+    root = str(tmp_path)
+    monkeypatch.setenv("DESIGN_DIR", root)
+    monkeypatch.chdir(root)
+
+    write_file(os.path.join(root, "rtl", "top.sv"), '`include "defs.svh"\nmodule top; endmodule\n')
+    write_file(os.path.join(root, "rtl", "util.sv"), "module util; endmodule\n")
+    write_file(os.path.join(root, "include", "defs.svh"), '`include "nested.svh"\n')
+    write_file(os.path.join(root, "include", "nested.svh"))
+    write_file(os.path.join(root, "include", "unused.svh"))
+    write_file(os.path.join(root, "include", "README.md"))
+    write_file(os.path.join(root, "ip", "fifo.sv"), "module fifo; endmodule\n")
+    write_file(os.path.join(root, "ip", "fifo.flist"), "// Paths relative to this flist.\nfifo.sv\n../rtl/util.sv\n")
+    write_file(os.path.join(root, "lists", "core.f"), "rtl/util.sv  // relative to the working directory\n")
+    write_file(
+        os.path.join(root, "top.f"),
+        "+incdir+${DESIGN_DIR}/include\n"
+        "+define+SYNTHESIS+WIDTH=32\n"
+        "-sverilog\n"
+        "# Sources\n"
+        "${DESIGN_DIR}//rtl/top.sv // the design top\n"
+        "-F ${DESIGN_DIR}/ip/fifo.flist\n"
+        "-f lists/core.f\n"
+        "-F ip/fifo.flist\n"
+        "docs/spec.pdf\n",
+    )
+    return root
+
+
+def test_expand_flist(design):
+    formatter = FlistFormatter()
+
+    files = formatter.expand("top.f")
+
+    # Headers are only listed when a source includes them, every file once, non-HDL files are dropped.
+    assert files == [
+        os.path.join(design, "rtl", "top.sv"),
+        os.path.join(design, "include", "defs.svh"),
+        os.path.join(design, "include", "nested.svh"),
+        os.path.join(design, "ip", "fifo.sv"),
+        os.path.join(design, "rtl", "util.sv"),
+    ]
+    assert formatter.include_dirs == [os.path.join(design, "include")]
+    # Include directories are searched for the files the flist did not yield, for modules it does not declare.
+    assert list(formatter.iter_library_files()) == [os.path.join(design, "include", "unused.svh")]
+    assert list(FlistFormatter().iter_library_files()) == []
+    assert formatter.skipped_files == [os.path.join("docs", "spec.pdf")]
+    assert formatter.format_cva6("top.f") == "\n".join(files)
+
+
+def test_flist_cycle_is_reported(design):
+    write_file(os.path.join(design, "a.f"), "-F b.f\n")
+    write_file(os.path.join(design, "b.f"), "-F a.f\n")
+
+    with pytest.raises(ValueError, match="cycle"):
+        FlistFormatter().expand("a.f")
+
+
+def test_missing_flist_is_reported(design):
+    write_file(os.path.join(design, "broken.f"), "-F missing.flist\n")
+
+    with pytest.raises(FileNotFoundError):
+        FlistFormatter().expand("broken.f")
+
+
+def test_files_are_streamed_while_the_flist_is_read(design):
+    write_file(os.path.join(design, "late.f"), "rtl/top.sv\n-F missing.flist\n+incdir+include\n")
+    write_file(os.path.join(design, "late_incdir.f"), "rtl/top.sv\n+incdir+include\n")
+
+    # The first file is yielded before the rest of the flist is read, and the streamed files equal the expansion.
+    files = FlistFormatter().iter_files("late.f")
+    assert next(files) == os.path.join("rtl", "top.sv")
+    with pytest.raises(FileNotFoundError):
+        next(files)
+    assert list(FlistFormatter().iter_files("top.f")) == FlistFormatter().expand("top.f")
+
+    # Headers found in an include directory given after their includer still follow the flist.
+    assert FlistFormatter().expand("late_incdir.f") == [
+        os.path.join("rtl", "top.sv"),
+        os.path.join("include", "defs.svh"),
+        os.path.join("include", "nested.svh"),
+    ]
+
+
+def test_includes_of_indexed_files_are_not_read_again(design, monkeypatch):
+    files = FlistFormatter().expand("top.f")
+    source_index = SourceIndex(index_path=None)
+    source_index.update(files)
+    assert source_index.entry(files[0])["includes"] == ["defs.svh"]
+
+    def fail_to_scan(code):
+        raise AssertionError("An indexed file was read again.")
+
+    # Up to date files take their includes from the index, a changed file is read again.
+    with monkeypatch.context() as patch:
+        patch.setattr(flist_formatter_module, "scan_includes", fail_to_scan)
+        assert FlistFormatter(source_index).expand("top.f") == files
+        write_file(files[0], '`include "defs.svh"\n// `include "unused.svh"\nmodule top; endmodule\n')
+        with pytest.raises(AssertionError, match="read again"):
+            FlistFormatter(source_index).expand("top.f")
+    assert FlistFormatter(source_index).expand("top.f") == files
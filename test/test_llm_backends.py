@@ -0,0 +1,178 @@
+import asyncio
+import json
+import os
+import re
+import subprocess
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import source.llm_communicator as LLMCommunicator
+from source.llm_backends import MOCK_BATCH_MARKER, MOCK_CONTROL_SIGNALS, MockBackend, create_backend, mock_certainty
+from source.llm_cache import LLMCache
+
+NUM_MODULES = 6
+MOCK_LATENCY = 0.05
+
+
+def make_modules(write_module):
+    modules = {}
+    for i in range(NUM_MODULES):
+        path = write_module(f"mod_{i}", i)
+        modules[f"top.u_mod_{i}"] = {"declaration_path": path, "module_name": f"mod_{i}", "signal_width_data": {"busy": 1, "idle": 1}}
+    return modules
+
+
+def answer_malformed(monkeypatch, source, requested_sources):
+    # Makes the mock backend drop the signal names from its answers about 'source', and records every requested source.
+    complete = MockBackend.complete
+
+    async def malformed_complete(self, role, prompt, max_tokens):
+        response = await complete(self, role, prompt, max_tokens)
+        requested_sources.extend(re.findall(r"<source>(.*?)</source>", prompt))
+        if f"<source>{source}</source>" not in prompt:
+            return response
+        data = json.loads(response)
+        for signal in data["fuzz_candidates"]["signals"]:
+            del signal["name"]
+        return json.dumps(data)
+
+    monkeypatch.setattr(MockBackend, "complete", malformed_complete)
+
+
+def test_mock_backend_is_deterministic():
+    prompt = LLMCommunicator.PROMPT.format("fifo.sv", ["busy", "idle"], "module fifo; endmodule")
+
+    responses = [json.loads(asyncio.run(MockBackend().complete(LLMCommunicator.ROLE, prompt, 100))) for _ in range(2)]
+
+    assert responses[0] == responses[1]
+    assert [signal["name"] for signal in responses[0]["fuzz_candidates"]["signals"]] == ["busy", "idle"]
+    assert responses[0]["fuzz_candidates"]["signals"][0]["certainty"] == mock_certainty("fifo.sv", "busy")
+    assert responses[0]["control_signals"] == MOCK_CONTROL_SIGNALS
+
+
+def test_unknown_backend_is_rejected():
+    with pytest.raises(ValueError):
+        create_backend("unknown")
+    with pytest.raises(ValueError):
+        LLMCommunicator.LLMCommunicator({}, "unknown")
+
+
+def test_sdks_are_imported_only_when_selected():
+    code = "import sys; sys.argv = ['ailof.py', '--help']\ntry:\n    import ailof\nexcept SystemExit:\n    pass\nprint('openai' in sys.modules or 'anthropic' in sys.modules)"
+    repo_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+    result = subprocess.run([sys.executable, "-c", code], cwd=repo_dir, capture_output=True, text=True, check=True)
+
+    assert result.stdout.splitlines()[-1] == "False"
+
+
+@pytest.mark.parametrize("pack_tokens", [0, LLMCommunicator.PACK_TOKEN_LIMIT])
+def test_end_to_end_analysis_with_mock_backend(tmp_path, write_module, pack_tokens):
+    modules = make_modules(write_module)
+    llm_cache = LLMCache(str(tmp_path / "cache"))
+
+    communicator = LLMCommunicator.LLMCommunicator(modules, "mock", llm_cache=llm_cache, pack_tokens=pack_tokens, backend_options={"latency": MOCK_LATENCY})
+    analyzed_modules = communicator.run()
+
+    # Separate requests overlap, which does not depend on how loaded the machine is.
+    assert communicator.backend.num_requests == (1 if pack_tokens else NUM_MODULES)
+    if not pack_tokens:
+        assert communicator.backend.max_in_flight > 1
+    for i in range(NUM_MODULES):
+        fuzz_candidates = analyzed_modules[f"top.u_mod_{i}"]["fuzz_candidates"]
+        assert [(signal["name"], signal["certainty"]) for signal in fuzz_candidates] == [
+            ("busy", mock_certainty(f"mod_{i}" if pack_tokens else f"mod_{i}.sv", "busy")),
+            ("idle", mock_certainty(f"mod_{i}" if pack_tokens else f"mod_{i}.sv", "idle")),
+        ]
+        assert analyzed_modules[f"top.u_mod_{i}"]["control_signals"] == MOCK_CONTROL_SIGNALS
+
+    # An unchanged design is analysed again without a single request.
+    communicator = LLMCommunicator.LLMCommunicator(modules, "mock", llm_cache=llm_cache, pack_tokens=pack_tokens)
+    communicator.run()
+    assert communicator.backend.num_requests == 0
+
+
+def test_structural_variants_are_analysed_once(tmp_path):
+    modules = {}
+    for prefix, depth in (("rx", 4), ("tx", 8)):
+        path = tmp_path / f"{prefix}_fifo.sv"
+        path.write_text(f"module {prefix}_fifo #(parameter DEPTH = {depth}) (input logic clk_i); logic {prefix}_busy; logic {prefix}_idle; endmodule\n")
+        modules[f"top.u_{prefix}"] = {"declaration_path": str(path), "module_name": f"{prefix}_fifo", "signal_width_data": {f"{prefix}_busy": 1}}
+    modules["top.u_tx"]["signal_width_data"]["tx_idle"] = 1
+
+    communicator = LLMCommunicator.LLMCommunicator(modules, "mock", pack_tokens=0)
+    analyzed_modules = communicator.run()
+
+    # The first variant is analysed for the signals of both, the result is mapped to the names of the second.
+    assert communicator.backend.num_requests == 1
+    assert [signal["name"] for signal in analyzed_modules["top.u_rx"]["fuzz_candidates"]] == ["rx_busy"]
+    assert [(signal["name"], signal["certainty"]) for signal in analyzed_modules["top.u_tx"]["fuzz_candidates"]] == [
+        ("tx_busy", mock_certainty("rx_fifo.sv", "rx_busy")),
+        ("tx_idle", mock_certainty("rx_fifo.sv", "rx_idle")),
+    ]
+    assert analyzed_modules["top.u_tx"]["control_signals"] == MOCK_CONTROL_SIGNALS
+
+
+def test_malformed_response_is_not_cached(tmp_path, write_module, monkeypatch):
+    modules = make_modules(write_module)
+    llm_cache = LLMCache(str(tmp_path / "cache"))
+    requested_sources = []
+    answer_malformed(monkeypatch, "mod_0.sv", requested_sources)
+
+    with pytest.raises(ValueError, match="without a name"):
+        LLMCommunicator.LLMCommunicator(modules, "mock", llm_cache=llm_cache, pack_tokens=0).run()
+
+    # The malformed answer was rejected before it was cached, so the module is requested again.
+    monkeypatch.undo()
+    requested_sources.clear()
+    answer_malformed(monkeypatch, "none", requested_sources)
+    LLMCommunicator.LLMCommunicator(modules, "mock", llm_cache=llm_cache, pack_tokens=0).run()
+    assert "mod_0.sv" in requested_sources
+
+
+@pytest.mark.parametrize("error", ["malformed", "unexpected"])
+def test_failed_module_does_not_stop_background_analysis(write_module, monkeypatch, error):
+    modules = make_modules(write_module)
+    if error == "malformed":
+        answer_malformed(monkeypatch, "mod_0.sv", [])
+    else:
+        complete = MockBackend.complete
+
+        async def failing_complete(self, role, prompt, max_tokens):
+            if "<source>mod_0.sv</source>" in prompt:
+                raise KeyError("name")
+            return await complete(self, role, prompt, max_tokens)
+
+        monkeypatch.setattr(MockBackend, "complete", failing_complete)
+
+    communicator = LLMCommunicator.LLMCommunicator(modules, "mock", pack_tokens=0, backend_options={"latency": MOCK_LATENCY})
+    results = communicator.start()
+    reported = dict(results.get(timeout=5) for _ in range(NUM_MODULES))
+    communicator.stop()
+
+    # The failure is reported for its module only, every other module is analysed.
+    assert isinstance(reported.pop("top.u_mod_0"), Exception)
+    assert sorted(reported) == [f"top.u_mod_{i}" for i in range(1, NUM_MODULES)]
+    assert all(info["control_signals"] == MOCK_CONTROL_SIGNALS for info in reported.values())
+
+
+def test_modules_missing_from_a_batch_are_analysed_concurrently(write_module, monkeypatch):
+    modules = make_modules(write_module)
+    complete = MockBackend.complete
+
+    async def empty_batch_complete(self, role, prompt, max_tokens):
+        response = await complete(self, role, prompt, max_tokens)
+        return "{}" if MOCK_BATCH_MARKER in prompt else response
+
+    monkeypatch.setattr(MockBackend, "complete", empty_batch_complete)
+
+    communicator = LLMCommunicator.LLMCommunicator(modules, "mock", pack_tokens=LLMCommunicator.PACK_TOKEN_LIMIT, backend_options={"latency": MOCK_LATENCY})
+    analyzed_modules = communicator.run()
+
+    # The batch answered none of its modules, they are requested again alone and at the same time.
+    assert communicator.backend.num_requests == 1 + NUM_MODULES
+    assert communicator.backend.max_in_flight > 1
+    assert all(analyzed_modules[f"top.u_mod_{i}"]["control_signals"] == MOCK_CONTROL_SIGNALS for i in range(NUM_MODULES))
@@ -0,0 +1,49 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from source.llm_cache import LLMCache
+
+MODULE_CONTENT = "module top; logic busy; endmodule\n"
+
+
+def test_key_covers_source_signals_model_and_prompt(tmp_path):
+    cache = LLMCache(str(tmp_path))
+    key = cache.make_key(MODULE_CONTENT, ["busy", "idle"], "model", "prompt")
+
+    assert cache.make_key(MODULE_CONTENT, ["idle", "busy"], "model", "prompt") == key
+    assert cache.make_key(MODULE_CONTENT + "\n", ["busy", "idle"], "model", "prompt") != key
+    assert cache.make_key(MODULE_CONTENT, ["busy"], "model", "prompt") != key
+    assert cache.make_key(MODULE_CONTENT, ["busy", "idle"], "other model", "prompt") != key
+    assert cache.make_key(MODULE_CONTENT, ["busy", "idle"], "model", "other prompt") != key
+
+
+def test_store_and_load(tmp_path):
+    cache = LLMCache(str(tmp_path))
+    key = cache.make_key(MODULE_CONTENT, ["busy"], "model", "prompt")
+
+    assert cache.load(key) is None
+    cache.store(key, '{"fuzz_candidates": {}}')
+    assert cache.load(key) == '{"fuzz_candidates": {}}'
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    response = "x" * 100
+    entry_size = len(f'{{"response": "{response}"}}')
+    cache = LLMCache(str(tmp_path), max_size=3 * entry_size)
+    keys = [cache.make_key(MODULE_CONTENT, [f"s{i}"], "model", "prompt") for i in range(4)]
+
+    for i, key in enumerate(keys[:3]):
+        cache.store(key, response)
+        os.utime(os.path.join(str(tmp_path), f"llm_{key}.json"), ns=(i * 10**9, i * 10**9))
+
+    # Reading the oldest entry makes the second one the least recently used. Nothing is dropped before the eviction.
+    assert cache.load(keys[0]) == response
+    cache.store(keys[3], response)
+    assert cache.load(keys[1]) == response
+    os.utime(os.path.join(str(tmp_path), f"llm_{keys[1]}.json"), ns=(10**9, 10**9))
+    cache.evict()
+
+    assert cache.load(keys[1]) is None
+    assert all(cache.load(key) == response for key in (keys[0], keys[2], keys[3]))
@@ -0,0 +1,168 @@
+import json
+import os
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+pytest.importorskip("openai")
+pytest.importorskip("anthropic")
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import source.llm_communicator as LLMCommunicator
+import source.llm_rate_limiter as LLMRateLimiter
+from source.llm_cache import LLMCache
+
+NUM_MODULES = 6
+RESPONSE_DELAY = 0.2
+
+
+class StandInServer(ThreadingHTTPServer):
+    # A local stand-in for the chat completions API. The first request for every module is rate limited.
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), StandInHandler)
+        self.lock = threading.Lock()
+        self.rate_limited_modules = set()
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.num_requests = 0
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def __reply(self, status, body):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        prompt = request["messages"][-1]["content"]
+        sources = re.findall(r"<source>(.*?)</source>", prompt)
+
+        with self.server.lock:
+            self.server.num_requests += 1
+            is_first_request = sources[0] not in self.server.rate_limited_modules
+            self.server.rate_limited_modules.add(sources[0])
+            self.server.in_flight += 1
+            self.server.max_in_flight = max(self.server.max_in_flight, self.server.in_flight)
+
+        time.sleep(RESPONSE_DELAY)
+        with self.server.lock:
+            self.server.in_flight -= 1
+
+        if is_first_request:
+            self.__reply(429, {"error": {"message": "Rate limit reached", "type": "requests", "code": "rate_limit_exceeded"}})
+            return
+
+        analyses = {
+            source: {
+                "fuzz_candidates": {"signals": [{"name": "busy", "certainty": 90, "explanation": f"{source} handshake"}]},
+                "control_signals": {"clock": "clk_i", "reset": "rst_ni", "edge": "posedge"},
+            }
+            for source in sources
+        }
+        content = analyses if len(sources) > 1 else analyses[sources[0]]
+        message = {"role": "assistant", "content": json.dumps(content)}
+        self.__reply(
+            200,
+            {
+                "id": "chatcmpl-standin",
+                "object": "chat.completion",
+                "created": 0,
+                "model": request["model"],
+                "choices": [{"index": 0, "message": message, "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+            },
+        )
+
+
+def run_against_stand_in_server(modules, llm_cache=None, pack_tokens=0):
+    server = StandInServer()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        base_url = f"http://127.0.0.1:{server.server_address[1]}/v1"
+        analyzed_modules = LLMCommunicator.LLMCommunicator(modules, "openai", base_url, llm_cache=llm_cache, pack_tokens=pack_tokens).run()
+    finally:
+        server.shutdown()
+        server.server_close()
+    return server, analyzed_modules
+
+
+@pytest.fixture(autouse=True)
+def stand_in_environment(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "stand-in")
+    monkeypatch.setattr(LLMRateLimiter, "retry_delay", lambda attempt: 0.01)
+
+
+def test_concurrent_analysis_against_stand_in_server(tmp_path, write_module):
+    modules = {}
+    for i in range(NUM_MODULES):
+        path = write_module(f"mod_{i}", i)
+        modules[f"top.u_mod_{i}"] = {"declaration_path": path, "module_name": f"mod_{i}", "signal_width_data": {"busy": 1, "idle": 1}}
+
+    llm_cache = LLMCache(str(tmp_path / "cache"))
+    server, analyzed_modules = run_against_stand_in_server(modules, llm_cache)
+
+    # The requests overlap, which does not depend on how loaded the machine is.
+    assert server.num_requests == 2 * NUM_MODULES
+    assert server.max_in_flight > 1
+    for i in range(NUM_MODULES):
+        assert analyzed_modules[f"top.u_mod_{i}"]["fuzz_candidates"][0]["explanation"] == f"mod_{i}.sv handshake"
+        assert analyzed_modules[f"top.u_mod_{i}"]["control_signals"]["clock"] == "clk_i"
+
+    # An unchanged design is analysed again without a single request.
+    server, _ = run_against_stand_in_server(modules, llm_cache)
+    assert server.num_requests == 0
+
+
+def test_instances_share_one_analysis(write_module):
+    path = write_module("bank")
+    modules = {f"top.u_bank_{i}": {"declaration_path": path, "module_name": "bank", "signal_width_data": {"busy": 1}} for i in range(NUM_MODULES)}
+    modules["top.u_bank_0"]["signal_width_data"] = {"idle": 1}
+
+    server, analyzed_modules = run_against_stand_in_server(modules)
+
+    # One rate limited and one successful request for all instances.
+    assert server.num_requests == 2
+    assert analyzed_modules["top.u_bank_0"]["fuzz_candidates"] == []
+    assert all(analyzed_modules[f"top.u_bank_{i}"]["fuzz_candidates"][0]["name"] == "busy" for i in range(1, NUM_MODULES))
+
+
+def test_large_module_is_analysed_in_windows(tmp_path, monkeypatch):
+    monkeypatch.setattr(LLMCommunicator, "MAX_PROMPT_TOKENS", 600)
+    monkeypatch.setattr(LLMCommunicator, "CHUNK_WINDOW_TOKENS", 150)
+    body = "\n".join(f"  assign busy_{i} = busy & idle_{i};" for i in range(60))
+    path = tmp_path / "big.sv"
+    path.write_text(f"module big (input logic clk_i);\n  logic busy;\n{body}\nendmodule\n")
+    modules = {"top.u_big": {"declaration_path": str(path), "module_name": "big", "signal_width_data": {"busy": 1}}}
+
+    server, analyzed_modules = run_against_stand_in_server(modules)
+
+    # One rate limited request, then one request per window.
+    assert server.num_requests > 4
+    assert [(signal["name"], signal["certainty"]) for signal in analyzed_modules["top.u_big"]["fuzz_candidates"]] == [("busy", 90)]
+
+
+def test_small_modules_are_packed_into_one_request(write_module):
+    modules = {}
+    for i in range(NUM_MODULES):
+        path = write_module(f"mod_{i}", i)
+        modules[f"top.u_mod_{i}"] = {"declaration_path": path, "module_name": f"mod_{i}", "signal_width_data": {"busy": 1}}
+
+    server, analyzed_modules = run_against_stand_in_server(modules, pack_tokens=LLMCommunicator.PACK_TOKEN_LIMIT)
+
+    # One rate limited and one successful request, the response is split back per module.
+    assert server.num_requests == 2
+    for i in range(NUM_MODULES):
+        assert analyzed_modules[f"top.u_mod_{i}"]["fuzz_candidates"][0]["explanation"] == f"mod_{i} handshake"
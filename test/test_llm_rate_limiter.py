@@ -0,0 +1,86 @@
+import asyncio
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from source.llm_rate_limiter import RateLimiter, call_with_retries, is_retryable_error
+
+
+class FakeClock:
+    # A clock that only moves when the limiter sleeps.
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    async def sleep(self, delay):
+        self.now += delay
+
+
+class StatusError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"status {status_code}")
+        self.status_code = status_code
+
+
+def acquire_all(limiter, token_counts):
+    async def run():
+        times = []
+        for num_tokens in token_counts:
+            await limiter.acquire(num_tokens)
+            times.append(limiter.clock())
+        return times
+
+    return asyncio.run(run())
+
+
+def test_request_limit():
+    clock = FakeClock()
+    limiter = RateLimiter(2, 1000, clock, clock.sleep)
+
+    # The bucket starts full, then refills one request every 30 seconds.
+    assert acquire_all(limiter, [1, 1, 1, 1]) == pytest.approx([0, 0, 30, 60])
+
+
+def test_token_limit():
+    clock = FakeClock()
+    limiter = RateLimiter(100, 100, clock, clock.sleep)
+
+    # A request larger than the limit waits for a full bucket.
+    assert acquire_all(limiter, [80, 80, 500]) == pytest.approx([0, 36, 96])
+
+
+def test_retryable_errors():
+    assert is_retryable_error(StatusError(429))
+    assert is_retryable_error(StatusError(503))
+    assert is_retryable_error(ConnectionResetError())
+    assert not is_retryable_error(StatusError(400))
+    assert not is_retryable_error(ValueError())
+
+
+def test_call_with_retries():
+    clock = FakeClock()
+    errors = [StatusError(429), StatusError(500)]
+
+    async def request():
+        if errors:
+            raise errors.pop(0)
+        return "done"
+
+    assert asyncio.run(call_with_retries(request, sleep=clock.sleep)) == "done"
+
+    async def bad_request():
+        raise StatusError(400)
+
+    with pytest.raises(StatusError):
+        asyncio.run(call_with_retries(bad_request, sleep=clock.sleep))
+
+    async def overloaded():
+        raise StatusError(529)
+
+    with pytest.raises(StatusError):
+        asyncio.run(call_with_retries(overloaded, max_retries=2, sleep=clock.sleep))
@@ -0,0 +1,72 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from source.module_chunker import merge_window_results, pack_into_batches, referenced_signals, split_into_windows, split_statements
+from source.sv_lexer import scan_verilog
+from source.token_estimator import count_tokens
+
+NUM_STATEMENTS = 40
+
+
+def generate_module():
+    lines = ["module big (input logic clk_i, output logic done_o);"]
+    for i in range(NUM_STATEMENTS):
+        lines.append(f"assign sig_{i} = sig_{(i + 1) % NUM_STATEMENTS} & clk_i;")
+    lines.append("always_ff @(posedge clk_i) begin\ndone_o <= sig_0;\nend")
+    lines.append("endmodule")
+    return "\n".join(lines)
+
+
+def make_data(signals, clock="clk_i"):
+    return {
+        "fuzz_candidates": {"signals": [{"name": name, "certainty": certainty, "explanation": ""} for name, certainty in signals]},
+        "control_signals": {"clock": clock, "reset": "rst_ni", "edge": "posedge"},
+    }
+
+
+def test_split_statements():
+    assert split_statements("\nassign a = b;\nalways_comb begin\nc = d;\nend\n") == ["\nassign a = b;", "\nalways_comb begin", "\nc = d;", "\nend"]
+
+
+def test_split_into_windows():
+    module_code = generate_module()
+    windows = split_into_windows(module_code, 120, 20)
+
+    assert len(windows) > 2
+    for window in windows:
+        # Every window is a complete module with the original header, cut at statement boundaries.
+        (module,) = scan_verilog(window).modules
+        assert window.startswith("module big (input logic clk_i, output logic done_o);")
+        assert window.endswith("endmodule")
+        assert module.body_end is not None
+        assert count_tokens(window) <= 120
+
+    # The windows overlap and cover every statement.
+    assert "assign sig_0 =" in windows[0] and "done_o <= sig_0;" in windows[-1]
+    assert sum(window.count("assign ") for window in windows) > NUM_STATEMENTS
+    assert split_into_windows(module_code, 10000, 20) == [module_code]
+
+
+def test_referenced_signals():
+    assert referenced_signals("assign sig_1 = sig_2[0]; // sig_3", ["sig_3", "sig_2", "sig_1"]) == ["sig_2", "sig_1"]
+
+
+def test_merge_window_results():
+    data = merge_window_results(
+        [
+            (["busy", "idle"], make_data([("busy", 80), ("idle", 60)])),
+            (["busy", "full"], make_data([("busy", 100)])),
+            (["busy"], make_data([("busy", 90), ("full", 50)], clock="clk2_i")),
+        ]
+    )
+
+    # 'full' was seen in one window that did not propose it, the proposal of a window that did not see it is dropped.
+    assert [(signal["name"], signal["certainty"]) for signal in data["fuzz_candidates"]["signals"]] == [("busy", 90), ("idle", 60)]
+    assert data["control_signals"]["clock"] == "clk_i"
+
+
+def test_pack_into_batches():
+    assert pack_into_batches([300, 700, 200, 900, 100], 1000, 8) == [[3, 4], [0, 1], [2]]
+    assert pack_into_batches([100] * 5, 1000, 2) == [[0, 1], [2, 3], [4]]
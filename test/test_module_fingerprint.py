@@ -0,0 +1,31 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from source.module_fingerprint import map_identifiers, structural_fingerprint
+
+FIFO_TEMPLATE = """module {prefix}_fifo_d{depth} #(parameter int DEPTH = {depth}) (input logic clk_i, output logic {prefix}_full_o);
+  logic [{depth}-1:0] {prefix}_valid_q;  // {depth} entries
+  always_ff @(posedge clk_i) {prefix}_valid_q <= {{{prefix}_valid_q[{depth}-2:0], 1'b1}};
+  assign {prefix}_full_o = &{prefix}_valid_q;
+endmodule
+"""
+
+
+def test_variants_share_a_fingerprint():
+    fingerprint_d4, identifiers_d4 = structural_fingerprint(FIFO_TEMPLATE.format(prefix="rx", depth=4))
+    fingerprint_d8, identifiers_d8 = structural_fingerprint(FIFO_TEMPLATE.format(prefix="tx", depth=8))
+
+    assert fingerprint_d4 == fingerprint_d8
+    assert identifiers_d4[:3] == ["rx_fifo_d4", "DEPTH", "clk_i"]
+    assert map_identifiers(identifiers_d4, identifiers_d8)["rx_valid_q"] == "tx_valid_q"
+
+
+def test_structural_changes_change_the_fingerprint():
+    fingerprint, _ = structural_fingerprint(FIFO_TEMPLATE.format(prefix="rx", depth=4))
+    changed_operator = FIFO_TEMPLATE.replace("= &", "= |").format(prefix="rx", depth=4)
+    reused_identifier = FIFO_TEMPLATE.replace("assign {prefix}_full_o", "assign {prefix}_valid_q").format(prefix="rx", depth=4)
+
+    assert structural_fingerprint(changed_operator)[0] != fingerprint
+    assert structural_fingerprint(reused_identifier)[0] != fingerprint
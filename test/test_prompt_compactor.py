@@ -0,0 +1,42 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from source.prompt_compactor import compact_verilog, dedupe_signal_names, module_span
+
+VERILOG_CODE = """// Copyright header.
+/* A block comment
+   over two lines. */
+module helper (input logic a);
+endmodule
+
+module top (
+    input  logic clk_i,   // clock
+    output logic busy_o
+);
+  assign busy_o = clk_i/* inline */&clk_i;
+  initial $display("keep  // this");
+
+endmodule
+"""
+
+
+def test_module_span():
+    span = module_span(VERILOG_CODE, "top")
+
+    assert span.startswith("module top (") and span.endswith("endmodule")
+    assert "helper" not in span
+    assert module_span(VERILOG_CODE, "missing") == VERILOG_CODE
+
+
+def test_compact_verilog():
+    compacted = compact_verilog(module_span(VERILOG_CODE, "top"))
+
+    assert compacted == (
+        'module top (\ninput logic clk_i,\noutput logic busy_o\n);\nassign busy_o = clk_i &clk_i;\ninitial $display("keep  // this");\nendmodule'
+    )
+
+
+def test_dedupe_signal_names():
+    assert dedupe_signal_names(["busy", "cnt[3:0]", "busy[0]", "cnt", "addr[0]"]) == ["busy", "cnt", "addr"]
@@ -0,0 +1,208 @@
+import os
+import random
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import source.rtl_patcher as rtl_patcher_module
+from source.enums import ReturnCode
+from source.rtl_patcher import RtlPatcher, extract_module_parts, index_module_boundaries, index_module_connectivity
+
+TOP_RTL = """// Top level of the test design.
+module top #(parameter int W = 4) (
+  input  logic clk_i,
+  input  logic rst_ni,
+  input  logic req_i,
+  output logic ready_o
+);
+  logic busy;
+  logic [W-1:0] cnt;
+  assign busy = req_i & ~ready_o;
+  always_ff @(posedge clk_i) begin
+    if (busy) cnt <= cnt + 1;
+  end
+  sub u_sub (.a_i(busy), .b_o(ready_o), .clk_i(clk_i));
+  sub u_sub2 (.a_i(req_i), .b_o(busy), .clk_i(clk_i));
+endmodule
+
+module helper (input logic x_i);
+endmodule
+"""
+
+SUB_RTL = """module sub (input logic a_i, output logic b_o, input logic clk_i);
+  assign b_o = a_i;
+endmodule
+"""
+
+
+def write_design(directory):
+    top_path = os.path.join(directory, "top.sv")
+    sub_path = os.path.join(directory, "sub.sv")
+    with open(top_path, "w") as f:
+        f.write(TOP_RTL)
+    with open(sub_path, "w") as f:
+        f.write(SUB_RTL)
+
+    json_design_hierarchy = {
+        "top": {"declaration_path": top_path, "module_name": "top"},
+        "top.u_sub": {"declaration_path": sub_path, "module_name": "sub"},
+        "top.u_sub2": {"declaration_path": sub_path, "module_name": "sub"},
+    }
+    return top_path, json_design_hierarchy
+
+
+def make_selected_signal(declaration_path, name, gate_type="&", module_name="top"):
+    signal_info = {
+        "name": name,
+        "certainty": 90,
+        "width": 1,
+        "module_name": module_name,
+        "declaration_path": declaration_path,
+        "parent_module_control_signals": {"clock": "clk_i", "reset": "rst_ni", "edge": "posedge"},
+    }
+    return {"signal_info": signal_info, "gate_type": gate_type}
+
+
+def test_module_boundaries():
+    module_index = index_module_boundaries(TOP_RTL)
+
+    assert list(module_index.keys()) == ["top", "helper"]
+    header_content, module_definition, module_body = extract_module_parts(TOP_RTL, "top", module_index)
+    assert header_content == "// Top level of the test design."
+    assert module_definition.startswith("module top #(") and module_definition.endswith("output logic ready_o\n);")
+    assert module_body.startswith("logic busy;") and module_body.endswith(".clk_i(clk_i));")
+    assert extract_module_parts(TOP_RTL, "missing") == (None, None, None)
+
+
+def test_module_connectivity():
+    connectivity = index_module_connectivity(TOP_RTL)
+
+    assert sorted(connectivity.keys()) == ["busy", "clk_i", "ready_o", "req_i"]
+    assert [(instance.name, connection.port) for instance, connection in connectivity["busy"]] == [("u_sub", "a_i"), ("u_sub2", "b_o")]
+    assert TOP_RTL[connectivity["busy"][0][1].start :].startswith(".a_i(busy)")
+    assert [(instance.name, connection.port) for instance, connection in connectivity["clk_i"]] == [("u_sub", "clk_i"), ("u_sub2", "clk_i")]
+
+
+def test_patch(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    top_path, json_design_hierarchy = write_design(str(tmp_path))
+    selected_signals = {
+        "top.busy": make_selected_signal(top_path, "busy"),
+        "top.ready_o": make_selected_signal(top_path, "ready_o", "|"),
+        "top.req_i": make_selected_signal(top_path, "req_i"),
+    }
+
+    rtl_patcher = RtlPatcher(json_design_hierarchy, {}, selected_signals)
+    assert rtl_patcher.patch() == ReturnCode.SUCCESS
+    # Both instances of 'sub' share one scan of its declaration file.
+    assert rtl_patcher.source_index.num_scanned == 1
+
+    with open(top_path, "r") as f:
+        patched_code = f.read()
+
+    assert patched_code.startswith('import "DPI-C" function void init_top();\n')
+    assert "assign ready_o = modified_ready_o | punch_out_ready_o_1;" in patched_code
+    assert "assign modified_req_i = req_i & punch_out_req_i_2;" in patched_code
+    assert "assign modified_busy = busy & punch_out_busy_0;" in patched_code
+    assert "assign busy = modified_req_i & ~modified_ready_o;" in patched_code
+
+    # The submodule input sees the gated signal, the submodule output still drives the original one.
+    assert "sub u_sub (.a_i(modified_busy), .b_o(modified_ready_o), .clk_i(clk_i));" in patched_code
+    assert "sub u_sub2 (.a_i(modified_req_i), .b_o(busy), .clk_i(clk_i));" in patched_code
+
+    # The DPI calls land in the patched module, and the rest of the file is kept.
+    top_module = index_module_boundaries(patched_code)["top"]
+    assert "fuzz_top(punch_out_busy_0, punch_out_ready_o_1, punch_out_req_i_2);" in patched_code[: top_module.body_end]
+    assert patched_code.endswith("module helper (input logic x_i);\nendmodule\n")
+    assert os.path.isfile(os.path.join(str(tmp_path), "top_dpi.cpp"))
+
+
+def test_unresolved_port_sees_gated_signal(tmp_path, monkeypatch, capsys):
+    monkeypatch.chdir(tmp_path)
+    top_path, json_design_hierarchy = write_design(str(tmp_path))
+    with open(top_path, "w") as f:
+        f.write(TOP_RTL.replace(".clk_i(clk_i));\nendmodule", ".clk_i(clk_i));\n  sub u_sub3 (.bus(busy));\n  sub u_gone (.a_i(busy));\nendmodule"))
+    json_design_hierarchy["top.u_sub3"] = dict(json_design_hierarchy["top.u_sub"])
+
+    rtl_patcher = RtlPatcher(json_design_hierarchy, {}, {"top.busy": make_selected_signal(top_path, "busy")})
+    assert rtl_patcher.patch() == ReturnCode.SUCCESS
+
+    with open(top_path, "r") as f:
+        patched_code = f.read()
+
+    # A port the scanner cannot resolve is treated like an input, a submodule missing from the hierarchy keeps the net.
+    assert "sub u_sub3 (.bus(modified_busy));" in patched_code
+    assert "sub u_gone (.a_i(busy));" in patched_code
+    output = capsys.readouterr().out
+    assert "Direction of port 'bus' of submodule 'top.u_sub3'" in output
+    assert "Submodule 'top.u_gone'" in output
+
+
+def patch_two_files(directory, jobs, sub_signal="a_i"):
+    top_path, json_design_hierarchy = write_design(directory)
+    sub_path = json_design_hierarchy["top.u_sub"]["declaration_path"]
+    selected_signals = {
+        "top.busy": make_selected_signal(top_path, "busy"),
+        f"top.u_sub.{sub_signal}": make_selected_signal(sub_path, sub_signal, module_name="sub"),
+    }
+    return_code = RtlPatcher(json_design_hierarchy, {}, selected_signals, jobs=jobs).patch()
+
+    patched_files = []
+    for path in (top_path, sub_path, "top_dpi.cpp", "sub_dpi.cpp"):
+        if os.path.isfile(path):
+            with open(path, "r") as f:
+                patched_files.append(f.read())
+    return return_code, patched_files
+
+
+def test_parallel_patch_matches_serial(tmp_path, monkeypatch):
+    serial_dir = tmp_path / "serial"
+    parallel_dir = tmp_path / "parallel"
+    serial_dir.mkdir()
+    parallel_dir.mkdir()
+
+    # The fuzzer seeds are drawn before the files are patched on the pool, so they match the serial run.
+    monkeypatch.chdir(serial_dir)
+    random.seed(0)
+    serial_code, serial_files = patch_two_files(str(serial_dir), jobs=1)
+    monkeypatch.chdir(parallel_dir)
+    random.seed(0)
+    parallel_code, parallel_files = patch_two_files(str(parallel_dir), jobs=2)
+
+    assert serial_code == parallel_code == ReturnCode.SUCCESS
+    assert serial_files == parallel_files
+    assert len(parallel_files) == 4
+    assert "assign modified_a_i = a_i & punch_out_a_i_1;" in parallel_files[1]
+    assert os.path.isfile(os.path.join(str(parallel_dir), "sub_dpi.cpp"))
+
+
+def test_failed_patch_writes_nothing(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    return_code, patched_files = patch_two_files(str(tmp_path), jobs=2, sub_signal="missing")
+
+    assert return_code == ReturnCode.FAILURE
+    assert patched_files == [TOP_RTL, SUB_RTL]
+
+
+@pytest.mark.parametrize("existing_cpp", [False, True])
+def test_failed_commit_rolls_back(tmp_path, monkeypatch, existing_cpp):
+    monkeypatch.chdir(tmp_path)
+    if existing_cpp:
+        with open("top_dpi.cpp", "w") as f:
+            f.write("// Previous run.\n")
+
+    # The last write, the DPI source of 'sub', fails after both RTL files and the DPI source of 'top' were written.
+    write_text_atomic = rtl_patcher_module.write_text_atomic
+
+    def failing_write(output_path, text):
+        if output_path == "sub_dpi.cpp":
+            raise OSError("disk full")
+        write_text_atomic(output_path, text)
+
+    monkeypatch.setattr(rtl_patcher_module, "write_text_atomic", failing_write)
+    return_code, patched_files = patch_two_files(str(tmp_path), jobs=1)
+
+    assert return_code == ReturnCode.FAILURE
+    assert patched_files == [TOP_RTL, SUB_RTL] + (["// Previous run.\n"] if existing_cpp else [])
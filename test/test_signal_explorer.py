@@ -0,0 +1,97 @@
+import os
+import queue
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import source.llm_communicator as LLMCommunicator
+from source.enums import AnalysisStatus, Command
+from source.models.signal_model import SignalExplorerModel
+from source.signal_explorer import SignalExplorer
+
+NUM_MODULES = 6
+MOCK_LATENCY = 0.2
+
+
+def make_module_info(path, signals):
+    return {
+        "declaration_path": path,
+        "module_name": "mod",
+        "signal_width_data": {signal: 1 for signal in signals},
+        "fuzz_candidates": [{"name": signal, "certainty": 50, "explanation": ""} for signal in signals],
+        "control_signals": {"clock": "clk_i", "reset": "rst_ni", "edge": "posedge"},
+    }
+
+
+def test_streamed_signals_keep_their_ids():
+    model = SignalExplorerModel()
+    model.track_modules(["top.u_a", "top.u_b", "top.u_c"])
+
+    model.add_module("top.u_b", make_module_info("b.sv", ["busy", "idle"]))
+    model.filter("")
+    assert model.working_list_ids == [0, 1]
+
+    model.add_module("top.u_a", make_module_info("a.sv", ["valid"]))
+    model.add_module("top.u_b", make_module_info("b.sv", ["busy", "idle"]))
+    model.filter("")
+    assert [model.selected_signals[id].split(" | ")[0] for id in model.working_list_ids] == ["top.u_b.busy", "top.u_b.idle", "top.u_a.valid"]
+
+    # A stopped analysis fails the modules still pending, the analysed ones are kept.
+    model.fail_module(None, RuntimeError("API error"))
+    assert model.module_status == {"top.u_a": AnalysisStatus.DONE, "top.u_b": AnalysisStatus.DONE, "top.u_c": AnalysisStatus.FAILED}
+    assert model.analysis_progress() == (2, 1, 3)
+
+
+def test_selection_does_not_wait_for_unselected_modules(write_module):
+    modules = {}
+    for i in range(NUM_MODULES):
+        path = write_module(f"mod_{i}", i)
+        modules[f"top.u_mod_{i}"] = {"declaration_path": path, "module_name": f"mod_{i}", "signal_width_data": {"busy": 1}}
+
+    communicator = LLMCommunicator.LLMCommunicator(modules, "mock", max_concurrent_requests=1, pack_tokens=0, backend_options={"latency": MOCK_LATENCY})
+    communicator.start()
+    explorer = SignalExplorer(analysis=communicator)
+    controller = explorer.controller
+
+    # The first module is selectable while the others are still being analysed.
+    deadline = time.monotonic() + 10
+    while explorer.model.module_status["top.u_mod_0"] != AnalysisStatus.DONE and time.monotonic() < deadline:
+        time.sleep(MOCK_LATENCY / 4)
+        controller.collect_results()
+    assert explorer.model.module_status["top.u_mod_0"] == AnalysisStatus.DONE
+    assert explorer.model.pending_modules()
+
+    controller.keyword = "u_mod_0"
+    controller.process_command(Command.SEARCH)
+    controller.process_command(Command.SELECT)
+    controller.process_command(Command.CONTINUE)
+    communicator.stop()
+
+    assert not controller.running
+    assert list(controller.selected_signals) == ["top.u_mod_0.busy"]
+    assert controller.selected_signals["top.u_mod_0.busy"]["signal_info"]["parent_module_control_signals"]["clock"] == "clk_i"
+    assert communicator.backend.num_requests < NUM_MODULES
+
+
+class FailedAnalysis:
+    # Stands in for a background analysis whose modules failed.
+    def __init__(self, modules):
+        self.modules = modules
+        self.results = queue.Queue()
+        self.messages = []
+        for module in modules:
+            self.results.put((module, ValueError(f"Malformed response for {module}.")))
+
+    def stop(self):
+        pass
+
+
+def test_failed_modules_are_shown_with_their_error(capsys):
+    explorer = SignalExplorer(analysis=FailedAnalysis(["top.u_a"]))
+
+    explorer.controller.collect_results()
+    explorer.view.print_analysis_status()
+
+    assert explorer.model.module_errors == {"top.u_a": "Malformed response for top.u_a."}
+    assert capsys.readouterr().out == "Analysis: 0/1 module(s) done, 1 failed\nFailed: top.u_a: Malformed response for top.u_a.\n"
@@ -0,0 +1,41 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from source.signal_ranker import name_score, score_signals, select_top_signals
+
+MODULE_CODE = """module lsu (input logic clk_i, input logic rst_ni, input logic [63:0] wdata_i);
+  logic [63:0] wdata_q;
+  logic        req_valid, req_ready, lsu_busy, spare;
+  always_ff @(posedge clk_i) if (req_valid && req_ready) wdata_q <= wdata_i;
+  assign lsu_busy = req_valid & ~req_ready;
+endmodule
+"""
+
+SIGNAL_WIDTHS = {"clk_i": 1, "rst_ni": 1, "wdata_i": 64, "wdata_q": 64, "req_valid": 1, "req_ready": 1, "lsu_busy": 1, "spare": 1, "ghost": 1}
+
+
+def test_name_score():
+    assert name_score("req_valid") > name_score("wdata_q")
+    assert name_score("rd_en_q") > name_score("rden_q")
+    assert name_score("clk_i") < 0 and name_score("rst_ni") < 0
+
+
+def test_handshake_signals_rank_first():
+    signals = list(SIGNAL_WIDTHS)
+
+    assert select_top_signals(MODULE_CODE, signals, SIGNAL_WIDTHS, 3) == ["req_valid", "req_ready", "lsu_busy"]
+    assert select_top_signals(MODULE_CODE, signals, SIGNAL_WIDTHS, 0) == signals
+
+    # A signal that is never referenced in the module cannot be gated and goes last.
+    scores = score_signals(MODULE_CODE, signals, SIGNAL_WIDTHS)
+    assert min(scores, key=scores.get) == "ghost"
+
+
+def test_toggle_activity_breaks_ties():
+    signals = ["req_valid", "req_ready"]
+    toggle_counts = {"req_valid": 0, "req_ready": 120}
+
+    assert select_top_signals(MODULE_CODE, signals, SIGNAL_WIDTHS, 1) == ["req_valid"]
+    assert select_top_signals(MODULE_CODE, signals, SIGNAL_WIDTHS, 1, toggle_counts) == ["req_ready"]
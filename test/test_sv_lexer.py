@@ -0,0 +1,82 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from source.sv_lexer import scan_includes, scan_verilog, strip_comments, tokenize
+
+VERILOG_CODE = """// module fake_comment (input x);
+/* module fake_block; */
+module top import pkg::*; #(parameter int W = $clog2(8)) (
+  input  logic clk_i, rst_ni,
+  input  logic [W-1:0] data_i [2],
+  output logic valid_o = 1'b0, // output bogus
+  inout  wire  pad
+);
+  import "DPI-C" function void fuzz_top(output bit a);
+  function automatic logic f(input logic x); return x; endfunction
+  string s = "module fake_string (input q);";
+  fifo #(.DEPTH($clog2(f(4)))) u_fifo (.clk_i(clk_i), .data_i(data_i[0]), .full_o(), .*), u_fifo2 (clk_i, data_i);
+  for (genvar i = 0; i < 2; i++) begin : gen_x
+    sub u_sub [1:0] (.a(valid_o));
+  end
+  if (W > 2) sub u_sub2 (.a(pad));
+  always_comb valid_o = f(clk_i);
+endmodule
+
+module legacy(a, b);
+  input a;
+  output [3:0] b;
+endmodule
+"""
+
+
+def test_tokenize_skips_comments_and_keeps_strings():
+    tokens = list(tokenize('a = "// not a comment"; // comment\nb = 4\'hF; /* c */'))
+
+    assert [token.value for token in tokens] == ["a", "=", '"// not a comment"', ";", "b", "=", "4'hF", ";"]
+
+
+def test_strip_comments_preserves_offsets():
+    stripped = strip_comments(VERILOG_CODE)
+
+    assert len(stripped) == len(VERILOG_CODE)
+    assert stripped.count("\n") == VERILOG_CODE.count("\n")
+    assert "fake_comment" not in stripped and "fake_block" not in stripped
+
+
+def test_scan_modules():
+    scan_result = scan_verilog(VERILOG_CODE)
+
+    assert [module.name for module in scan_result.modules] == ["top", "legacy"]
+
+    top = scan_result.module("top")
+    assert top.ports == {"clk_i": "input", "rst_ni": "input", "data_i": "input", "valid_o": "output", "pad": "inout"}
+    assert VERILOG_CODE[top.start : top.header_end].endswith("inout  wire  pad\n);")
+    assert VERILOG_CODE[top.ports_end - 1] == ")"
+    assert VERILOG_CODE[top.body_end : top.end] == "endmodule"
+
+    legacy = scan_result.module("legacy")
+    assert legacy.ports == {"a": "input", "b": "output"}
+    assert VERILOG_CODE[legacy.start : legacy.header_end] == "module legacy(a, b);"
+
+
+def test_scan_instances():
+    instances = scan_verilog(VERILOG_CODE).instances
+
+    assert [(instance.module_class, instance.name) for instance in instances] == [
+        ("fifo", "u_fifo"),
+        ("fifo", "u_fifo2"),
+        ("sub", "u_sub"),
+        ("sub", "u_sub2"),
+    ]
+    assert [(c.port, c.expression) for c in instances[0].connections] == [("clk_i", "clk_i"), ("data_i", "data_i[0]"), ("full_o", ""), ("*", "*")]
+    assert [(c.port, c.expression) for c in instances[1].connections] == [(None, "clk_i"), (None, "data_i")]
+    assert VERILOG_CODE[instances[2].start : instances[2].end] == "sub u_sub [1:0] (.a(valid_o));"
+
+
+def test_scan_includes():
+    code = '`include "defs.svh"\n// `include "fake_comment.svh"\nstring s = "`include fake_string.svh";\nmodule top; `include "body.svh"\nendmodule\n'
+
+    assert scan_includes(code) == ["defs.svh", "body.svh"]
+    assert scan_verilog(code).includes == ["defs.svh", "body.svh"]
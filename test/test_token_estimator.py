@@ -0,0 +1,53 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from source.models.model import DesignExplorerModel
+from source.source_index import SourceIndex
+from source.token_estimator import count_tokens, estimate_tokens, estimate_tokens_from_length, format_tokens, get_encoder
+
+
+def test_estimate_tokens():
+    assert estimate_tokens("assign valid_o = req_i & ~busy;") == 11
+    assert estimate_tokens("") == 0
+    assert estimate_tokens_from_length("assign valid_o = req_i & ~busy;") == 8
+    assert estimate_tokens_from_length("") == 0
+
+
+def test_count_tokens():
+    # Without an OpenAI model the tokens are always estimated, with one the cached encoder is used if available.
+    text = "module top; logic busy; endmodule\n"
+    assert count_tokens(text, "claude") == estimate_tokens(text)
+    if get_encoder() is None:
+        assert count_tokens(text) == estimate_tokens(text)
+    assert get_encoder() is get_encoder()
+
+
+def test_format_tokens():
+    assert format_tokens(850) == "~850"
+    assert format_tokens(12400) == "~12.4k"
+
+
+def test_design_explorer_shows_indexed_module_costs(tmp_path):
+    path = tmp_path / "design.sv"
+    path.write_text("// Comments are not sent.\nmodule top; logic busy; endmodule\nmodule sub; endmodule\n")
+    source_index = SourceIndex(index_path=None)
+    source_index.update([str(path)])
+    model = DesignExplorerModel(source_index)
+    model.load_json_design_hierarchy(
+        {
+            "top": {"declaration_path": str(path), "module_name": "top"},
+            "top.u_sub": {"declaration_path": str(path), "module_name": "sub"},
+            "top.u_sub2": {"declaration_path": str(path), "module_name": "sub"},
+        }
+    )
+
+    assert model.module_tokens(0) == estimate_tokens("module top; logic busy; endmodule")
+    assert model.module_tokens(1) == estimate_tokens("module sub; endmodule")
+    # Instances of one declaration are analysed once, so they are counted once.
+    assert model.selection_tokens([0, 1, 2]) == model.module_tokens(0) + model.module_tokens(1)
+
+    # The costs come from the index, the declaration file is not read again.
+    path.unlink()
+    assert model.module_tokens(0) == estimate_tokens("module top; logic busy; endmodule")
@@ -1,11 +1,18 @@
 import os
 import sys
+import bz2
+import gzip
 import json
+import lzma
 import subprocess
 
+import pytest
+
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
-from source.vcd_parser import VcdParser
+from source.vcd_parser import VcdParser, parse_vcd_hierarchy, read_vcd_header_lines, read_vcd_toggle_activity, vcd_header_digest
+from source.parse_cache import ParseCache
+from source.source_index import SourceIndex
 from source.flist_formatter import FlistFormatter
 
 REPO_URL = "https://github.com/openhwgroup/cva6"
@@ -17,6 +24,61 @@ PATH_TO_DESIGN = "test/test_files/designs"
 PATH_TO_VCD_FILE = "test/test_files/vcds/hello_world.cv32a65x.vcd"
 PATH_TO_FLIST_FILE = "test/test_files/flists/Flist.cva6"
 
+SMALL_VCD = """$date today $end
+$timescale 1ps $end
+$scope module TOP $end
+$var wire 1 ! clk_i $end
+$scope module top $end
+$var wire 1 ! clk_i $end
+$var reg 4 " count [3:0] $end
+$var logic 8 # addr[0] $end
+$var integer 32 $ loops $end
+$var parameter 32 % DEPTH $end
+$scope struct req $end
+$var wire 1 & valid $end
+$upscope $end
+$scope begin gen_block $end
+$var wire 1 ' gen_sig $end
+$upscope $end
+$scope module u_fifo $end
+$var wire 1 ( full_o $end
+$upscope $end
+$upscope $end
+$upscope $end
+$enddefinitions $end
+#0
+0!
+b0000 "
+#10
+1!
+"""
+
+# Verilator declares every variable, parameters included, as a wire. This is the form of the reference CVA6 dump.
+VERILATOR_VCD = """$timescale 1ps $end
+ $scope module TOP $end
+  $var wire  1 # clk_i $end
+  $scope module top $end
+   $var wire 32 $ DEPTH [31:0] $end
+   $var wire  1 # clk_i $end
+   $var wire  4 % count [3:0] $end
+   $var wire  8 & mem[0] [7:0] $end
+   $scope module gen_block $end
+    $var wire  1 ' gen_sig $end
+   $upscope $end
+  $upscope $end
+ $upscope $end
+$enddefinitions $end
+"""
+
+SMALL_TOP_RTL = """module top (input logic clk_i);
+  fifo #(.DEPTH(4)) u_fifo (.full_o());
+endmodule
+"""
+
+SMALL_FIFO_RTL = """module fifo #(parameter DEPTH = 2) (output logic full_o);
+endmodule
+"""
+
 
 def clone_verilog_design(repo_url):
     repo_name = repo_url.rstrip("/").split("/")[-1].replace(".git", "")
@@ -74,6 +136,204 @@ def compare_json(path_to_json):
         return False
 
 
+def write_small_design(directory, vcd_content=SMALL_VCD):
+    vcd_path = os.path.join(directory, "small.vcd")
+    with open(vcd_path, "w") as f:
+        f.write(vcd_content)
+
+    rtl_paths = []
+    for name, content in (("top.sv", SMALL_TOP_RTL), ("fifo.sv", SMALL_FIFO_RTL)):
+        rtl_paths.append(os.path.join(directory, name))
+        with open(rtl_paths[-1], "w") as f:
+            f.write(content)
+
+    return vcd_path, "\n".join(rtl_paths)
+
+
+def test_parse_small_design(tmp_path):
+    vcd_path, f_list = write_small_design(str(tmp_path))
+
+    design_info = VcdParser().parse(vcd_path, f_list)
+
+    assert set(design_info.keys()) == {"top", "top.u_fifo"}
+    assert design_info["top"]["module_name"] == "top"
+    assert design_info["top.u_fifo"]["module_name"] == "fifo"
+    assert design_info["top.u_fifo"]["signal_width_data"] == {"full_o": 1}
+
+    # Every $var kind is picked up, and struct/begin scopes are attributed to the enclosing module.
+    assert design_info["top"]["signal_width_data"] == {
+        "clk_i": 1,
+        "count": 4,
+        "addr[0]": 8,
+        "addr": 8,
+        "loops": 32,
+        "DEPTH": 32,
+        "valid": 1,
+        "gen_sig": 1,
+    }
+
+    # Token costs are not part of the design info, the design explorer estimates them when they are shown.
+    assert "tokens" not in design_info["top"]
+
+
+def test_malformed_declarations_are_skipped(tmp_path):
+    vcd_path = os.path.join(str(tmp_path), "malformed.vcd")
+    with open(vcd_path, "w") as f:
+        f.write("$scope module top $end\n$var wire x ! bad $end\n$var wire 1 $end\n$var wire 1 # good $end\n$upscope $end\n$enddefinitions $end\n")
+
+    assert parse_vcd_hierarchy(vcd_path) == {"top": {"signal_width_data": {"good": 1}}}
+
+
+def test_verilator_signal_sets_are_unchanged(tmp_path):
+    vcd_path = os.path.join(str(tmp_path), "verilator.vcd")
+    with open(vcd_path, "w") as f:
+        f.write(VERILATOR_VCD)
+
+    # These are the signals the former '$var wire' regex recorded, so the reference output keeps its signal sets.
+    assert parse_vcd_hierarchy(vcd_path) == {
+        "TOP": {
+            "signal_width_data": {"clk_i": 1},
+            "top": {
+                "signal_width_data": {"DEPTH": 32, "clk_i": 1, "count": 4, "mem[0]": 8, "mem": 8},
+                "gen_block": {"signal_width_data": {"gen_sig": 1}},
+            },
+        }
+    }
+
+
+@pytest.mark.parametrize("open_function", [gzip.open, bz2.open, lzma.open])
+def test_parse_compressed_vcd(tmp_path, open_function):
+    vcd_path, f_list = write_small_design(str(tmp_path))
+    expected = VcdParser().parse(vcd_path, f_list)
+
+    compressed_path = os.path.join(str(tmp_path), "small.vcd.compressed")
+    with open(vcd_path, "rb") as infile, open_function(compressed_path, "wb") as outfile:
+        outfile.write(infile.read())
+
+    assert VcdParser().parse(compressed_path, f_list) == expected
+
+
+def test_parse_cache_hit_and_invalidation(tmp_path):
+    vcd_path, f_list = write_small_design(str(tmp_path))
+    parse_cache = ParseCache(os.path.join(str(tmp_path), "cache"))
+
+    expected = VcdParser().parse(vcd_path, f_list, parse_cache)
+    key = parse_cache.make_key(vcd_header_digest(vcd_path), f_list.splitlines())
+    assert parse_cache.load(key) == expected
+    assert VcdParser().parse(vcd_path, f_list, parse_cache) == expected
+
+    # Value changes after the header do not affect the key, the header and the RTL sources do.
+    with open(vcd_path, "a") as f:
+        f.write("#20\n0!\n")
+    assert parse_cache.make_key(vcd_header_digest(vcd_path), f_list.splitlines()) == key
+
+    with open(f_list.splitlines()[1], "a") as f:
+        f.write("module extra; endmodule\n")
+    assert parse_cache.make_key(vcd_header_digest(vcd_path), f_list.splitlines()) != key
+
+    write_small_design(str(tmp_path), SMALL_VCD.replace("u_fifo", "u_queue"))
+    assert parse_cache.make_key(vcd_header_digest(vcd_path), f_list.splitlines()) != key
+
+
+def test_parse_streamed_file_paths(tmp_path):
+    vcd_path, f_list = write_small_design(str(tmp_path))
+    parse_cache = ParseCache(os.path.join(str(tmp_path), "cache"))
+    expected = VcdParser().parse(vcd_path, f_list)
+
+    # An iterator of paths is consumed once, the parse cache key is the same as for the flist text.
+    assert VcdParser().parse(vcd_path, iter(f_list.splitlines()), parse_cache) == expected
+    assert parse_cache.load(parse_cache.make_key(vcd_header_digest(vcd_path), f_list.splitlines())) == expected
+    assert VcdParser().parse(vcd_path, iter(f_list.splitlines()), parse_cache, jobs=2) == expected
+    assert VcdParser().parse(vcd_path, iter(f_list.splitlines()), jobs=2) == expected
+
+
+def test_source_index_rescans_only_changed_files(tmp_path):
+    vcd_path, f_list = write_small_design(str(tmp_path))
+    top_path, fifo_path = f_list.splitlines()
+    index_path = os.path.join(str(tmp_path), "cache", "source_index.json")
+
+    source_index = SourceIndex(index_path)
+    assert source_index.update([top_path, fifo_path]) == [top_path, fifo_path]
+    assert source_index.num_scanned == 2
+    assert source_index.entry(top_path)["entities"] == [["fifo", "u_fifo"]]
+    assert source_index.port_direction(top_path, "top", "clk_i") == "input"
+    assert source_index.port_direction(fifo_path, "fifo", "full_o") == "output"
+    source_index.save()
+
+    # A fresh process only rescans the file whose content changed, touching a file is not enough.
+    with open(fifo_path, "a") as f:
+        f.write("module fifo_2 (input a, b, output [3:0] c); endmodule\n")
+    os.utime(top_path, ns=(0, 0))
+
+    source_index = SourceIndex(index_path)
+    source_index.update([top_path, fifo_path])
+    assert source_index.num_scanned == 1
+    assert source_index.entry(fifo_path)["modules"] == ["fifo", "fifo_2"]
+    assert source_index.entry(fifo_path)["ports"]["fifo_2"] == {"a": "input", "b": "input", "c": "output"}
+    assert VcdParser().parse(vcd_path, f_list, source_index=source_index)["top.u_fifo"]["module_name"] == "fifo"
+
+
+def test_undeclared_modules_are_found_in_include_dirs(tmp_path, monkeypatch):
+    vcd_path, f_list = write_small_design(str(tmp_path))
+    top_path, fifo_path = f_list.splitlines()
+    monkeypatch.chdir(str(tmp_path))
+    os.makedirs("include/src")
+    os.rename(fifo_path, os.path.join("include", "src", "fifo.sv"))
+    with open("design.f", "w") as f:
+        f.write(f"+incdir+include\n{top_path}\n")
+
+    # The fifo is only declared in a file of an include directory, no source includes it.
+    formatter = FlistFormatter()
+    design_info = VcdParser().parse(vcd_path, formatter.iter_files("design.f"), library_files=formatter.iter_library_files())
+    assert design_info["top.u_fifo"]["declaration_path"] == os.path.join("include", "src", "fifo.sv")
+
+    formatter = FlistFormatter()
+    design_info = VcdParser().parse(vcd_path, formatter.iter_files("design.f"), library_files=formatter.iter_library_files(walk_include_dirs=False))
+    assert "top.u_fifo" not in design_info
+
+    # A module declared by the flist keeps that declaration, library directories are searched as well.
+    os.makedirs("lib")
+    with open(os.path.join("lib", "top.sv"), "w") as f:
+        f.write(SMALL_TOP_RTL)
+    with open("design.f", "a") as f:
+        f.write("-y lib\n")
+    formatter = FlistFormatter()
+    design_info = VcdParser().parse(vcd_path, formatter.iter_files("design.f"), library_files=formatter.iter_library_files())
+    assert design_info["top"]["declaration_path"] == top_path
+    assert formatter.library_dirs == ["lib"]
+
+
+def test_parallel_parse_matches_serial(tmp_path):
+    vcd_path, f_list = write_small_design(str(tmp_path))
+
+    assert VcdParser().parse(vcd_path, f_list, jobs=2) == VcdParser().parse(vcd_path, f_list)
+
+
+def test_header_scan_stops_at_enddefinitions(tmp_path):
+    vcd_path = os.path.join(str(tmp_path), "small.vcd")
+    with open(vcd_path, "w") as f:
+        f.write(SMALL_VCD + "$scope module late $end\n")
+
+    lines = list(read_vcd_header_lines(vcd_path, chunk_size=7))
+
+    assert lines[0] == "$date today $end"
+    assert lines[-1] == "$upscope $end"
+    assert not any("late" in line or line.startswith("#") for line in lines)
+
+
+def test_toggle_activity(tmp_path):
+    vcd_path, f_list = write_small_design(str(tmp_path), SMALL_VCD + 'b0101 "\n1(\n#20\n0!\n0(\n')
+    design_info = VcdParser().parse(vcd_path, f_list)
+
+    toggle_activity = read_vcd_toggle_activity(vcd_path, design_info)
+
+    # The initial value is not a toggle, signals of the unnamed 'TOP' scope belong to no module.
+    assert toggle_activity["top"]["clk_i"] == 2
+    assert toggle_activity["top"]["count"] == 1
+    assert toggle_activity["top"]["gen_sig"] == 0
+    assert toggle_activity["top.u_fifo"] == {"full_o": 1}
+
+
 if __name__ == "__main__":
     clone_verilog_design(REPO_URL)
 
@@ -86,8 +346,16 @@ if __name__ == "__main__":
     f_lists = formatter.format_cva6(PATH_TO_FLIST_FILE)
 
     parser = VcdParser()
-    parser.parse(PATH_TO_VCD_FILE, f_lists)
+    parser.parse(PATH_TO_VCD_FILE, f_lists, library_files=formatter.iter_library_files())
     parser.export_json(PATH_TO_NEW_JSON)
 
-    if not compare_json(PATH_TO_NEW_JSON):
+    # After an intended change of the parser output, '--update-expected' makes this run the new reference.
+    if "--update-expected" in sys.argv[1:]:
+        with open(PATH_TO_NEW_JSON, "r") as new_file:
+            new_json = ___remove_prefix_from_path(json.load(new_file))
+        with open(PATH_TO_EXPECTED_JSON, "w") as expected_file:
+            json.dump(new_json, expected_file, indent=4)
+        print(f"Updated {PATH_TO_EXPECTED_JSON}.")
+
+    elif not compare_json(PATH_TO_NEW_JSON):
         sys.exit(1)